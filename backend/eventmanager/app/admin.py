@@ -72,6 +72,15 @@ class ChatAdmin(admin.ModelAdmin):
 
 admin.site.register(Chat, ChatAdmin)
 
+class FeedbackAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        # Only the edited fields: the sentiment score may have been written since the form was loaded
+        if change:
+            obj.save(update_fields=form.changed_data)
+        else:
+            obj.save()
+
+
 # Register the custom admin class
 admin.site.register(User, CustomUserAdmin)
 
@@ -79,5 +88,5 @@ admin.site.register(User, CustomUserAdmin)
 admin.site.register(EventInfo)
 admin.site.register(TaskInfo)
 admin.site.register(SubTask)
-admin.site.register(Feedback)
+admin.site.register(Feedback, FeedbackAdmin)
 admin.site.register(EventChat)
\ No newline at end of file
@@ -0,0 +1,112 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import EventInfo, TaskInfo, EventChat, Chat
+from .services.chat_write_buffer import writer
+
+
+def event_group(event_id):
+    return f"event_chat_{event_id}"
+
+
+def task_group(task_id):
+    return f"task_chat_{task_id}"
+
+
+class BaseChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Shared WebSocket behaviour for event and task chats.
+
+    The connecting user comes from the regular Django session cookie, so the
+    same login used by the HTTP API authorizes the socket.
+    """
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        if not await self.has_access(user):
+            await self.close(code=4403)
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        text = (content.get('message') or '').strip()
+        if not text:
+            await self.send_json({'status': 'error', 'message': 'Message cannot be empty'})
+            return
+
+        # The saved message reaches every member (including the sender)
+        # through the group broadcast fired when the batch is written
+        chat_message = await writer.asave(self.build_message(self.scope['user'], text))
+        await self.send_json({
+            'status': 'success',
+            'type': 'ack',
+            'id': chat_message.id,
+            'client_id': content.get('client_id'),
+        })
+
+    async def chat_message(self, event):
+        payload = dict(event['message'])
+        payload['is_current_user'] = payload.get('user') == self.scope['user'].id
+        await self.send_json({'type': 'message', 'message': payload})
+
+    async def has_access(self, user):
+        raise NotImplementedError
+
+    def build_message(self, user, text):
+        raise NotImplementedError
+
+
+class EventChatConsumer(BaseChatConsumer):
+    """WebSocket for an event's community chat"""
+
+    async def connect(self):
+        self.event_id = self.scope['url_route']['kwargs']['event_id']
+        self.group_name = event_group(self.event_id)
+        await super().connect()
+
+    @database_sync_to_async
+    def has_access(self, user):
+        # Users must be event participants (volunteers or hosts)
+        try:
+            event = EventInfo.objects.get(id=self.event_id)
+        except EventInfo.DoesNotExist:
+            return False
+        return (user.isHost or
+                event.host_id == user.id or
+                event.volunteer_enrolled.filter(id=user.id).exists())
+
+    def build_message(self, user, text):
+        return EventChat(event_id=self.event_id, user=user, message=text, is_host=user.isHost)
+
+
+class TaskChatConsumer(BaseChatConsumer):
+    """WebSocket for a task chat"""
+
+    async def connect(self):
+        self.task_id = self.scope['url_route']['kwargs']['task_id']
+        self.group_name = task_group(self.task_id)
+        await super().connect()
+
+    @database_sync_to_async
+    def has_access(self, user):
+        # User must be assigned to the task, be a host, or be the event host
+        try:
+            task = TaskInfo.objects.select_related('event').get(id=self.task_id)
+        except TaskInfo.DoesNotExist:
+            return False
+        return (user.isHost or
+                task.event.host_id == user.id or
+                task.volunteers.filter(id=user.id).exists())
+
+    def build_message(self, user, text):
+        return Chat(task_id=self.task_id, user=user, text=text, is_host=user.isHost)
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from app.models import EventInfo, EventChat, Chat
+from app.serializers.eventchat import EventChatSerializer
+from app.serializers.chat import TaskChatSerializer
+from app.services import chat_archive
+
+
+class Command(BaseCommand):
+    help = ('Move the chat messages of events completed more than N days ago into '
+            'compressed archive segments and delete them from the live tables')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 90),
+                            help='Archive events that ended at least this many days ago')
+        parser.add_argument('--event-id', type=int, help='Archive a single event')
+        parser.add_argument('--segment-size', type=int,
+                            default=getattr(settings, 'CHAT_ARCHIVE_SEGMENT_SIZE', 5000),
+                            help='Maximum number of messages per segment file')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        events = EventInfo.objects.filter(status='Completed', end_time__lt=cutoff)
+        if options['event_id']:
+            events = events.filter(id=options['event_id'])
+
+        total = 0
+        for event in events.order_by('id'):
+            archived = self._archive_event(event, options)
+            if archived:
+                total += archived
+                self.stdout.write(f"Event {event.id} ({event.event_name}): {archived} messages")
+
+        action = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f"{action} {total} messages"))
+
+    def _archive_event(self, event, options):
+        index = chat_archive.load_index(event.id)
+        conversations = [
+            ('event', event.id, EventChat.objects.filter(event=event), EventChatSerializer),
+        ] + [
+            ('task', task_id, Chat.objects.filter(task_id=task_id), TaskChatSerializer)
+            for task_id in event.tasks.values_list('id', flat=True)
+        ]
+
+        archived = 0
+        for conversation_type, conversation_id, messages, serializer_class in conversations:
+            # Rows at or below this id were stored by an earlier run that stopped before deleting them
+            done_up_to = chat_archive.archived_up_to(index, conversation_type, conversation_id)
+            pending = messages.filter(id__gt=done_up_to).select_related('user').order_by('id')
+            if options['dry_run']:
+                archived += pending.count()
+                continue
+
+            batch = []
+            for message in pending.iterator(chunk_size=options['segment_size']):
+                record = dict(serializer_class(message).data)
+                record.pop('is_current_user', None)
+                batch.append(record)
+                if len(batch) >= options['segment_size']:
+                    index['segments'].append(
+                        chat_archive.write_segment(event.id, conversation_type, conversation_id, batch)
+                    )
+                    archived += len(batch)
+                    batch = []
+            if batch:
+                index['segments'].append(
+                    chat_archive.write_segment(event.id, conversation_type, conversation_id, batch)
+                )
+                archived += len(batch)
+
+            if archived:
+                # Only drop rows once the index that points at their segments is on disk
+                chat_archive.save_index(event.id, index)
+            done_up_to = chat_archive.archived_up_to(index, conversation_type, conversation_id)
+            if done_up_to:
+                with transaction.atomic():
+                    messages.filter(id__lte=done_up_to).delete()
+
+        return archived
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand
+from app.ml import chart_engine
+import io
+import os
+import statistics
+import time
+
+RATING_FIELDS = ['overall_experience', 'organization_quality', 'communication', 'host_interaction',
+                 'volunteer_support', 'task_clarity', 'impact_awareness', 'inclusivity',
+                 'time_management', 'recognition']
+
+
+def dashboard(tasks):
+    """Specs of a full event dashboard plus host overview, with synthetic data"""
+    task_names = [f"Task {i}" for i in range(1, tasks + 1)]
+    averages = [5 + (i * 37 % 50) / 10 for i in range(len(RATING_FIELDS))]
+    return {
+        'average_ratings': chart_engine.bar_chart("Average Volunteer Ratings", RATING_FIELDS, averages,
+                                                  xlabel="Feedback Criteria", ylabel="Average Rating (0-10)"),
+        'volunteer_willingness': chart_engine.pie_chart("Volunteer Willingness", ["Yes", "No"], [42, 8],
+                                                        colors=['lightgreen', 'lightcoral']),
+        'volunteer_efficiency': chart_engine.bar_chart("Volunteer Efficiency by Task", task_names,
+                                                       [60 + i * 7 % 40 for i in range(tasks)],
+                                                       xlabel="Tasks", ylabel="Efficiency Rating", color='lightblue'),
+        'volunteers_per_task': chart_engine.bar_chart("Volunteer Distribution Across Tasks", task_names,
+                                                      [1 + i * 3 % 9 for i in range(tasks)],
+                                                      xlabel="Tasks", ylabel="Number of Volunteers", color='orange'),
+        'task_status': chart_engine.pie_chart("Task Status Distribution", ['Pending', 'In Progress', 'Completed'],
+                                              [3, 5, 12]),
+        'radar_chart': chart_engine.radar_chart("Feedback Radar Chart", RATING_FIELDS, averages),
+        'enrollment_trends': chart_engine.bar_chart("Volunteer Enrollment by Event", task_names,
+                                                    [10 + i * 5 % 30 for i in range(tasks)], xlabel="Events",
+                                                    ylabel="Number of Volunteers", figsize=(12, 6),
+                                                    targets=[25] * tasks),
+        'task_completion': chart_engine.bar_chart("Task Completion Rate by Event", task_names,
+                                                  [i * 13 % 100 for i in range(tasks)], xlabel="Events",
+                                                  ylabel="Task Completion Rate (%)", color='coral', figsize=(12, 6)),
+    }
+
+
+def render_with_pyplot(specs):
+    """How the views rendered before chart_engine: global pyplot figures, one after another"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    rendered = {}
+    for name, spec in specs.items():
+        plt.figure(figsize=spec['figsize'])
+        if spec['kind'] == 'bar':
+            plt.bar(spec['labels'], spec['values'], color=spec['color'])
+            for i, target in enumerate(spec['targets'] or []):
+                plt.plot([i - 0.4, i + 0.4], [target, target], 'r--')
+            plt.xlabel(spec['xlabel'])
+            plt.ylabel(spec['ylabel'])
+            plt.xticks(rotation=45)
+            plt.grid(axis='y', linestyle='--', alpha=0.7)
+        elif spec['kind'] == 'pie':
+            plt.pie(spec['values'], labels=spec['labels'], autopct='%1.1f%%', colors=spec['colors'], startangle=140)
+        else:
+            plt.close()
+            angles = np.linspace(0, 2 * np.pi, len(spec['labels']), endpoint=False).tolist()
+            _, ax = plt.subplots(figsize=spec['figsize'], subplot_kw=dict(polar=True))
+            ax.plot(angles + angles[:1], spec['values'] + spec['values'][:1], color='blue', linewidth=2)
+            ax.fill(angles + angles[:1], spec['values'] + spec['values'][:1], color='blue', alpha=0.25)
+            ax.set_thetagrids(np.degrees(angles), spec['labels'])
+            ax.set_ylim(0, spec['limit'])
+        plt.title(spec['title'])
+        plt.tight_layout()
+        svg_io = io.BytesIO()
+        plt.savefig(svg_io, format='svg')
+        plt.close()
+        rendered[name] = svg_io.getvalue()
+    return rendered
+
+
+class Command(BaseCommand):
+    help = 'Time rendering a full analytics dashboard: pyplot (before) against chart_engine, serial and parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5, help='Timed renders per variant')
+        parser.add_argument('--tasks', type=int, default=12, help='Bars in the per-task and per-event charts')
+        parser.add_argument('--workers', type=int, default=max(os.cpu_count() or 1, 2),
+                            help='Processes for the parallel variant')
+
+    def handle(self, *args, **options):
+        specs = dashboard(options['tasks'])
+        variants = [
+            ('pyplot, sequential (before)', lambda: render_with_pyplot(specs)),
+            ('chart_engine, in process', lambda: chart_engine.render_many(specs, 'svg', workers=1)),
+            (f"chart_engine, {options['workers']} processes",
+             lambda: chart_engine.render_many(specs, 'svg', workers=options['workers'])),
+        ]
+
+        self.stdout.write(f"{len(specs)} charts per dashboard, {os.cpu_count()} CPUs")
+        for label, render in variants:
+            # The first render pays for imports and starting the pool
+            start = time.perf_counter()
+            render()
+            first = time.perf_counter() - start
+
+            timings = []
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(f"  {label}: median {statistics.median(timings) * 1000:.0f} ms, "
+                              f"best {min(timings) * 1000:.0f} ms (first {first * 1000:.0f} ms)")
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from app.models import User, EventInfo, EventChat
+from channels.db import database_sync_to_async
+import asyncio
+import resource
+import time
+
+
+class Command(BaseCommand):
+    help = ('Open many idle WebSocket connections to an event chat inside this process '
+            'and report memory use and broadcast latency')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event-id', type=int, required=True, help='Event whose chat to connect to')
+        parser.add_argument('--email', type=str, required=True,
+                            help='User to authenticate as (must be able to access the event chat)')
+        parser.add_argument('--connections', type=int, default=2000, help='Number of idle connections to open')
+        parser.add_argument('--idle-seconds', type=float, default=5.0,
+                            help='How long to keep the connections idle before broadcasting')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"User with email {options['email']} not found")
+        if not EventInfo.objects.filter(id=options['event_id']).exists():
+            raise CommandError(f"Event {options['event_id']} not found")
+
+        # Create a real session so the sockets authenticate the same way a browser does
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+
+        asyncio.run(self._run(options, session.session_key))
+        session.delete()
+
+    async def _run(self, options, session_key):
+        from channels.testing import WebsocketCommunicator
+        from eventmanager.asgi import application
+
+        path = f"/ws/events/{options['event_id']}/chat/"
+        headers = [
+            (b'cookie', f'sessionid={session_key}'.encode()),
+            (b'origin', b'http://localhost'),
+            (b'host', b'localhost'),
+        ]
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+
+        communicators = []
+        batch = 200
+        for offset in range(0, options['connections'], batch):
+            group = [WebsocketCommunicator(application, path, headers=headers)
+                     for _ in range(min(batch, options['connections'] - offset))]
+            results = await asyncio.gather(*(c.connect(timeout=30) for c in group))
+            for communicator, (connected, _) in zip(group, results):
+                if not connected:
+                    raise CommandError('A connection was rejected; check the user can access this event chat')
+            communicators.extend(group)
+
+        connect_seconds = time.perf_counter() - start
+        self.stdout.write(f"Opened {len(communicators)} connections in {connect_seconds:.2f}s")
+
+        await asyncio.sleep(options['idle_seconds'])
+        rss_idle = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        per_connection_kb = (rss_idle - rss_before) / max(len(communicators), 1)
+        self.stdout.write(f"Peak RSS grew by {(rss_idle - rss_before) / 1024:.1f} MB "
+                          f"(~{per_connection_kb:.1f} KB per idle connection)")
+
+        # One message from the first socket fans out to every connection
+        sent_at = time.perf_counter()
+        await communicators[0].send_json_to({'message': 'load test broadcast'})
+        await asyncio.gather(*(self._wait_for_message(c) for c in communicators))
+        fanout_ms = (time.perf_counter() - sent_at) * 1000
+        self.stdout.write(f"Broadcast reached all {len(communicators)} connections in {fanout_ms:.1f} ms")
+
+        await asyncio.gather(*(c.disconnect() for c in communicators))
+        await database_sync_to_async(
+            EventChat.objects.filter(event_id=options['event_id'], message='load test broadcast').delete
+        )()
+        self.stdout.write(self.style.SUCCESS('Load test finished'))
+
+    @staticmethod
+    async def _wait_for_message(communicator):
+        while True:
+            payload = await communicator.receive_json_from(timeout=60)
+            if payload.get('type') == 'message':
+                return payload
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.models import EventEmbedding, EventInfo
+import numpy as np
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compute and store the embeddings used by semantic event search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-embed every event, not only new or changed ones')
+        parser.add_argument('--batch-size', type=int, default=64, help='Events embedded per model call')
+        parser.add_argument('--benchmark', type=int, metavar='N',
+                            help='Instead of embedding, time N searches per mode over the stored embeddings')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(options['benchmark'])
+            return
+
+        try:
+            from app.ml import embedding_store
+            embedding_store.embed_documents(['warm up'])
+        except ImportError as e:
+            raise CommandError(f"ML modules not available: {str(e)}")
+
+        already = EventEmbedding.objects.filter(model_name=embedding_store.model_name()).count()
+        start = time.perf_counter()
+        embedded = embedding_store.embed_events(
+            EventInfo.objects.all(), force=options['all'], batch_size=options['batch_size'],
+            on_batch=lambda done, total: self.stdout.write(f"Embedded {done}/{total} events")
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {embedded} events in {time.perf_counter() - start:.1f}s "
+            f"({already} were already embedded)"
+        ))
+
+    def _benchmark(self, count):
+        """Time search_events end to end, as the search view calls it"""
+        from app.ml import embedding_store
+
+        names = list(EventInfo.objects.exclude(event_name='').order_by('?').values_list('event_name', flat=True)[:count])
+        queries = [name.split()[0] for name in names] or ['volunteer']
+        queries = (queries * count)[:count]
+        scopes = {
+            'visible events': EventInfo.objects.exclude(status='Draft'),
+            'upcoming only': EventInfo.objects.filter(status='Upcoming'),
+        }
+
+        modes = ['keyword', 'semantic', 'hybrid']
+        try:
+            embedding_store.embed_query('warm up')
+        except ImportError as e:
+            self.stdout.write(f"ML modules not available, timing keyword search only: {str(e)}")
+            modes = ['keyword']
+
+        self.stdout.write(f"{len(embedding_store.get_index())} indexed events, {len(queries)} queries per mode")
+        for scope, events in scopes.items():
+            for mode in modes:
+                timings = []
+                for query in queries:
+                    start = time.perf_counter()
+                    embedding_store.search_events(query, events, mode=mode, limit=10)
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f"  {scope}, {mode}: p50 {np.percentile(timings, 50):.2f} ms, "
+                                  f"p95 {np.percentile(timings, 95):.2f} ms")
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+from app.models import Recommendation, User
+from app.services.recommendation_cache import model_version
+import time
+
+
+class Command(BaseCommand):
+    help = ('Compute the top events and tasks of every active volunteer in one batch and '
+            'store them in the Recommendation table (meant to run nightly)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int,
+                            default=getattr(settings, 'RECOMMENDATION_PRECOMPUTE_TOP_N', 50),
+                            help='Events and tasks stored per volunteer')
+        parser.add_argument('--active-days', type=int,
+                            help='Only volunteers who logged in within this many days')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Volunteers scored per matrix product')
+        parser.add_argument('--batch-size', type=int, default=64, help='Texts embedded per model call')
+
+    def handle(self, *args, **options):
+        try:
+            from app.ml import batch_recommendations
+            from app.ml.embedding_store import embed_documents
+            embed_documents(['warm up'])
+        except ImportError as e:
+            raise CommandError(f"ML modules not available: {str(e)}")
+
+        start = time.perf_counter()
+        candidates = batch_recommendations.Candidates(options['batch_size'])
+        self.stdout.write(f"Candidates: {len(candidates.events)} events, {len(candidates.tasks)} open tasks "
+                          f"({time.perf_counter() - start:.1f}s)")
+
+        volunteers = User.objects.filter(isHost=False, is_active=True).exclude(skills='')
+        if options['active_days']:
+            volunteers = volunteers.filter(last_login__gte=timezone.now() - timedelta(days=options['active_days']))
+        volunteers = volunteers.only('id', 'skills').order_by('id')
+
+        scored = written = 0
+        chunk = []
+        for user in volunteers.iterator(chunk_size=options['chunk_size']):
+            chunk.append(user)
+            if len(chunk) == options['chunk_size']:
+                written += batch_recommendations.precompute_chunk(chunk, candidates, options['top_n'],
+                                                                  options['batch_size'])
+                scored += len(chunk)
+                chunk = []
+                self.stdout.write(f"Scored {scored} volunteers")
+        if chunk:
+            written += batch_recommendations.precompute_chunk(chunk, candidates, options['top_n'],
+                                                              options['batch_size'])
+            scored += len(chunk)
+
+        # Rows of an older model version are never served
+        stale, _ = Recommendation.objects.exclude(model_version=model_version()).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} recommendations for {scored} volunteers in "
+            f"{time.perf_counter() - start:.1f}s ({stale} stale rows removed)"
+        ))
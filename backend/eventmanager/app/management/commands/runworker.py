@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+# How often the supervisor requeues jobs of dead workers and purges expired results
+HOUSEKEEPING_SECONDS = 60
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_main(stop, poll_seconds):
+    """Entry point of a worker process (spawned, so Django is set up again here)"""
+    import django
+    django.setup()
+    from app.services import jobs
+
+    # Signals go to the supervisor, which lets the running job finish before setting stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    jobs.work(_worker_name(), stop, poll_seconds)
+
+
+class Command(BaseCommand):
+    help = ('Run queued background jobs (exports, reports, emails, ML recomputation) in worker '
+            'processes until interrupted')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'JOB_WORKERS', 2),
+                            help='Worker processes, each running one job at a time')
+        parser.add_argument('--poll', type=float, default=getattr(settings, 'JOB_POLL_SECONDS', 2),
+                            help='Seconds an idle worker waits before looking for jobs again')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the pending jobs in this process, then exit (e.g. from cron)')
+
+    def handle(self, *args, **options):
+        from app.services import jobs
+
+        jobs.requeue_stale()
+        if options['once']:
+            jobs.work(_worker_name(), threading.Event(), exit_when_idle=True)
+            jobs.purge_expired()
+            return
+
+        # spawn, as for the chart render pool: workers start from a clean interpreter
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        workers = {}
+
+        def start(index):
+            process = context.Process(target=_worker_main, args=(stop, options['poll']),
+                                      name=f"runworker-{index}")
+            process.start()
+            workers[index] = process
+
+        for index in range(options['workers']):
+            start(index)
+        self.stdout.write(f"Started {options['workers']} workers; Ctrl+C or SIGTERM stops them")
+
+        # SIGTERM stops like Ctrl+C: running jobs finish first
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        last_housekeeping = time.monotonic()
+        try:
+            while True:
+                for index, process in list(workers.items()):
+                    if not process.is_alive():
+                        self.stderr.write(f"Worker {index} exited with code {process.exitcode}; restarting")
+                        start(index)
+                if time.monotonic() - last_housekeeping >= HOUSEKEEPING_SECONDS:
+                    requeued = jobs.requeue_stale()
+                    purged = jobs.purge_expired()
+                    if requeued or purged:
+                        self.stdout.write(f"Requeued {requeued} stale jobs, purged {purged} expired jobs")
+                    last_housekeeping = time.monotonic()
+                time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping: waiting for running jobs to finish')
+            stop.set()
+            for process in workers.values():
+                process.join()
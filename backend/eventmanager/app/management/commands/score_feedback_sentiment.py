@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from app.models import Feedback
+from app.services import feedback_sentiment
+import time
+
+
+class Command(BaseCommand):
+    help = ('Score the sentiment of feedback that has not been scored yet (new feedback is scored '
+            'automatically) and add it to the per-event totals')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rescore every feedback with text')
+        parser.add_argument('--event-id', type=int, help='Only feedback for this event')
+
+    def handle(self, *args, **options):
+        feedback = Feedback.objects.filter(feedback_sentiment.has_text())
+        if not options['all']:
+            feedback = feedback.filter(sentiment_polarity__isnull=True)
+        if options['event_id']:
+            feedback = feedback.filter(event_id=options['event_id'])
+        feedback_ids = list(feedback.order_by('id').values_list('id', flat=True))
+
+        start = time.perf_counter()
+        for done, feedback_id in enumerate(feedback_ids, 1):
+            feedback_sentiment.score(feedback_id)
+            if done % 100 == 0:
+                self.stdout.write(f"Scored {done}/{len(feedback_ids)} feedback")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {len(feedback_ids)} feedback in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from app.ml import collaborative
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = ('Train the collaborative-filtering model on enrollment and task-assignment history. '
+            'Only retrains fully when the history changed enough; otherwise new events are folded in')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=getattr(settings, 'CF_FACTORS', 32),
+                            help='Number of latent factors')
+        parser.add_argument('--retrain-threshold', type=float,
+                            default=getattr(settings, 'CF_RETRAIN_THRESHOLD', 0.1),
+                            help='Fraction of changed interactions that triggers a full retrain')
+        parser.add_argument('--full', action='store_true', help='Always retrain from scratch')
+
+    def handle(self, *args, **options):
+        path = collaborative.model_path()
+        start = time.perf_counter()
+        model = collaborative.CFModel.load(path) if os.path.exists(path) else None
+
+        if model is not None and not options['full']:
+            interaction_count = len(collaborative.interactions()[2])
+            changed = abs(interaction_count - model.interaction_count) / max(model.interaction_count, 1)
+            if changed < options['retrain_threshold']:
+                added = collaborative.fold_in_events(model)
+                if added:
+                    model.save(path)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Interactions changed by {changed:.1%}; folded in {added} new events "
+                    f"in {time.perf_counter() - start:.2f}s"
+                ))
+                return
+
+        model = collaborative.train(options['factors'])
+        if model is None:
+            self.stdout.write(self.style.WARNING('Not enough enrollment history to train a model'))
+            return
+        model.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {len(model.singular_values)} factors on {model.interaction_count} interactions "
+            f"({len(model.user_ids)} volunteers x {len(model.event_ids)} events) "
+            f"in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_alter_subtask_options_subtask_completed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['task', 'timestamp'], name='chat_task_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventchat',
+            index=models.Index(fields=['event', 'timestamp'], name='eventchat_event_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_chat_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conversation_type', models.CharField(choices=[('event', 'Event Chat'), ('task', 'Task Chat')], max_length=10)),
+                ('conversation_id', models.PositiveIntegerField(help_text='ID of the event or task whose chat this marker tracks')),
+                ('last_read_id', models.PositiveBigIntegerField(default=0, help_text='ID of the newest message the user has read')),
+                ('unread_count', models.PositiveIntegerField(blank=True, help_text='Unread messages, kept up to date on write for small conversations; null means it is counted on read', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_markers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversation_type', 'conversation_id'], name='readmarker_conversation_idx')],
+                'unique_together': {('user', 'conversation_type', 'conversation_id')},
+            },
+        ),
+    ]
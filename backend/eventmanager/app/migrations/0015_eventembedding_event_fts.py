@@ -0,0 +1,69 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Keyword side of hybrid event search: an external-content FTS5 index over the
+# text columns of EventInfo, kept current by triggers (SQLite only)
+EVENT_FTS_COLUMNS = ['event_name', 'overview', 'description', 'location']
+
+
+def create_event_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = ', '.join(EVENT_FTS_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in EVENT_FTS_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in EVENT_FTS_COLUMNS)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS app_eventinfo_fts USING fts5("
+        f"{columns}, content='app_eventinfo', content_rowid='id', "
+        f"tokenize='porter unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS app_eventinfo_fts_ai AFTER INSERT ON app_eventinfo BEGIN "
+        f"INSERT INTO app_eventinfo_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS app_eventinfo_fts_ad AFTER DELETE ON app_eventinfo BEGIN "
+        f"INSERT INTO app_eventinfo_fts(app_eventinfo_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS app_eventinfo_fts_au AFTER UPDATE OF {columns} ON app_eventinfo BEGIN "
+        f"INSERT INTO app_eventinfo_fts(app_eventinfo_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO app_eventinfo_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute("INSERT INTO app_eventinfo_fts(app_eventinfo_fts) VALUES ('rebuild')")
+
+
+def drop_event_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS app_eventinfo_fts_{suffix}")
+    schema_editor.execute("DROP TABLE IF EXISTS app_eventinfo_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_chat_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(help_text='Embedding model that produced the vector', max_length=255)),
+                ('dimensions', models.PositiveIntegerField()),
+                ('vector', models.BinaryField(help_text='float32 vector, stored as raw bytes')),
+                ('text_hash', models.CharField(help_text='SHA-1 of the embedded text, to skip unchanged events', max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='app.eventinfo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_name', 'updated_at'], name='eventembedding_model_idx')],
+            },
+        ),
+        migrations.RunPython(create_event_fts, drop_event_fts),
+    ]
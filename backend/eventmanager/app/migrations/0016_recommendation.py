@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_eventembedding_event_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('event', 'Event'), ('task', 'Task')], max_length=10)),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('model_version', models.CharField(max_length=100)),
+                ('computed_at', models.DateTimeField()),
+                ('event', models.ForeignKey(help_text='The recommended event, or the event of the recommended task', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.eventinfo')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.taskinfo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'item_type', 'model_version', 'rank'], name='recommendation_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventPopularity',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='app.eventinfo')),
+                ('log_score', models.FloatField(help_text='Log of the decayed score, measured from a fixed epoch so it never needs rewriting')),
+                ('last_activity', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['log_score'], name='eventpopularity_score_idx')],
+            },
+        ),
+    ]
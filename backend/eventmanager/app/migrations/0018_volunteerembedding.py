@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_eventpopularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolunteerEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(help_text='Embedding model that produced the vector', max_length=255)),
+                ('dimensions', models.PositiveIntegerField()),
+                ('vector', models.BinaryField(help_text='float32 vector, stored as raw bytes')),
+                ('text_hash', models.CharField(help_text='SHA-1 of the embedded skills', max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='skills_embedding', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
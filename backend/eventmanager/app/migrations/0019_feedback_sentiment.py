@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_volunteerembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSentiment',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sentiment', serialize=False, to='app.eventinfo')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('polarity_sum', models.FloatField(default=0)),
+                ('subjectivity_sum', models.FloatField(default=0)),
+                ('very_negative', models.PositiveIntegerField(default=0)),
+                ('negative', models.PositiveIntegerField(default=0)),
+                ('neutral', models.PositiveIntegerField(default=0)),
+                ('positive', models.PositiveIntegerField(default=0)),
+                ('very_positive', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='sentiment_polarity',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='sentiment_subjectivity',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
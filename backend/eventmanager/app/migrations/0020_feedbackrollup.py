@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_feedback_sentiment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackRollup',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feedback_rollup', serialize=False, to='app.eventinfo')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('would_volunteer_again_count', models.PositiveIntegerField(default=0)),
+                ('metrics', models.JSONField(default=dict, help_text='Per rating field: count, sum, sum of squares and a 1-10 histogram')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
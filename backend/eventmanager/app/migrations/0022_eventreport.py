@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventReport',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report', serialize=False, to='app.eventinfo')),
+                ('data_version', models.PositiveIntegerField(default=1, help_text='Incremented whenever data in the report changes')),
+                ('built_version', models.PositiveIntegerField(default=0, help_text='data_version the stored report was built from')),
+                ('report', models.TextField(blank=True)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('value', models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+    ]
@@ -0,0 +1,180 @@
+"""
+Recommendations for every volunteer in one vectorised pass.
+
+Online recommendation embeds a volunteer's skills and compares them with each
+event in turn. Here the skill vectors of all volunteers form one matrix and
+the candidate events (and open tasks) another, so scoring everyone is one
+matrix product per chunk of volunteers. The best ``top_n`` of each row are
+picked with ``argpartition`` and stored in ``Recommendation`` for the views to
+serve (see ``services.recommendation_cache``). Event scores of volunteers with
+enrollment history are blended with the collaborative-filtering score, as the
+online ranking does.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from ..models import EventEmbedding, EventInfo, Recommendation, TaskInfo
+from ..services.recommendation_cache import PRECOMPUTED_STATUSES, model_version
+from . import collaborative, embedding_store
+
+
+def embed_unique(texts, batch_size=64):
+    """
+    Embed each distinct text once. Returns ``(matrix, rows)`` where
+    ``matrix[rows[i]]`` is the vector of ``texts[i]``.
+    """
+    unique = list(dict.fromkeys(texts))
+    position = {text: i for i, text in enumerate(unique)}
+    vectors = [embedding_store.embed_documents(unique[offset:offset + batch_size])
+               for offset in range(0, len(unique), batch_size)]
+    matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    return matrix, np.array([position[text] for text in texts], dtype=np.int64)
+
+
+def event_vectors(events, batch_size=64):
+    """
+    Normalised vectors of ``events`` (a list with tasks prefetched), reusing
+    the stored semantic-search embedding of every event whose text is unchanged.
+    """
+    name = embedding_store.model_name()
+    stored = {
+        event_id: (digest, vector)
+        for event_id, digest, vector in EventEmbedding.objects.filter(
+            model_name=name, event_id__in=[event.id for event in events]
+        ).values_list('event_id', 'text_hash', 'vector')
+    }
+
+    vectors = [None] * len(events)
+    missing = []
+    for i, event in enumerate(events):
+        text = embedding_store.event_text(event, event.tasks.all())
+        digest, vector = stored.get(event.id, (None, None))
+        if digest == embedding_store.text_hash(text):
+            vectors[i] = np.frombuffer(bytes(vector), dtype=np.float32)
+        else:
+            missing.append((i, text))
+
+    if missing:
+        matrix, rows = embed_unique([text for _, text in missing], batch_size)
+        for (i, _), row in zip(missing, rows):
+            vectors[i] = matrix[row]
+    return embedding_store._normalise(np.vstack(vectors))
+
+
+def task_text(task):
+    """Task context as the online matcher builds it: text, required skills and detected skill tags."""
+    from .loader import recommender
+
+    text = f"{task.task_name}. {task.description}"
+    if task.required_skills:
+        text += f" Skills: {task.required_skills}"
+    return text + ' ' + ' '.join(recommender().direct_skill_matching(text))
+
+
+def top_n(scores, n):
+    """
+    Column indices and scores of the ``n`` best entries of each row, best
+    first. Entries set to ``-inf`` are never candidates.
+    """
+    n = min(n, scores.shape[1])
+    if n == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    columns = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    best = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-best, axis=1, kind='stable')
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(best, order, axis=1)
+
+
+class Candidates:
+    """Event and task matrices shared by every chunk of volunteers."""
+
+    def __init__(self, batch_size=64):
+        self.events = list(
+            EventInfo.objects.filter(status__in=PRECOMPUTED_STATUSES)
+            .prefetch_related(Prefetch('tasks', queryset=TaskInfo.objects.order_by('id')))
+            .order_by('id')
+        )
+        self.event_ids = np.array([event.id for event in self.events], dtype=np.int64)
+        self.event_matrix = (event_vectors(self.events, batch_size) if self.events
+                             else np.empty((0, 0), dtype=np.float32))
+
+        # Open tasks of candidate events; each volunteer only gets tasks of
+        # events they are enrolled in and are not yet assigned to
+        self.tasks = [task for event in self.events for task in event.tasks.all()
+                      if task.status in ('Pending', 'In Progress')]
+        self.task_ids = np.array([task.id for task in self.tasks], dtype=np.int64)
+        self.task_events = np.array([task.event_id for task in self.tasks], dtype=np.int64)
+        if self.tasks:
+            matrix, rows = embed_unique([task_text(task) for task in self.tasks], batch_size)
+            self.task_matrix = embedding_store._normalise(matrix[rows])
+        else:
+            self.task_matrix = np.empty((0, 0), dtype=np.float32)
+
+    def task_mask(self, user_ids):
+        """Boolean ``len(user_ids) x tasks`` matrix of the tasks each volunteer may be offered."""
+        rows = {user_id: i for i, user_id in enumerate(user_ids)}
+        mask = np.zeros((len(user_ids), len(self.tasks)), dtype=bool)
+        if not self.tasks:
+            return mask
+
+        enrolled = EventInfo.volunteer_enrolled.through.objects.filter(
+            user_id__in=user_ids, eventinfo_id__in=self.event_ids.tolist()
+        ).values_list('user_id', 'eventinfo_id')
+        columns_by_event = {}
+        for column, event_id in enumerate(self.task_events):
+            columns_by_event.setdefault(int(event_id), []).append(column)
+        for user_id, event_id in enrolled:
+            mask[rows[user_id], columns_by_event.get(event_id, [])] = True
+
+        column_by_task = {int(task_id): column for column, task_id in enumerate(self.task_ids)}
+        assigned = TaskInfo.volunteers.through.objects.filter(
+            user_id__in=user_ids, taskinfo_id__in=self.task_ids.tolist()
+        ).values_list('user_id', 'taskinfo_id')
+        for user_id, task_id in assigned:
+            mask[rows[user_id], column_by_task[task_id]] = False
+        return mask
+
+
+def precompute_chunk(users, candidates, n, batch_size=64):
+    """Score one chunk of volunteers and replace their stored recommendations. Returns rows written."""
+    version = model_version()
+    computed_at = timezone.now()
+    user_ids = [user.id for user in users]
+    volunteers = embedding_store.volunteer_vectors(users, batch_size)
+
+    recommendations = []
+    if len(candidates.events):
+        event_scores = volunteers @ candidates.event_matrix.T
+        cf_scores, has_history = collaborative.score_matrix(user_ids, candidates.event_ids)
+        event_scores[has_history] = collaborative.blend(event_scores[has_history], cf_scores[has_history])
+        columns, scores = top_n(event_scores, n)
+        for i, user_id in enumerate(user_ids):
+            for rank, (column, score) in enumerate(zip(columns[i], scores[i]), start=1):
+                recommendations.append(Recommendation(
+                    user_id=user_id, item_type='event', event_id=int(candidates.event_ids[column]),
+                    score=float(score), rank=rank, model_version=version, computed_at=computed_at
+                ))
+
+    if len(candidates.tasks):
+        task_scores = volunteers @ candidates.task_matrix.T
+        task_scores[~candidates.task_mask(user_ids)] = -np.inf
+        columns, scores = top_n(task_scores, n)
+        for i, user_id in enumerate(user_ids):
+            rank = 0
+            for column, score in zip(columns[i], scores[i]):
+                if np.isneginf(score):
+                    break
+                rank += 1
+                recommendations.append(Recommendation(
+                    user_id=user_id, item_type='task', event_id=int(candidates.task_events[column]),
+                    task_id=int(candidates.task_ids[column]), score=float(score), rank=rank,
+                    model_version=version, computed_at=computed_at
+                ))
+
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id__in=user_ids).delete()
+        Recommendation.objects.bulk_create(recommendations, batch_size=1000)
+    return len(recommendations)
@@ -0,0 +1,190 @@
+"""
+Chart rendering without pyplot.
+
+``pyplot`` keeps the "current figure" in global state, so two requests drawing
+at once on a threaded server can draw into each other's charts, and a
+dashboard's charts were drawn one after another. Here a chart is described by
+a plain, picklable spec (``bar_chart``, ``pie_chart``, ...) and ``render``
+draws it on its own ``Figure`` with a ``FigureCanvasAgg``, touching no global
+state.
+
+``render_many`` (or ``render_iter``, which yields each chart as it finishes)
+renders the independent charts of a dashboard in parallel on a pool of
+``CHART_RENDER_WORKERS`` processes (matplotlib drawing holds the GIL, so
+threads would not help). The pool uses the ``spawn`` start method, because
+forking a multi-threaded server process is unsafe; with one worker, or a
+single chart, rendering happens in the calling thread.
+
+matplotlib is imported on first render, so importing this module is cheap.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+# Chart specs
+
+def bar_chart(title, labels, values, xlabel='', ylabel='', color='skyblue', figsize=(10, 6), targets=None):
+    """Bar chart; ``targets`` draws a dashed red target line over each bar"""
+    return {'kind': 'bar', 'title': title, 'labels': [str(label) for label in labels],
+            'values': [float(value) for value in values], 'xlabel': xlabel, 'ylabel': ylabel,
+            'color': color, 'figsize': figsize, 'targets': targets}
+
+
+def pie_chart(title, labels, values, colors=None, figsize=(6, 6)):
+    return {'kind': 'pie', 'title': title, 'labels': [str(label) for label in labels],
+            'values': [float(value) for value in values], 'colors': colors, 'figsize': figsize}
+
+
+def radar_chart(title, labels, values, figsize=(8, 8), limit=10):
+    return {'kind': 'radar', 'title': title, 'labels': [str(label) for label in labels],
+            'values': [float(value) for value in values], 'figsize': figsize, 'limit': limit}
+
+
+def timeline_chart(title, labels, dates, xlabel='', figsize=(12, 6)):
+    """One point per label at its date, e.g. task completions"""
+    return {'kind': 'timeline', 'title': title, 'labels': [str(label) for label in labels],
+            'dates': list(dates), 'xlabel': xlabel, 'figsize': figsize}
+
+
+# Drawing
+
+def _draw_bar(figure, spec):
+    axes = figure.add_subplot()
+    axes.bar(spec['labels'], spec['values'], color=spec['color'])
+    for i, target in enumerate(spec['targets'] or []):
+        axes.plot([i - 0.4, i + 0.4], [target, target], 'r--')
+    axes.set_xlabel(spec['xlabel'])
+    axes.set_ylabel(spec['ylabel'])
+    axes.set_title(spec['title'])
+    axes.tick_params(axis='x', labelrotation=45)
+    axes.grid(axis='y', linestyle='--', alpha=0.7)
+
+
+def _draw_pie(figure, spec):
+    axes = figure.add_subplot()
+    axes.pie(spec['values'], labels=spec['labels'], autopct='%1.1f%%', colors=spec['colors'], startangle=140)
+    axes.set_title(spec['title'])
+
+
+def _draw_radar(figure, spec):
+    import numpy as np
+
+    angles = np.linspace(0, 2 * np.pi, len(spec['labels']), endpoint=False).tolist()
+    # Close the outline
+    values = spec['values'] + spec['values'][:1]
+    closed_angles = angles + angles[:1]
+
+    axes = figure.add_subplot(polar=True)
+    axes.plot(closed_angles, values, color='blue', linewidth=2)
+    axes.fill(closed_angles, values, color='blue', alpha=0.25)
+    axes.set_thetagrids(np.degrees(angles), spec['labels'])
+    axes.set_ylim(0, spec['limit'])
+    axes.grid(True)
+    axes.set_title(spec['title'])
+
+
+def _draw_timeline(figure, spec):
+    axes = figure.add_subplot()
+    positions = range(len(spec['labels']))
+    axes.plot(spec['dates'], positions, '-o')
+    axes.set_yticks(positions, spec['labels'])
+    axes.set_xlabel(spec['xlabel'])
+    axes.set_title(spec['title'])
+    axes.grid(True)
+
+
+_DRAW = {
+    'bar': _draw_bar,
+    'pie': _draw_pie,
+    'radar': _draw_radar,
+    'timeline': _draw_timeline,
+}
+
+
+def render(spec, fmt='svg', dpi=100, tight=False):
+    """Bytes of one chart in ``fmt`` ('svg' or 'png'); ``tight`` crops to the drawn area"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=spec['figsize'])
+    FigureCanvasAgg(figure)
+    _DRAW[spec['kind']](figure, spec)
+    figure.tight_layout()
+    output = io.BytesIO()
+    figure.savefig(output, format=fmt, dpi=dpi, bbox_inches='tight' if tight else None)
+    return output.getvalue()
+
+
+# Parallel rendering
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def worker_count():
+    default = min(4, os.cpu_count() or 1)
+    # Also usable outside Django (ml/feedback_charts.py run as a script)
+    return getattr(settings, 'CHART_RENDER_WORKERS', default) if settings.configured else default
+
+
+def _get_pool(workers):
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None and _pool_size != workers:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_size = workers
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_iter(specs, fmt='svg', dpi=100, tight=False, workers=None):
+    """Yield ``(name, bytes)`` for ``{name: spec}`` as each chart finishes, rendering in parallel when worth it"""
+    workers = worker_count() if workers is None else workers
+    if workers <= 1 or len(specs) <= 1:
+        for name, spec in specs.items():
+            yield name, render(spec, fmt, dpi, tight)
+        return
+
+    pool = _get_pool(workers)
+    done = set()
+    try:
+        futures = {pool.submit(render, spec, fmt, dpi, tight): name for name, spec in specs.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            yield name, future.result()
+            done.add(name)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory): start a new pool next time, render here now
+        print("Chart render pool broke; rendering in process")
+        _discard_pool(pool)
+        for name, spec in specs.items():
+            if name not in done:
+                yield name, render(spec, fmt, dpi, tight)
+
+
+def render_many(specs, fmt='svg', dpi=100, tight=False, workers=None):
+    """``{name: bytes}`` for ``{name: spec}``, in the order of ``specs``"""
+    rendered = dict(render_iter(specs, fmt, dpi, tight, workers))
+    return {name: rendered[name] for name in specs}
+
+
+def render_svgs(specs, workers=None):
+    """``{name: SVG text}``, the format the chart views return in JSON"""
+    return {name: data.decode('utf-8') for name, data in render_many(specs, 'svg', workers=workers).items()}
@@ -0,0 +1,208 @@
+"""
+Implicit-feedback collaborative filtering over enrollment history.
+
+The interaction matrix has one row per volunteer and one column per event.
+An enrollment counts 1 and every task the volunteer was assigned in the event
+adds 0.5; weights are log-scaled. ``train`` factorises it with a truncated
+SVD (``X ~ U S V^T``) and saves the factors to ``CF_MODEL_PATH``.
+
+Scoring folds a volunteer in at request time: their current interaction
+vector ``x`` is projected onto the event factors, ``scores = (x V) V^T``, so
+new enrollments (and new volunteers) count immediately without retraining.
+Events created after training are folded in the other way round by
+``fold_in_events`` (``v = x_event^T U / s``), which is much cheaper than a
+full retrain; ``manage.py train_cf`` picks between the two.
+"""
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import svds
+
+from ..models import EventInfo, TaskInfo
+
+ENROLLMENT_WEIGHT = 1.0
+ASSIGNMENT_WEIGHT = 0.5
+
+
+def model_path():
+    return getattr(settings, 'CF_MODEL_PATH', os.path.join(settings.BASE_DIR, 'ml_models', 'collaborative.npz'))
+
+
+def interactions(user_ids=None):
+    """``(user_ids, event_ids, weights)`` arrays of every volunteer-event interaction."""
+    enrolled = EventInfo.volunteer_enrolled.through.objects.all()
+    assigned = TaskInfo.volunteers.through.objects.all()
+    if user_ids is not None:
+        enrolled = enrolled.filter(user_id__in=user_ids)
+        assigned = assigned.filter(user_id__in=user_ids)
+
+    weights = {}
+    for user_id, event_id in enrolled.values_list('user_id', 'eventinfo_id'):
+        weights[(user_id, event_id)] = weights.get((user_id, event_id), 0.0) + ENROLLMENT_WEIGHT
+    for user_id, event_id, count in (assigned.values('user_id', 'taskinfo__event_id')
+                                     .annotate(count=Count('id')).order_by()
+                                     .values_list('user_id', 'taskinfo__event_id', 'count')):
+        weights[(user_id, event_id)] = weights.get((user_id, event_id), 0.0) + ASSIGNMENT_WEIGHT * count
+
+    if not weights:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    pairs = np.array(list(weights), dtype=np.int64)
+    return pairs[:, 0], pairs[:, 1], np.log1p(np.fromiter(weights.values(), dtype=np.float32))
+
+
+def _matrix(rows, columns, weights, row_ids, column_ids):
+    """Sparse matrix of the interactions whose row and column ids are in the (sorted) id arrays."""
+    keep = np.isin(rows, row_ids) & np.isin(columns, column_ids)
+    return csr_matrix(
+        (weights[keep], (np.searchsorted(row_ids, rows[keep]), np.searchsorted(column_ids, columns[keep]))),
+        shape=(len(row_ids), len(column_ids)), dtype=np.float32
+    )
+
+
+class CFModel:
+    """Truncated SVD factors: sorted user and event ids, U, S and V."""
+
+    def __init__(self, user_ids, user_factors, singular_values, event_ids, event_factors,
+                 trained_at, interaction_count):
+        self.user_ids = user_ids
+        self.user_factors = user_factors
+        self.singular_values = singular_values
+        self.event_ids = event_ids
+        self.event_factors = event_factors
+        self.trained_at = trained_at
+        self.interaction_count = interaction_count
+
+    @property
+    def stamp(self):
+        """Changes whenever the factors do; part of recommendation cache keys."""
+        return f"{self.trained_at}:{len(self.event_ids)}"
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.tmp.npz'
+        np.savez(temporary, user_ids=self.user_ids, user_factors=self.user_factors,
+                 singular_values=self.singular_values, event_ids=self.event_ids,
+                 event_factors=self.event_factors, trained_at=self.trained_at,
+                 interaction_count=self.interaction_count)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['user_ids'], data['user_factors'], data['singular_values'],
+                       data['event_ids'], data['event_factors'], str(data['trained_at']),
+                       int(data['interaction_count']))
+
+    def user_scores(self, interaction_matrix):
+        """
+        Scores of every model event for each row of ``interaction_matrix``
+        (sparse, columns in ``event_ids`` order), each row scaled to at most 1.
+        """
+        scores = np.asarray((interaction_matrix @ self.event_factors) @ self.event_factors.T)
+        best = np.abs(scores).max(axis=1, keepdims=True)
+        best[best == 0] = 1.0
+        return np.clip(scores / best, 0.0, None)
+
+
+def train(factors=32):
+    """Full retrain. Returns the new model, or None without enough interactions."""
+    rows, columns, weights = interactions()
+    user_ids, event_ids = np.unique(rows), np.unique(columns)
+    k = min(factors, len(user_ids) - 1, len(event_ids) - 1)
+    if k < 1:
+        return None
+    matrix = _matrix(rows, columns, weights, user_ids, event_ids)
+    u, s, vt = svds(matrix, k=k, random_state=0)
+    order = np.argsort(-s)
+    return CFModel(user_ids, u[:, order].astype(np.float32), s[order].astype(np.float32),
+                   event_ids, vt[order].T.astype(np.float32),
+                   timezone.now().isoformat(), len(weights))
+
+
+def fold_in_events(model):
+    """
+    Add factors for events that gained interactions since training, from the
+    interactions of users already in the model. Returns the number added.
+    """
+    rows, columns, weights = interactions(model.user_ids.tolist())
+    new_ids = np.setdiff1d(np.unique(columns), model.event_ids)
+    if not len(new_ids):
+        return 0
+    matrix = _matrix(columns, rows, weights, new_ids, model.user_ids)
+    factors = np.asarray(matrix @ model.user_factors) / model.singular_values
+    event_ids = np.concatenate([model.event_ids, new_ids])
+    order = np.argsort(event_ids)
+    model.event_ids = event_ids[order]
+    model.event_factors = np.vstack([model.event_factors, factors.astype(np.float32)])[order]
+    model.trained_at = timezone.now().isoformat()
+    return len(new_ids)
+
+
+_model = None
+_model_mtime = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """The saved model, reloaded when the file changes; None when there is none."""
+    global _model, _model_mtime
+    path = model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if mtime != _model_mtime:
+        with _model_lock:
+            if mtime != _model_mtime:
+                _model = CFModel.load(path)
+                _model_mtime = mtime
+    return _model
+
+
+def model_stamp():
+    model = get_model()
+    return model.stamp if model else None
+
+
+def score_matrix(user_ids, event_ids):
+    """
+    ``(scores, has_history)`` for sorted ``user_ids`` x ``event_ids``. Scores
+    are 0..1, and 0 for events the model does not know; ``has_history`` flags
+    the users with at least one interaction the model knows.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    event_ids = np.asarray(event_ids, dtype=np.int64)
+    scores = np.zeros((len(user_ids), len(event_ids)), dtype=np.float32)
+    model = get_model()
+    if model is None or not len(model.event_ids) or not len(user_ids):
+        return scores, np.zeros(len(user_ids), dtype=bool)
+
+    rows, columns, weights = interactions(user_ids.tolist())
+    matrix = _matrix(rows, columns, weights, user_ids, model.event_ids)
+    has_history = np.diff(matrix.indptr) > 0
+    if len(event_ids) and has_history.any():
+        model_scores = model.user_scores(matrix)
+        positions = np.minimum(np.searchsorted(model.event_ids, event_ids), len(model.event_ids) - 1)
+        known = model.event_ids[positions] == event_ids
+        scores[:, known] = model_scores[:, positions[known]]
+    return scores, has_history
+
+
+def scores_for_user(user_id, event_ids):
+    """``{event_id: 0..1}`` for the given events; empty without a model or history."""
+    scores, has_history = score_matrix([user_id], event_ids)
+    if not has_history[0]:
+        return {}
+    return {event_id: float(score) for event_id, score in zip(event_ids, scores[0])}
+
+
+def blend(content_score, cf_score, weight=None):
+    if weight is None:
+        weight = getattr(settings, 'CF_BLEND_WEIGHT', 0.3)
+    return (1 - weight) * content_score + weight * cf_score
@@ -0,0 +1,362 @@
+"""
+Semantic and hybrid event search over precomputed embeddings.
+
+Event vectors are computed ahead of time by ``manage.py embed_events`` and
+stored in ``EventEmbedding``. Each process loads them once into a single
+L2-normalised float32 matrix, so ranking a query is one matrix-vector product
+(a few milliseconds for 50k events on CPU) instead of embedding every event
+per request. New and edited events are embedded by a background job queued
+when they are saved (``SEMANTIC_SEARCH_EMBED_ON_SAVE``); until a worker has
+run it, semantic search finds a new event by keyword, scored as hybrid search
+scores a keyword-only hit.
+
+The ids a search is restricted to (its visibility filter) are cached per
+filter in each process until an event is saved or deleted, so a query does
+not read the id of every visible event.
+
+Hybrid search blends cosine similarity with the bm25 score of the event
+full-text index (``app_eventinfo_fts``), so exact keyword matches still rank
+well when the embedding misses them.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Prefetch
+
+from ..models import EventEmbedding, TaskInfo, VolunteerEmbedding
+from ..services.cache_versions import bump_generation, get_generation
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def model_name():
+    return getattr(settings, 'SEMANTIC_SEARCH_MODEL', DEFAULT_MODEL)
+
+
+def event_text(event, tasks):
+    """The text that represents an event, in the same form the recommenders use."""
+    text = f"{event.event_name}. {event.overview}. {event.description}"
+    if event.location:
+        text += f" Location: {event.location}"
+    task_texts = []
+    for task in tasks:
+        task_text = f"{task.task_name}. {task.description}"
+        if task.required_skills:
+            task_text += f" Skills: {task.required_skills}"
+        task_texts.append(task_text)
+    if task_texts:
+        text += " Tasks: " + " | ".join(task_texts)
+    return text
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embed_query(text):
+    """Embed a search query with the shared (cached) embedding model."""
+    from .loader import recommender
+    return _normalise(recommender().embed_text(text, model_name()))
+
+
+def embed_documents(texts):
+    """Embed many texts in one model call."""
+    from .loader import recommender
+    return _normalise(recommender().get_embedding_model(model_name()).embed_documents(list(texts)))
+
+
+def embed_events(events, force=False, batch_size=64, on_batch=None):
+    """
+    Embed and store the events of queryset ``events`` whose text changed since
+    they were last embedded (all of them with ``force``). ``on_batch(done,
+    total)`` is called after each stored batch. Returns the number embedded.
+    """
+    name = model_name()
+    existing = dict(EventEmbedding.objects.filter(model_name=name, event__in=events)
+                    .values_list('event_id', 'text_hash'))
+    events = events.prefetch_related(Prefetch('tasks', queryset=TaskInfo.objects.order_by('id'))).order_by('id')
+
+    pending = []
+    for event in events.iterator(chunk_size=500):
+        text = event_text(event, event.tasks.all())
+        digest = text_hash(text)
+        if force or existing.get(event.id) != digest:
+            pending.append((event.id, text, digest))
+
+    for offset in range(0, len(pending), batch_size):
+        batch = pending[offset:offset + batch_size]
+        vectors = embed_documents([text for _, text, _ in batch])
+        for (event_id, _, digest), vector in zip(batch, vectors):
+            EventEmbedding.objects.update_or_create(
+                event_id=event_id,
+                defaults={
+                    'model_name': name,
+                    'dimensions': len(vector),
+                    'vector': vector.astype(np.float32).tobytes(),
+                    'text_hash': digest,
+                }
+            )
+        if on_batch:
+            on_batch(offset + len(batch), len(pending))
+    return len(pending)
+
+
+def volunteer_vectors(users, batch_size=64):
+    """
+    Normalised skill vectors of ``users`` (a ``len(users) x dimensions``
+    matrix, in order). Stored vectors are reused while the skills are
+    unchanged; the rest are embedded in batches, each distinct skills text
+    once, and stored for next time.
+    """
+    name = model_name()
+    stored = {
+        user_id: (digest, vector)
+        for user_id, digest, vector in VolunteerEmbedding.objects.filter(
+            model_name=name, user_id__in=[user.id for user in users]
+        ).values_list('user_id', 'text_hash', 'vector')
+    }
+
+    vectors = [None] * len(users)
+    missing = {}
+    for i, user in enumerate(users):
+        digest, vector = stored.get(user.id, (None, None))
+        if digest is not None and digest == text_hash(user.skills):
+            vectors[i] = np.frombuffer(bytes(vector), dtype=np.float32)
+        else:
+            missing.setdefault(user.skills, []).append(i)
+
+    if missing:
+        texts = list(missing)
+        embedded = np.vstack([embed_documents(texts[offset:offset + batch_size])
+                              for offset in range(0, len(texts), batch_size)])
+        changed = []
+        for text, vector in zip(texts, embedded):
+            for i in missing[text]:
+                vectors[i] = vector
+                changed.append(VolunteerEmbedding(
+                    user_id=users[i].id, model_name=name, dimensions=len(vector),
+                    vector=vector.astype(np.float32).tobytes(), text_hash=text_hash(text)
+                ))
+        VolunteerEmbedding.objects.bulk_create(
+            changed, batch_size=500, update_conflicts=True, unique_fields=['user'],
+            update_fields=['model_name', 'dimensions', 'vector', 'text_hash', 'updated_at']
+        )
+
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    return _normalise(np.vstack(vectors))
+
+
+class EventVectorIndex:
+    """In-memory matrix of all event embeddings for one model."""
+
+    def __init__(self, name, refresh_seconds=30):
+        self.name = name
+        self.refresh_seconds = refresh_seconds
+        self.event_ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        stats = EventEmbedding.objects.filter(model_name=self.name).aggregate(
+            count=Count('id'), updated=Max('updated_at')
+        )
+        return stats['count'], stats['updated']
+
+    def refresh(self, force=False):
+        """Reload the matrix if embeddings changed (checked at most every refresh_seconds)."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_seconds:
+                return
+            version = self._current_version()
+            if force or version != self._version:
+                rows = list(EventEmbedding.objects.filter(model_name=self.name)
+                            .order_by('event_id').values_list('event_id', 'dimensions', 'vector'))
+                if rows:
+                    dimensions = rows[0][1]
+                    rows = [row for row in rows if row[1] == dimensions]
+                    matrix = np.frombuffer(b''.join(bytes(row[2]) for row in rows), dtype=np.float32)
+                    self.matrix = _normalise(matrix.reshape(len(rows), dimensions))
+                    self.event_ids = np.array([row[0] for row in rows], dtype=np.int64)
+                else:
+                    self.matrix = np.empty((0, 0), dtype=np.float32)
+                    self.event_ids = np.empty(0, dtype=np.int64)
+                self._version = version
+            self._checked_at = now
+
+    def __len__(self):
+        return len(self.event_ids)
+
+    def similarities(self, query_vector, allowed_ids=None):
+        """
+        Return ``(event_ids, cosine similarities)``, optionally restricted to
+        ``allowed_ids`` (an array of distinct ids, see ``allowed_event_ids``).
+        """
+        self.refresh()
+        event_ids, matrix = self.event_ids, self.matrix
+        if not len(event_ids):
+            return event_ids, np.empty(0, dtype=np.float32)
+        scores = matrix @ query_vector.astype(np.float32)
+        if allowed_ids is not None:
+            mask = np.isin(event_ids, allowed_ids, assume_unique=True)
+            return event_ids[mask], scores[mask]
+        return event_ids, scores
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    name = model_name()
+    with _indexes_lock:
+        if name not in _indexes:
+            _indexes[name] = EventVectorIndex(name, getattr(settings, 'SEMANTIC_SEARCH_REFRESH_SECONDS', 30))
+        return _indexes[name]
+
+
+EVENTS_GENERATION = 'event_search:events'
+ALLOWED_IDS_CACHE_SIZE = 64
+
+_allowed_ids = OrderedDict()
+_allowed_ids_lock = threading.Lock()
+
+
+def invalidate_allowed_ids():
+    """Called when an event is saved or deleted: every filter may now match other events"""
+    bump_generation(EVENTS_GENERATION)
+
+
+def allowed_event_ids(events):
+    """
+    Ids of the events in queryset ``events``, as an int64 array. Cached per
+    filter (the queryset's SQL) until an event is saved or deleted.
+    """
+    sql, params = events.order_by().values('id').query.sql_with_params()
+    key = (sql, repr(params))
+    generation = get_generation(EVENTS_GENERATION)
+    with _allowed_ids_lock:
+        cached = _allowed_ids.get(key)
+        if cached is not None and cached[0] == generation:
+            _allowed_ids.move_to_end(key)
+            return cached[1]
+
+    ids = np.fromiter(events.order_by().values_list('id', flat=True), dtype=np.int64)
+    with _allowed_ids_lock:
+        _allowed_ids[key] = (generation, ids)
+        _allowed_ids.move_to_end(key)
+        while len(_allowed_ids) > ALLOWED_IDS_CACHE_SIZE:
+            _allowed_ids.popitem(last=False)
+    return ids
+
+
+def keyword_scores(query, events, limit):
+    """
+    bm25 scores of events matching any word of ``query``, scaled to 0..1
+    (1 is the best match). Returns ``{event_id: score}``.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return {}
+
+    if connection.vendor != 'sqlite':
+        from django.db.models import Q
+        condition = Q()
+        for word in words:
+            condition |= (Q(event_name__icontains=word) | Q(overview__icontains=word) |
+                          Q(description__icontains=word) | Q(location__icontains=word))
+        return {event_id: 1.0 for event_id in events.filter(condition).values_list('id', flat=True)[:limit]}
+
+    match = ' OR '.join(f'"{word}"' for word in words)
+    scope_sql, scope_params = events.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        # Name matches weigh most, then overview, description and location
+        cursor.execute(
+            "SELECT rowid, bm25(app_eventinfo_fts, 10.0, 4.0, 1.0, 2.0) AS rank "
+            "FROM app_eventinfo_fts "
+            f"WHERE app_eventinfo_fts MATCH %s AND rowid IN ({scope_sql}) "
+            "ORDER BY rank LIMIT %s",
+            [match, *scope_params, limit]
+        )
+        rows = cursor.fetchall()
+    if not rows:
+        return {}
+    # bm25 is negative with lower meaning better
+    best = -rows[0][1] or 1.0
+    return {event_id: max(-rank, 0.0) / best for event_id, rank in rows}
+
+
+def _top_k(scores, k):
+    """Indices of the ``k`` highest scores, best first, without sorting everything."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def search_events(query, events, mode='semantic', limit=10, alpha=0.7):
+    """
+    Rank the events of queryset ``events`` for ``query``.
+
+    ``mode`` is ``'semantic'`` (cosine similarity only), ``'keyword'`` (bm25
+    only) or ``'hybrid'`` (``alpha * cosine + (1 - alpha) * bm25``). Returns a
+    list of ``(event_id, score, semantic_score, keyword_score)`` best first.
+    """
+    candidates = max(limit * 5, 100)
+
+    keyword = {}
+    if mode in ('keyword', 'hybrid'):
+        keyword = keyword_scores(query, events, candidates)
+        if mode == 'keyword':
+            ranked = sorted(keyword.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [(event_id, score, None, score) for event_id, score in ranked]
+
+    event_ids, similarities = get_index().similarities(embed_query(query), allowed_event_ids(events))
+
+    if mode == 'semantic':
+        top = _top_k(similarities, limit)
+        results = [(int(event_ids[i]), float(similarities[i]), float(similarities[i]), None) for i in top]
+        # Events saved since the last embedding run are found by keyword until they are embedded
+        unembedded = events.exclude(id__in=EventEmbedding.objects.filter(model_name=model_name()).values('event_id'))
+        results += [(event_id, (1 - alpha) * score, None, score)
+                    for event_id, score in keyword_scores(query, unembedded, limit).items()]
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:limit]
+
+    # Hybrid: the best semantic candidates plus every keyword hit
+    semantic = {int(event_ids[i]): float(similarities[i]) for i in _top_k(similarities, candidates)}
+    missing = np.array([event_id for event_id in keyword if event_id not in semantic], dtype=np.int64)
+    if len(missing) and len(event_ids):
+        # event_ids is sorted, so keyword-only hits are found by binary search
+        positions = np.minimum(np.searchsorted(event_ids, missing), len(event_ids) - 1)
+        for event_id, position in zip(missing, positions):
+            if event_ids[position] == event_id:
+                semantic[int(event_id)] = float(similarities[position])
+
+    results = []
+    for event_id in set(semantic) | set(keyword):
+        semantic_score = semantic.get(event_id, 0.0)
+        keyword_score = keyword.get(event_id, 0.0)
+        score = alpha * max(semantic_score, 0.0) + (1 - alpha) * keyword_score
+        results.append((event_id, score, semantic_score, keyword_score))
+    results.sort(key=lambda result: result[1], reverse=True)
+    return results[:limit]
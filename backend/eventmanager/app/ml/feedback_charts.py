@@ -1,10 +1,48 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
+import os
 
-def plot_event_charts():
+from .chart_engine import bar_chart, pie_chart, render_many
+
+def plot_event_charts(feedback_data, task_data, output_dir='.'):
+    """
+    Save the feedback and task charts of an event as PNG files in output_dir.
+    feedback_data maps each rating field (and would_volunteer_again) to a list
+    of values; task_data has task_name, volunteer_efficiency and volunteers lists.
+    Returns the paths written.
+    """
+    metrics = [field for field in feedback_data if field != "would_volunteer_again"]
+    averages = [sum(feedback_data[field]) / len(feedback_data[field]) if feedback_data[field] else 0
+                for field in metrics]
+    would_volunteer = sum(1 for value in feedback_data.get("would_volunteer_again", []) if value)
+    would_not_volunteer = len(feedback_data.get("would_volunteer_again", [])) - would_volunteer
+
+    charts = {
+        # 1. Histogram: Average Ratings for Feedback Metrics
+        "average_ratings": bar_chart("Average Volunteer Ratings for Event", metrics, averages,
+                                     xlabel="Feedback Criteria", ylabel="Average Rating (1-10)"),
+        # 2. Pie Chart: Volunteers Who Would Volunteer Again
+        "volunteer_willingness": pie_chart("Volunteer Willingness to Participate Again", ["Yes", "No"],
+                                           [would_volunteer, would_not_volunteer],
+                                           colors=['lightgreen', 'lightcoral']),
+        # 3. Histogram: Average Volunteer Efficiency Per Task
+        "volunteer_efficiency": bar_chart("Average Volunteer Efficiency per Task", task_data["task_name"],
+                                          task_data["volunteer_efficiency"], xlabel="Tasks",
+                                          ylabel="Average Efficiency", color='lightblue'),
+        # 4. Histogram: Number of Volunteers per Task
+        "volunteers_per_task": bar_chart("Number of Volunteers Assigned to Each Task", task_data["task_name"],
+                                         task_data["volunteers"], xlabel="Tasks",
+                                         ylabel="Number of Volunteers", color='orange'),
+    }
+
+    paths = []
+    for name, image in render_many(charts, 'png', dpi=300, tight=True).items():
+        path = os.path.join(output_dir, f"{name}.png")
+        with open(path, 'wb') as output:
+            output.write(image)
+        paths.append(path)
+    return paths
+
+if __name__ == '__main__':
     # Sample Feedback Data
-    '''
     feedback_data = {
         "overall_experience": [8, 9, 7, 6, 9],
         "organization_quality": [7, 8, 8, 9, 6],
@@ -18,7 +56,6 @@ def plot_event_charts():
         "recognition": [7, 9, 8, 7, 9],
         "would_volunteer_again": [1, 1, 0, 1, 1]
     }
-    feedback_df = pd.DataFrame(feedback_data)
 
     # Sample Task Data
     task_data = {
@@ -26,58 +63,6 @@ def plot_event_charts():
         "volunteer_efficiency": [85, 78, 82, 88, 75],
         "volunteers": [10, 12, 8, 9, 6]
     }
-    task_df = pd.DataFrame(task_data)
-'''
-    # 1. Histogram: Average Ratings for Feedback Metrics
-    metrics = list(feedback_data.keys())[:-1]
-    avg_ratings = feedback_df[metrics].mean()
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(avg_ratings.index, avg_ratings.values, color='skyblue')
-    plt.xlabel("Feedback Criteria")
-    plt.ylabel("Average Rating (1-10)")
-    plt.title("Average Volunteer Ratings for Event")
-    plt.xticks(rotation=45)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.savefig("average_ratings.png", dpi=300, bbox_inches='tight')
-    plt.show()
-
-    # 2. Pie Chart: Volunteers Who Would Volunteer Again
-    volunteer_again_counts = feedback_df["would_volunteer_again"].value_counts()
-    labels = ["Yes", "No"]
-    colors = ['lightgreen', 'lightcoral']
-
-    plt.figure(figsize=(6, 6))
-    plt.pie(volunteer_again_counts, labels=labels, autopct='%1.1f%%', colors=colors, startangle=140)
-    plt.title("Volunteer Willingness to Participate Again")
-    plt.savefig("volunteer_willingness.png", dpi=300, bbox_inches='tight')
-    plt.show()
-
-    # 3. Histogram: Average Volunteer Efficiency Per Task
-    avg_efficiency = task_df.set_index("task_name")["volunteer_efficiency"]
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(avg_efficiency.index, avg_efficiency.values, color='lightblue')
-    plt.xlabel("Tasks")
-    plt.ylabel("Average Efficiency")
-    plt.title("Average Volunteer Efficiency per Task")
-    plt.xticks(rotation=45)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.savefig("volunteer_efficiency.png", dpi=300, bbox_inches='tight')
-    plt.show()
-
-    # 4. Histogram: Number of Volunteers per Task
-    volunteers_per_task = task_df.set_index("task_name")["volunteers"]
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(volunteers_per_task.index, volunteers_per_task.values, color='orange')
-    plt.xlabel("Tasks")
-    plt.ylabel("Number of Volunteers")
-    plt.title("Number of Volunteers Assigned to Each Task")
-    plt.xticks(rotation=45)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.savefig("volunteers_per_task.png", dpi=300, bbox_inches='tight')
-    plt.show()
 
-# Execute the function with sample data
-plot_event_charts()
+    # Execute the function with sample data
+    plot_event_charts(feedback_data, task_data)
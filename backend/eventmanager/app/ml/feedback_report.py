@@ -1,8 +1,7 @@
 import json
-import matplotlib.pyplot as plt
-from textblob import TextBlob
 
 def analyze_sentiment(feedback_list):
+    from textblob import TextBlob
     all_feedback_text = " ".join([f["strengths"] + " " + f["improvements"] + " " + f["additional_comments"] for f in feedback_list])
     sentiment_score = TextBlob(all_feedback_text).sentiment.polarity
     if sentiment_score > 0.2:
@@ -30,10 +29,15 @@ def generate_swot_analysis(feedback_list, task_analysis):
     threats = ["Lack of tools", "Coordination issues", task_analysis]
     return strengths, weaknesses, opportunities, threats
 
-def generate_event_report(event, feedback_list, task_list, subtask_list):
-    avg_ratings = calculate_average_ratings(feedback_list)
-    completed_tasks, total_tasks, completed_subtasks, total_subtasks = analyze_tasks(task_list, subtask_list)
-    sentiment = analyze_sentiment(feedback_list)
+# sentiment: the event's precomputed summary (services/feedback_sentiment.py); analysed here if missing
+# ratings: average ratings from the event's feedback rollup (services/feedback_rollup.py); computed here if missing
+# task_counts: (completed tasks, tasks, completed subtasks, subtasks) counted by the database; counted here if missing
+# volunteer_willingness: feedback that would volunteer again, from the rollup; counted here if missing
+def generate_event_report(event, feedback_list, task_list, subtask_list, sentiment=None, ratings=None,
+                          task_counts=None, volunteer_willingness=None):
+    avg_ratings = {field: round(value, 2) for field, value in ratings.items()} if ratings is not None else calculate_average_ratings(feedback_list)
+    completed_tasks, total_tasks, completed_subtasks, total_subtasks = task_counts or analyze_tasks(task_list, subtask_list)
+    sentiment_label = sentiment["label"] if sentiment else analyze_sentiment(feedback_list)
     strengths, weaknesses, opportunities, threats = generate_swot_analysis(feedback_list, event["task_analysis"])
     
     report = {
@@ -52,7 +56,8 @@ def generate_event_report(event, feedback_list, task_list, subtask_list):
             "strengths": strengths,
             "improvements": weaknesses,
             "additional_comments": [f["additional_comments"] for f in feedback_list],
-            "sentiment_analysis": sentiment
+            "sentiment_analysis": sentiment_label,
+            "sentiment_details": sentiment
         },
         "task_performance": {
             "tasks_completed": completed_tasks,
@@ -63,7 +68,7 @@ def generate_event_report(event, feedback_list, task_list, subtask_list):
             "task_notifications": [task["notification_message"] for task in task_list]
         },
         "ratings": avg_ratings,
-        "volunteer_willingness": sum(1 for f in feedback_list if f["would_volunteer_again"]),
+        "volunteer_willingness": volunteer_willingness if volunteer_willingness is not None else sum(1 for f in feedback_list if f["would_volunteer_again"]),
         "swot_analysis": {
             "strengths": strengths,
             "weaknesses": weaknesses,
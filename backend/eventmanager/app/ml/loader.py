@@ -0,0 +1,163 @@
+"""
+Lazy loading and warm-up of the ML stack.
+
+Importing the recommenders pulls in langchain, sentence-transformers and
+torch, which takes seconds and a lot of memory, and every process (including
+``manage.py migrate`` and test runs) used to pay for it through the URL
+configuration. Code now asks ``recommender()`` for the module on first use.
+
+Server processes (see ``wsgi.py`` and ``asgi.py``) can also start a background
+warm-up when ``ML_WARM_UP`` is set: it imports the module, loads the embedding
+model and embeds the skill vocabulary, so the first request does not wait for
+them. ``status()`` reports the state of this process for ``ml/status/``.
+
+``state`` describes the import: FAILED means the module cannot be used at all.
+A model that fails to load after a successful import leaves the state at
+IMPORTED, since ``recommender()`` still works and the model is loaded again on
+first use, and is reported as ``model_error``.
+"""
+import importlib
+import threading
+import time
+
+from django.conf import settings
+
+RECOMMENDER_MODULE = 'app.ml.event_recommendation_for_volunteers'
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+IMPORTED = 'imported'
+READY = 'ready'
+FAILED = 'failed'
+
+_lock = threading.Lock()
+_warm_up_lock = threading.Lock()
+_module = None
+_state = {
+    'state': NOT_LOADED,
+    'error': None,
+    'model_error': None,
+    'timings': {},
+    'warm_up_started_at': None,
+    'ready_at': None,
+}
+
+
+def _timed(step, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    _state['timings'][step] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def recommender():
+    """
+    The recommender module, imported on first use. Raises ImportError when
+    the ML stack is not installed (or failed to import earlier).
+    """
+    global _module
+    if _module is not None:
+        return _module
+    with _lock:
+        if _module is None:
+            if _state['state'] == FAILED:
+                raise ImportError(_state['error'])
+            _state['state'] = LOADING
+            try:
+                module = _timed('import_seconds', importlib.import_module, RECOMMENDER_MODULE)
+            except Exception as e:
+                _state['state'] = FAILED
+                _state['error'] = f"{type(e).__name__}: {str(e)}"
+                print(f"Error importing ML modules: {str(e)}")
+                raise ImportError(_state['error']) from e
+            _module = module
+            _state['state'] = IMPORTED
+    return _module
+
+
+def available():
+    """Whether the ML stack can be used (imports it if needed)"""
+    try:
+        recommender()
+        return True
+    except ImportError:
+        return False
+
+
+def warm_up(retry=False):
+    """Import the recommender, load the embedding model and embed the skill vocabulary."""
+    from .embedding_store import model_name
+
+    with _warm_up_lock:
+        if retry and _state['state'] == FAILED:
+            with _lock:
+                _state['state'] = NOT_LOADED
+                _state['error'] = None
+        try:
+            module = recommender()
+        except ImportError:
+            return False
+        _state['model_error'] = None
+        _state['state'] = LOADING
+        try:
+            _timed('model_load_seconds', module.get_embedding_model, model_name())
+            _timed('skill_vocabulary_seconds', module.get_cached_skill_embeddings, model_name())
+        except Exception as e:
+            # The module itself imported fine and stays usable
+            _state['state'] = IMPORTED
+            _state['model_error'] = f"{type(e).__name__}: {str(e)}"
+            print(f"Error warming up ML models: {str(e)}")
+            return False
+        _state['state'] = READY
+        _state['ready_at'] = time.time()
+        return True
+
+
+_warm_up_thread = None
+_thread_lock = threading.Lock()
+
+
+def start_warm_up(force=False):
+    """Warm up on a background thread, once per process, if ML_WARM_UP is set (or ``force``)."""
+    global _warm_up_thread
+    if not (force or getattr(settings, 'ML_WARM_UP', False)):
+        return False
+    with _thread_lock:
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return False
+        if _state['state'] == READY:
+            return False
+
+        def run():
+            time.sleep(getattr(settings, 'ML_WARM_UP_DELAY_SECONDS', 0))
+            warm_up(retry=force)
+
+        _state['warm_up_started_at'] = time.time()
+        _warm_up_thread = threading.Thread(target=run, name='ml-warm-up', daemon=True)
+        _warm_up_thread.start()
+        return True
+
+
+def status():
+    module = _module
+    model_loaded = bool(module is not None and getattr(module, '_MODEL_INSTANCE', None) is not None)
+    state = _state['state']
+    if state == IMPORTED and model_loaded:
+        # Loaded on first use rather than by the warm-up
+        state = READY
+    warm_up_enabled = bool(getattr(settings, 'ML_WARM_UP', False))
+    return {
+        'state': state,
+        'ready': state == READY,
+        # Without a warm-up the models load on first use, so there is nothing to wait for
+        'warm_up_pending': warm_up_enabled and state not in (READY, FAILED) and not _state['model_error'],
+        'model_loaded': model_loaded,
+        'skill_vocabulary_embedded': bool(module is not None and getattr(module, '_SKILL_EMBEDDINGS_CACHE', None)),
+        'warming_up': bool(_warm_up_thread is not None and _warm_up_thread.is_alive()),
+        'warm_up_enabled': warm_up_enabled,
+        'error': _state['error'],
+        'model_error': _state['model_error'],
+        'timings': dict(_state['timings']),
+        'warm_up_started_at': _state['warm_up_started_at'],
+        'ready_at': _state['ready_at'],
+    }
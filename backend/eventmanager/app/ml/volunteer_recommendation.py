@@ -1,57 +1,63 @@
-import pandas as pd
+import functools
+
 import numpy as np
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import pipeline
 
-def extract_skills_from_task(task, model_name="sentence-transformers/all-MiniLM-L6-v2"):
+from . import embedding_store
+from .loader import recommender
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Predefined skill set
+SKILLS = ["ai-ml", "data science", "development", "finance", "management", "marketing", "sales", "deep learning", "statistics"]
+
+
+@functools.lru_cache(maxsize=4)
+def _skill_embeddings(model_name):
+    return embedding_store._normalise(recommender().get_embedding_model(model_name).embed_documents(SKILLS))
+
+
+def extract_skills_from_task(task, model_name=DEFAULT_MODEL):
     """
-    Extract relevant skill tags from the task description using an LLM.
+    Extract relevant skill tags from the task description: the 3 predefined
+    skills closest to it. Uses the shared embedding model and cached vectors.
     """
-    embedding_model = HuggingFaceEmbeddings(model_name=model_name)
-    skills = ["ai-ml", "data science", "development", "finance", "management", "marketing", "sales", "deep learning", "statistics"]  # Predefined skill set
-    skill_embeddings = embedding_model.embed_documents(skills)
-    task_embedding = embedding_model.embed_query(task)
-    
-    similarities = cosine_similarity([task_embedding], skill_embeddings)[0]
-    relevant_skills = [skills[i] for i in np.argsort(similarities)[-3:][::-1]]  # Top 3 relevant skills
-    
-    return relevant_skills
-
-def recommend_volunteers(task, num_required, volunteers_df, model_name="sentence-transformers/all-MiniLM-L6-v2", similarity_threshold=0.6):
+    task_embedding = embedding_store._normalise(recommender().embed_text(task, model_name))
+    similarities = _skill_embeddings(model_name) @ task_embedding
+    return [SKILLS[i] for i in np.argsort(similarities)[-3:][::-1]]  # Top 3 relevant skills
+
+
+def task_query(task, model_name=DEFAULT_MODEL):
+    """The normalised query vector of a task description, plus the skill tags added to it."""
+    skill_tags = extract_skills_from_task(task, model_name)
+    return embedding_store._normalise(recommender().embed_text(task + ' ' + ' '.join(skill_tags), model_name)), skill_tags
+
+
+def rank_volunteers(query_vector, volunteer_vectors, num_required, similarity_threshold=0.6):
+    """
+    Rows of ``volunteer_vectors`` (normalised) to recommend and their cosine
+    similarity, best first: everyone at or above the threshold, but at least
+    ``2 * num_required`` volunteers when there are that many.
+    """
+    if not len(volunteer_vectors):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    similarities = volunteer_vectors @ query_vector
+    order = np.argsort(-similarities, kind='stable')
+    count = max(int((similarities >= similarity_threshold).sum()), num_required * 2)
+    top = order[:count]
+    return top, similarities[top]
+
+
+def recommend_volunteers(task, num_required, volunteers_df, model_name=DEFAULT_MODEL, similarity_threshold=0.6):
     """
     Recommend volunteers based on task description by automatically extracting required skills.
+    ``volunteers_df`` has 'Name' and 'Skills' columns; returns names, best first.
     """
-    # Extract relevant skills
-    skill_tags = extract_skills_from_task(task, model_name)
-    
-    # Initialize embedding model
-    embedding_model = HuggingFaceEmbeddings(model_name=model_name)
-    
-    # Compute embeddings for volunteer skills
+    query_vector, _ = task_query(task, model_name)
     skill_texts = volunteers_df['Skills'].tolist()
-    skill_embeddings = embedding_model.embed_documents(skill_texts)
-    
-    # Compute query embedding
-    query = task + ' ' + ' '.join(skill_tags)
-    query_embedding = embedding_model.embed_query(query)
-    
-    # Compute cosine similarities
-    similarities = cosine_similarity([query_embedding], skill_embeddings)[0]
-    
-    # Get top relevant volunteers
-    volunteer_scores = list(zip(volunteers_df['Name'], similarities))
-    sorted_volunteers = sorted(volunteer_scores, key=lambda x: x[1], reverse=True)
-    
-    # Filter volunteers based on similarity threshold
-    recommended_volunteers = [name for name, score in sorted_volunteers if score >= similarity_threshold]
-    
-    # Ensure at least 2 * num_required volunteers are recommended
-    if len(recommended_volunteers) < num_required * 2:
-        recommended_volunteers = [name for name, _ in sorted_volunteers[:num_required * 2]]
-    
-    return recommended_volunteers
+    vectors = embedding_store._normalise(recommender().get_embedding_model(model_name).embed_documents(skill_texts))
+    top, _ = rank_volunteers(query_vector, vectors, num_required, similarity_threshold)
+    names = volunteers_df['Name'].tolist()
+    return [names[i] for i in top]
 
 # Example usage
 '''data = {
@@ -321,11 +321,17 @@ class Feedback(models.Model):
     
     would_volunteer_again = models.BooleanField(default=True, help_text="Would you volunteer for a similar event in the future?")
     
+    # Scored in the background after the feedback is saved (see services/feedback_sentiment.py).
+    # Edit saved feedback with save(update_fields=...): a full save of an instance loaded
+    # before the score was written would clear it
+    sentiment_polarity = models.FloatField(null=True, blank=True, editable=False)
+    sentiment_subjectivity = models.FloatField(null=True, blank=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Feedback by {self.user.name} for {self.event.event_name}"
-    
+
     @property
     def average_rating(self):
         """Calculate the average rating across all numeric feedback fields"""
@@ -366,6 +372,10 @@ class Chat(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination over (timestamp, id) within a task chat
+            models.Index(fields=['task', 'timestamp'], name='chat_task_timestamp_idx'),
+        ]
 
     def __str__(self):
         try:
@@ -394,6 +404,10 @@ class EventChat(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination over (timestamp, id) within an event chat
+            models.Index(fields=['event', 'timestamp'], name='eventchat_event_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"Message by {self.user.name} in {self.event.event_name}"
@@ -401,4 +415,200 @@ class EventChat(models.Model):
     def save(self, *args, **kwargs):
         # Auto-set is_host based on the user's status
         self.is_host = self.user.isHost
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class ChatReadMarker(models.Model):
+    """How far a user has read an event or task chat"""
+    CONVERSATION_TYPE_CHOICES = [
+        ('event', 'Event Chat'),
+        ('task', 'Task Chat'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_read_markers')
+    conversation_type = models.CharField(max_length=10, choices=CONVERSATION_TYPE_CHOICES)
+    conversation_id = models.PositiveIntegerField(help_text="ID of the event or task whose chat this marker tracks")
+    last_read_id = models.PositiveBigIntegerField(default=0, help_text="ID of the newest message the user has read")
+    unread_count = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Unread messages, kept up to date on write for small conversations; "
+                  "null means it is counted on read"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # One marker per user per conversation; also serves the per-user badge lookup
+        unique_together = ['user', 'conversation_type', 'conversation_id']
+        indexes = [
+            # Fan-out updates touch every marker of one conversation
+            models.Index(fields=['conversation_type', 'conversation_id'], name='readmarker_conversation_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.name} read {self.conversation_type} {self.conversation_id} up to {self.last_read_id}"
+
+
+class EventEmbedding(models.Model):
+    """Precomputed embedding of an event's text, used for semantic search"""
+    event = models.OneToOneField(EventInfo, on_delete=models.CASCADE, related_name='embedding')
+    model_name = models.CharField(max_length=255, help_text="Embedding model that produced the vector")
+    dimensions = models.PositiveIntegerField()
+    vector = models.BinaryField(help_text="float32 vector, stored as raw bytes")
+    text_hash = models.CharField(max_length=40, help_text="SHA-1 of the embedded text, to skip unchanged events")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_name', 'updated_at'], name='eventembedding_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"Embedding of {self.event.event_name} ({self.model_name})"
+
+
+class Recommendation(models.Model):
+    """Precomputed top events and tasks for a volunteer (manage.py precompute_recommendations)"""
+    ITEM_TYPE_CHOICES = [
+        ('event', 'Event'),
+        ('task', 'Task'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPE_CHOICES)
+    event = models.ForeignKey(EventInfo, on_delete=models.CASCADE, related_name='+',
+                              help_text="The recommended event, or the event of the recommended task")
+    task = models.ForeignKey(TaskInfo, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    score = models.FloatField()
+    rank = models.PositiveIntegerField()
+    model_version = models.CharField(max_length=100)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Views read one user's list for one item type in rank order
+            models.Index(fields=['user', 'item_type', 'model_version', 'rank'], name='recommendation_lookup_idx'),
+        ]
+
+    def __str__(self):
+        item = self.task.task_name if self.task_id else self.event.event_name
+        return f"#{self.rank} {self.item_type} for {self.user.name}: {item} ({self.score:.3f})"
+
+
+class EventPopularity(models.Model):
+    """Exponentially time-decayed activity score of an event (see services.popularity)"""
+    event = models.OneToOneField(EventInfo, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    log_score = models.FloatField(help_text="Log of the decayed score, measured from a fixed epoch so it never needs rewriting")
+    last_activity = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Trending reads walk this index from the top
+            models.Index(fields=['log_score'], name='eventpopularity_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"Popularity of {self.event.event_name}: {self.log_score:.3f}"
+
+
+class VolunteerEmbedding(models.Model):
+    """Embedding of a volunteer's skills, refreshed when the skills change"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='skills_embedding')
+    model_name = models.CharField(max_length=255, help_text="Embedding model that produced the vector")
+    dimensions = models.PositiveIntegerField()
+    vector = models.BinaryField(help_text="float32 vector, stored as raw bytes")
+    text_hash = models.CharField(max_length=40, help_text="SHA-1 of the embedded skills")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Skills embedding of {self.user.name} ({self.model_name})"
+
+
+class EventSentiment(models.Model):
+    """Running totals of the sentiment of an event's scored feedback (see services.feedback_sentiment)"""
+    event = models.OneToOneField(EventInfo, on_delete=models.CASCADE, primary_key=True, related_name='sentiment')
+    feedback_count = models.PositiveIntegerField(default=0)
+    polarity_sum = models.FloatField(default=0)
+    subjectivity_sum = models.FloatField(default=0)
+
+    # Polarity histogram: [-1, -0.6), [-0.6, -0.2), [-0.2, 0.2], (0.2, 0.6], (0.6, 1]
+    very_negative = models.PositiveIntegerField(default=0)
+    negative = models.PositiveIntegerField(default=0)
+    neutral = models.PositiveIntegerField(default=0)
+    positive = models.PositiveIntegerField(default=0)
+    very_positive = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Sentiment of {self.event.event_name}: {self.feedback_count} feedback"
+
+
+class FeedbackRollup(models.Model):
+    """Running rating statistics of an event's feedback, updated with every feedback write (see services.feedback_rollup)"""
+    event = models.OneToOneField(EventInfo, on_delete=models.CASCADE, primary_key=True, related_name='feedback_rollup')
+    feedback_count = models.PositiveIntegerField(default=0)
+    would_volunteer_again_count = models.PositiveIntegerField(default=0)
+    metrics = models.JSONField(default=dict, help_text="Per rating field: count, sum, sum of squares and a 1-10 histogram")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Feedback rollup of {self.event.event_name}: {self.feedback_count} feedback"
+
+
+class Job(models.Model):
+    """Background work run by manage.py runworker (see services.jobs)"""
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text="Handler that runs the job, see services.job_handlers")
+    params = models.JSONField(default=dict, blank=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True,
+                              help_text="User who may see the job and download its result")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    priority = models.IntegerField(default=0, help_text="Higher priorities are claimed first")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time (retry backoff)")
+    claimed_by = models.CharField(max_length=100, blank=True, help_text="Worker running the current attempt")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    result_path = models.CharField(max_length=500, blank=True)
+    result_name = models.CharField(max_length=255, blank=True, help_text="File name offered for download")
+    result_content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers look for the next pending job by priority
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} {self.kind} ({self.status})"
+
+
+class EventReport(models.Model):
+    """The last generated report of an event and the data version it was built from (see services.event_report)"""
+    event = models.OneToOneField(EventInfo, on_delete=models.CASCADE, primary_key=True, related_name='report')
+    data_version = models.PositiveIntegerField(default=1, help_text="Incremented whenever data in the report changes")
+    built_version = models.PositiveIntegerField(default=0, help_text="data_version the stored report was built from")
+    report = models.TextField(blank=True)
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_current(self):
+        return self.built_version == self.data_version
+
+    def __str__(self):
+        return f"Report of {self.event.event_name} (version {self.built_version}/{self.data_version})"
+
+
+class CacheGeneration(models.Model):
+    """Generation counter for cache invalidation (see services.cache_versions); never evicted like cache entries"""
+    name = models.CharField(max_length=255, primary_key=True)
+    value = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/events/<int:event_id>/chat/', consumers.EventChatConsumer.as_asgi(), name='ws_event_chat'),
+    path('ws/tasks/<int:task_id>/chat/', consumers.TaskChatConsumer.as_asgi(), name='ws_task_chat'),
+]
@@ -0,0 +1,176 @@
+"""
+The data behind the analytics charts, as chart specs (see ``ml.chart_engine``).
+
+Each function gathers what its charts plot with a few aggregate queries and
+returns ``{chart name: spec}``; the views decide how to render them (SVG for
+dashboards, PNG for export). Specs are plain data, so they can be sent to the
+render pool, or, trimmed by ``series``, to clients that draw the charts
+themselves.
+"""
+from datetime import datetime
+
+from django.db.models import Count, Q
+
+from ..ml import chart_engine
+from ..models import EventInfo, TaskInfo
+from . import feedback_rollup
+
+# chart_type parameter of EventFeedbackChartsView -> chart name
+EVENT_CHART_TYPES = {
+    'ratings': 'average_ratings',
+    'volunteer_again': 'volunteer_willingness',
+    'efficiency': 'volunteer_efficiency',
+    'task_distribution': 'volunteers_per_task',
+    'task_status': 'task_status',
+    'radar': 'radar_chart',
+}
+
+HOST_CHARTS = ['events_by_status', 'enrollment_trends', 'overall_feedback', 'task_completion']
+
+# Charts in the PNG export of an event
+EXPORT_CHARTS = ['average_ratings', 'volunteer_willingness', 'task_status', 'completion_timeline']
+
+
+def _task_rows(event):
+    return list(TaskInfo.objects.filter(event=event).annotate(volunteer_count=Count('volunteers'))
+                .order_by('id').values('task_name', 'volunteer_efficiency', 'volunteer_count', 'status'))
+
+
+def event_charts(event, names, rollup=None):
+    """Specs of the named charts of one event; charts without data are left out"""
+    names = set(names)
+    rollup = rollup or feedback_rollup.for_event(event.id)
+    averages = feedback_rollup.averages(rollup)
+    charts = {}
+
+    if rollup.feedback_count:
+        if 'average_ratings' in names:
+            charts['average_ratings'] = chart_engine.bar_chart(
+                f"Average Volunteer Ratings for {event.event_name}", list(averages), list(averages.values()),
+                xlabel="Feedback Criteria", ylabel="Average Rating (0-10)"
+            )
+        if 'volunteer_willingness' in names:
+            charts['volunteer_willingness'] = chart_engine.pie_chart(
+                f"Volunteer Willingness to Participate Again in {event.event_name}", ["Yes", "No"],
+                [rollup.would_volunteer_again_count, feedback_rollup.would_not_volunteer_again_count(rollup)],
+                colors=['lightgreen', 'lightcoral']
+            )
+        if 'radar_chart' in names:
+            charts['radar_chart'] = chart_engine.radar_chart(
+                f"Feedback Radar Chart for {event.event_name}", list(averages), list(averages.values())
+            )
+
+    if names & {'volunteer_efficiency', 'volunteers_per_task', 'task_status'}:
+        tasks = _task_rows(event)
+        task_names = [task['task_name'] for task in tasks]
+        if tasks and 'volunteer_efficiency' in names:
+            charts['volunteer_efficiency'] = chart_engine.bar_chart(
+                f"Volunteer Efficiency by Task for {event.event_name}", task_names,
+                [task['volunteer_efficiency'] or 0 for task in tasks],
+                xlabel="Tasks", ylabel="Efficiency Rating", color='lightblue'
+            )
+        if tasks and 'volunteers_per_task' in names:
+            charts['volunteers_per_task'] = chart_engine.bar_chart(
+                f"Volunteer Distribution Across Tasks for {event.event_name}", task_names,
+                [task['volunteer_count'] for task in tasks],
+                xlabel="Tasks", ylabel="Number of Volunteers", color='orange'
+            )
+        if tasks and 'task_status' in names:
+            statuses = {}
+            for task in tasks:
+                statuses[task['status']] = statuses.get(task['status'], 0) + 1
+            charts['task_status'] = chart_engine.pie_chart(
+                f"Task Status Distribution for {event.event_name}", list(statuses), list(statuses.values())
+            )
+
+    if 'completion_timeline' in names:
+        completed = list(TaskInfo.objects.filter(event=event, status='Completed')
+                         .order_by('updated_at').values_list('task_name', 'updated_at'))
+        if completed:
+            charts['completion_timeline'] = chart_engine.timeline_chart(
+                f"Task Completion Timeline - {event.event_name}", [name for name, _ in completed],
+                [updated_at for _, updated_at in completed], xlabel="Completion Date"
+            )
+    return charts
+
+
+def export_pngs(event, workers=None):
+    """
+    ``(file name, PNG)`` of each exported chart that has data, in the order
+    they finish rendering. The chart data is queried before this returns.
+    """
+    charts = event_charts(event, EXPORT_CHARTS)
+    return ((f'{name}.png', image)
+            for name, image in chart_engine.render_iter(charts, 'png', dpi=300, tight=True, workers=workers))
+
+
+def export_filename(event):
+    return f"event_{event.id}_charts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+
+
+def host_charts(host, names):
+    """Specs of the named charts across all events of a host"""
+    names = set(names)
+    events = EventInfo.objects.filter(host=host)
+    charts = {}
+
+    if 'events_by_status' in names:
+        status_counts = list(events.values('status').annotate(count=Count('id')).order_by('status'))
+        charts['events_by_status'] = chart_engine.pie_chart(
+            f"Events by Status for {host.name}", [item['status'] for item in status_counts],
+            [item['count'] for item in status_counts], figsize=(8, 8)
+        )
+
+    if 'enrollment_trends' in names:
+        enrollment = list(events.annotate(volunteers=Count('volunteer_enrolled', distinct=True))
+                          .order_by('-volunteers', 'id').values('event_name', 'volunteers', 'required_volunteers'))
+        if enrollment:
+            charts['enrollment_trends'] = chart_engine.bar_chart(
+                "Volunteer Enrollment by Event", [row['event_name'] for row in enrollment],
+                [row['volunteers'] for row in enrollment], xlabel="Events", ylabel="Number of Volunteers",
+                figsize=(12, 6), targets=[row['required_volunteers'] for row in enrollment]
+            )
+
+    if 'overall_feedback' in names:
+        rollup = feedback_rollup.combined(events.values_list('id', flat=True))
+        if rollup.feedback_count:
+            averages = feedback_rollup.averages(rollup)
+            charts['overall_feedback'] = chart_engine.bar_chart(
+                "Average Feedback Ratings Across All Events", list(averages), list(averages.values()),
+                xlabel="Feedback Criteria", ylabel="Average Rating (0-10)", color='lightgreen'
+            )
+
+    if 'task_completion' in names:
+        completion = []
+        for row in events.annotate(total=Count('tasks'), completed=Count('tasks', filter=Q(tasks__status='Completed'))
+                                   ).values('event_name', 'total', 'completed'):
+            rate = row['completed'] / row['total'] * 100 if row['total'] else 0
+            completion.append((row['event_name'], rate))
+        completion.sort(key=lambda item: item[1], reverse=True)
+        if completion:
+            charts['task_completion'] = chart_engine.bar_chart(
+                "Task Completion Rate by Event", [name for name, _ in completion], [rate for _, rate in completion],
+                xlabel="Events", ylabel="Task Completion Rate (%)", color='coral', figsize=(12, 6)
+            )
+    return charts
+
+
+def series(spec):
+    """The compact, client-renderable form of a chart spec"""
+    data = {'type': spec['kind'], 'title': spec['title'], 'labels': spec['labels']}
+    if spec['kind'] == 'timeline':
+        data['values'] = [date.isoformat() for date in spec['dates']]
+    else:
+        data['values'] = [round(value, 2) for value in spec['values']]
+    for key in ('xlabel', 'ylabel', 'targets', 'limit'):
+        if spec.get(key):
+            data[key] = spec[key]
+    return data
+
+
+def rating_distributions(rollup):
+    """Count of each 1-10 rating per rating field"""
+    return {
+        'labels': list(range(1, 11)),
+        'series': {field: list(counts.values()) for field, counts in feedback_rollup.histograms(rollup).items()},
+    }
@@ -0,0 +1,43 @@
+"""
+Generation counters for cache invalidation.
+
+Cache keys embed the current generation of everything they depend on, so
+bumping a generation makes every key built from it unreachable at once,
+without knowing or deleting the individual keys. The counters are rows of
+``CacheGeneration`` rather than cache entries: the database cache culls its
+entries when it fills up, and a counter that restarted at 1 would make keys
+cached under the old generation 1 reachable again. Bumps are a single
+``UPDATE ... SET value = value + 1``, so concurrent bumps are never lost.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import CacheGeneration
+
+
+def get_generation(name):
+    """Current generation of ``name``, starting at 1."""
+    return get_generations([name])[0]
+
+
+def get_generations(names):
+    """Generations of several names with one query (plus one to create missing counters)."""
+    found = dict(CacheGeneration.objects.filter(name__in=names).values_list('name', 'value'))
+    missing = [name for name in names if name not in found]
+    if missing:
+        CacheGeneration.objects.bulk_create([CacheGeneration(name=name) for name in missing],
+                                            ignore_conflicts=True)
+        found.update(CacheGeneration.objects.filter(name__in=missing).values_list('name', 'value'))
+    return [found[name] for name in names]
+
+
+def bump_generation(name):
+    """Invalidate everything cached under ``name``."""
+    if not CacheGeneration.objects.filter(name=name).update(value=F('value') + 1):
+        try:
+            with transaction.atomic():
+                # Nobody has read it yet, so nothing is cached under generation 1 either
+                CacheGeneration.objects.create(name=name, value=2)
+        except IntegrityError:
+            # Created concurrently
+            CacheGeneration.objects.filter(name=name).update(value=F('value') + 1)
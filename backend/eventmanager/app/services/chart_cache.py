@@ -0,0 +1,116 @@
+"""
+Disk cache of rendered charts.
+
+Rendering a dashboard means several matplotlib figures, which is by far the
+slowest part of the analytics views, although the underlying data rarely
+changes between loads. Rendered output is stored under ``CHART_CACHE_DIR``,
+keyed by what was drawn (event or host, chart type, format) and a *data
+version*: a digest of the latest ``updated_at``/``created_at`` and the row
+counts of every table the charts read, plus the host's name on host charts. Any change to the inputs gives a new
+version, so entries are never invalidated explicitly; stale ones simply stop
+being read and age out.
+
+The directory is kept under ``CHART_CACHE_MAX_BYTES`` by evicting the least
+recently used files (reads refresh a file's modification time).
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from ..models import EventInfo, Feedback, FeedbackRollup, TaskInfo
+
+
+def cache_dir():
+    return getattr(settings, 'CHART_CACHE_DIR', os.path.join(settings.BASE_DIR, 'chart_cache'))
+
+
+def max_bytes():
+    return getattr(settings, 'CHART_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+def _digest(parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def event_version(event):
+    """Data version of the charts of one event"""
+    tasks = TaskInfo.objects.filter(event=event).aggregate(count=Count('id'), updated=Max('updated_at'))
+    assignments = TaskInfo.volunteers.through.objects.filter(taskinfo__event=event).aggregate(
+        count=Count('id'), last=Max('id'))
+    feedback = Feedback.objects.filter(event=event).aggregate(count=Count('id'), created=Max('created_at'))
+    # Feedback edits and deletes show up in the rollup's updated_at
+    rollup = FeedbackRollup.objects.filter(event=event).values_list('updated_at', flat=True).first()
+    return _digest([event.updated_at, tasks, assignments, feedback, rollup])
+
+
+def host_version(host):
+    """Data version of the charts across all events of a host"""
+    events = EventInfo.objects.filter(host=host)
+    event_stats = events.aggregate(count=Count('id'), updated=Max('updated_at'))
+    enrollments = EventInfo.volunteer_enrolled.through.objects.filter(eventinfo__host=host).aggregate(
+        count=Count('id'), last=Max('id'))
+    tasks = TaskInfo.objects.filter(event__host=host).aggregate(count=Count('id'), updated=Max('updated_at'))
+    feedback = Feedback.objects.filter(event__host=host).aggregate(count=Count('id'), created=Max('created_at'))
+    rollups = FeedbackRollup.objects.filter(event__host=host).aggregate(updated=Max('updated_at'))
+    # The charts and the response show the host's name
+    return _digest([host.name, event_stats, enrollments, tasks, feedback, rollups])
+
+
+def _path(scope, owner_id, chart_type, fmt, version):
+    return os.path.join(cache_dir(), f"{_digest([scope, owner_id, chart_type, fmt, version])}.{fmt}")
+
+
+def get(scope, owner_id, chart_type, fmt, version):
+    """Cached bytes, or None"""
+    path = _path(scope, owner_id, chart_type, fmt, version)
+    try:
+        with open(path, 'rb') as cached:
+            data = cached.read()
+        # Mark as recently used for eviction
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+def put(scope, owner_id, chart_type, fmt, version, data):
+    """Store rendered bytes, then evict old entries if the cache grew too large"""
+    directory = cache_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(data)
+        os.replace(temporary, _path(scope, owner_id, chart_type, fmt, version))
+        evict()
+    except OSError as e:
+        # A cache that cannot be written only costs a re-render
+        print(f"Error writing chart cache: {str(e)}")
+
+
+def evict(limit=None):
+    """Delete least recently used entries until the cache is under 90% of ``limit``"""
+    limit = max_bytes() if limit is None else limit
+    entries, total = [], 0
+    with os.scandir(cache_dir()) as scan:
+        for entry in scan:
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+    if total <= limit:
+        return 0
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= limit * 0.9:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,266 @@
+"""
+Cold storage for the chats of long-finished events.
+
+``manage.py archive_chats`` moves the messages of completed events out of the
+``EventChat`` and ``Chat`` tables into compressed JSON Lines segments, one
+directory per event::
+
+    <CHAT_ARCHIVE_DIR>/event_<id>/index.json
+    <CHAT_ARCHIVE_DIR>/event_<id>/event_<id>-<first id>-<last id>.jsonl.gz
+    <CHAT_ARCHIVE_DIR>/event_<id>/task_<id>-<first id>-<last id>.jsonl.zst
+
+Each line is the message as the chat serializers render it, so archived and
+live messages look the same to clients. Segments are zstd-compressed when the
+``zstandard`` package is installed and gzip-compressed otherwise. The archive
+must not live under MEDIA_ROOT, which is served without access checks; it is
+only read through the chat history views.
+
+Archived messages are always older than the live ones (ids only grow), so the
+history views serve live rows first and continue into the archive.
+"""
+import gzip
+import io
+import json
+import os
+from datetime import datetime, time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .chat_pagination import paginate_messages
+
+INDEX_FILE = 'index.json'
+
+
+def archive_root():
+    return getattr(settings, 'CHAT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'chat_archive'))
+
+
+def event_archive_dir(event_id):
+    return os.path.join(archive_root(), f'event_{event_id}')
+
+
+def load_index(event_id):
+    """Return the event's archive index, or an empty one if nothing is archived"""
+    path = os.path.join(event_archive_dir(event_id), INDEX_FILE)
+    try:
+        with open(path) as index_file:
+            return json.load(index_file)
+    except FileNotFoundError:
+        return {'event_id': event_id, 'segments': []}
+
+
+def save_index(event_id, index):
+    """Write the index atomically so readers never see a half-written file"""
+    directory = event_archive_dir(event_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, INDEX_FILE)
+    index['updated_at'] = timezone.now().isoformat()
+    with open(path + '.tmp', 'w') as index_file:
+        json.dump(index, index_file, indent=2)
+        index_file.flush()
+        os.fsync(index_file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def archived_up_to(index, conversation_type, conversation_id):
+    """Highest message id already stored for a conversation (0 if none)"""
+    return max(
+        (segment['last_id'] for segment in index['segments']
+         if segment['conversation_type'] == conversation_type
+         and segment['conversation_id'] == conversation_id),
+        default=0
+    )
+
+
+def write_segment(event_id, conversation_type, conversation_id, records):
+    """
+    Compress ``records`` (serialized messages in id order) into a new segment
+    file and return its index entry. The caller adds the entry to the index.
+    """
+    codec = 'zstd' if zstandard is not None else 'gzip'
+    extension = 'jsonl.zst' if codec == 'zstd' else 'jsonl.gz'
+    first_id, last_id = records[0]['id'], records[-1]['id']
+    file_name = f'{conversation_type}_{conversation_id}-{first_id}-{last_id}.{extension}'
+
+    directory = event_archive_dir(event_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, file_name)
+
+    payload = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records).encode('utf-8')
+    if codec == 'zstd':
+        payload = zstandard.ZstdCompressor(level=10).compress(payload)
+    else:
+        payload = gzip.compress(payload, compresslevel=9)
+
+    with open(path + '.tmp', 'wb') as segment_file:
+        segment_file.write(payload)
+        segment_file.flush()
+        os.fsync(segment_file.fileno())
+    os.replace(path + '.tmp', path)
+
+    return {
+        'conversation_type': conversation_type,
+        'conversation_id': conversation_id,
+        'file': file_name,
+        'codec': codec,
+        'count': len(records),
+        'first_id': first_id,
+        'last_id': last_id,
+        'first_timestamp': records[0]['timestamp'],
+        'last_timestamp': records[-1]['timestamp'],
+        'bytes': len(payload),
+    }
+
+
+@lru_cache(maxsize=64)
+def _read_segment(path, codec, mtime_ns):
+    with open(path, 'rb') as segment_file:
+        payload = segment_file.read()
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        payload = gzip.decompress(payload)
+    return tuple(json.loads(line) for line in io.TextIOWrapper(io.BytesIO(payload), encoding='utf-8'))
+
+
+def archived_records(conversation_type, conversation_id, event_id, before_id=None, after_id=None,
+                     from_date=None, to_date=None):
+    """
+    Archived messages of a conversation, oldest first. Segments whose id or
+    timestamp range in the index lies wholly outside the page cursor or the
+    date filters are not read. The segments holding ``before_id`` and
+    ``after_id`` are always included, so callers can tell whether a cursor
+    points into the archive.
+    """
+    start = _as_datetime(from_date) if from_date else None
+    end = _as_datetime(to_date, end_of_day=True) if to_date else None
+
+    directory = event_archive_dir(event_id)
+    records = []
+    for segment in load_index(event_id)['segments']:
+        if segment['conversation_type'] != conversation_type or segment['conversation_id'] != conversation_id:
+            continue
+        if before_id is not None and segment['first_id'] > before_id:
+            continue
+        if after_id is not None and segment['last_id'] < after_id:
+            continue
+        if start and parse_datetime(segment['last_timestamp']) < start:
+            continue
+        if end and parse_datetime(segment['first_timestamp']) > end:
+            continue
+        path = os.path.join(directory, segment['file'])
+        records.extend(_read_segment(path, segment['codec'], os.stat(path).st_mtime_ns))
+    records.sort(key=lambda record: record['id'])
+    return records
+
+
+def _as_datetime(value, end_of_day=False):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_records(records, text_field, from_date=None, to_date=None, user_id=None,
+                   host_only=False, search_text=None):
+    """Apply the history view filters to archived messages"""
+    start = _as_datetime(from_date) if from_date else None
+    end = _as_datetime(to_date, end_of_day=True) if to_date else None
+    words = search_text.lower().split() if search_text else []
+
+    filtered = []
+    for record in records:
+        if start or end:
+            timestamp = parse_datetime(record['timestamp'])
+            if start and timestamp < start:
+                continue
+            if end and timestamp > end:
+                continue
+        if user_id and str(record['user']) != str(user_id):
+            continue
+        if host_only and not record['is_host']:
+            continue
+        if words and not all(word in record[text_field].lower() for word in words):
+            continue
+        filtered.append(record)
+    return filtered
+
+
+def archived_count(conversation_type, conversation_id, event_id, text_field, from_date=None, to_date=None,
+                   user_id=None, host_only=False, search_text=None):
+    """
+    Number of archived messages of a conversation that pass the history view
+    filters, independent of the page being served. Without filters this is
+    the sum of the segment counts in the index, so no segment is read.
+    """
+    if not (from_date or to_date or user_id or host_only or search_text):
+        return sum(segment['count'] for segment in load_index(event_id)['segments']
+                   if segment['conversation_type'] == conversation_type
+                   and segment['conversation_id'] == conversation_id)
+    records = archived_records(conversation_type, conversation_id, event_id, from_date=from_date, to_date=to_date)
+    return len(filter_records(records, text_field, from_date=from_date, to_date=to_date, user_id=user_id,
+                              host_only=host_only, search_text=search_text))
+
+
+def for_viewer(records, user):
+    """Archived messages as the serializer would render them for ``user``"""
+    return [dict(record, is_current_user=record['user'] == user.id) for record in records]
+
+
+def paginate_with_archive(queryset, records, limit, before_id=None, after_id=None, offset=0):
+    """
+    Page through live messages and continue into archived ``records``.
+
+    Returns ``(live_messages, archived_records, has_more)``; both lists are
+    newest first and the archived ones come after the live ones. Follows the
+    same cursor rules as ``paginate_messages``.
+    """
+    if not records:
+        live, has_more = paginate_messages(queryset, limit, before_id, after_id, offset)
+        return live, [], has_more
+
+    newest_archived_id = records[-1]['id']
+
+    if after_id is not None:
+        if after_id > newest_archived_id:
+            live, has_more = paginate_messages(queryset, limit, after_id=after_id)
+            return live, [], has_more
+        # Newer archived messages first, then the oldest live ones
+        newer = [record for record in records if record['id'] > after_id]
+        archived = newer[:limit]
+        needed = limit - len(archived)
+        live = list(queryset.order_by('timestamp', 'id')[:needed + 1])
+        has_more = len(newer) > limit or len(live) > needed
+        live = live[:needed]
+        live.reverse()
+        archived.reverse()
+        return live, archived, has_more
+
+    if before_id is not None and before_id <= newest_archived_id:
+        older = [record for record in records if record['id'] < before_id]
+        return [], older[::-1][:limit], len(older) > limit
+
+    live, has_more = paginate_messages(queryset, limit, before_id, None, offset)
+    if len(live) == limit:
+        return live, [], True
+
+    # The live page ran out; skip whatever part of the offset the archive covers
+    skip = max(0, offset - queryset.count()) if offset and not live else 0
+    older = records[:len(records) - skip] if skip else records
+    needed = limit - len(live)
+    return live, older[::-1][:needed], len(older) > needed
@@ -0,0 +1,86 @@
+"""
+Keyset (cursor) pagination for chat messages.
+
+Messages are ordered by ``(timestamp, id)``. A page is selected relative to an
+anchor message with ``before_id`` (older messages) or ``after_id`` (newer
+messages), which the composite ``(conversation, timestamp)`` indexes answer
+without scanning skipped rows. ``has_more`` comes from fetching one extra row
+instead of counting the whole conversation.
+"""
+from django.db.models import Q, Subquery
+
+
+class PaginationError(ValueError):
+    """Raised for malformed pagination parameters"""
+
+
+def _int_param(params, name, default=None, minimum=0, maximum=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError(f"{name} must be an integer")
+    if value < minimum:
+        raise PaginationError(f"{name} must be at least {minimum}")
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def parse_page_params(params, default_limit, max_limit=500):
+    """Read ``limit``, ``offset``, ``before_id`` and ``after_id`` from a QueryDict."""
+    page = {
+        'limit': _int_param(params, 'limit', default_limit, minimum=1, maximum=max_limit),
+        'offset': _int_param(params, 'offset', 0),
+        'before_id': _int_param(params, 'before_id'),
+        'after_id': _int_param(params, 'after_id'),
+    }
+    if page['before_id'] is not None and page['after_id'] is not None:
+        raise PaginationError('Use either before_id or after_id, not both')
+    return page
+
+
+def paginate_messages(queryset, limit, before_id=None, after_id=None, offset=0):
+    """
+    Return ``(messages, has_more)`` with messages ordered newest first.
+
+    ``has_more`` tells whether another page exists in the paging direction:
+    older messages for the default and ``before_id`` pages, newer messages for
+    ``after_id`` pages. ``offset`` is only honoured without a cursor, for
+    clients that still page by position.
+    """
+    if before_id is not None:
+        anchor = queryset.model.objects.filter(id=before_id).values('timestamp')
+        anchor_ts = Subquery(anchor[:1])
+        rows = list(
+            queryset.filter(Q(timestamp__lt=anchor_ts) | Q(timestamp=anchor_ts, id__lt=before_id))
+            .order_by('-timestamp', '-id')[:limit + 1]
+        )
+    elif after_id is not None:
+        anchor = queryset.model.objects.filter(id=after_id).values('timestamp')
+        anchor_ts = Subquery(anchor[:1])
+        rows = list(
+            queryset.filter(Q(timestamp__gt=anchor_ts) | Q(timestamp=anchor_ts, id__gt=after_id))
+            .order_by('timestamp', 'id')[:limit + 1]
+        )
+    else:
+        rows = list(queryset.order_by('-timestamp', '-id')[offset:offset + limit + 1])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after_id is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+def _message_id(message):
+    return message['id'] if isinstance(message, dict) else message.id
+
+
+def page_cursors(messages):
+    """Cursors a client passes back to continue paging from this page (models or serialized dicts)."""
+    if not messages:
+        return {'oldest_id': None, 'newest_id': None}
+    return {'oldest_id': _message_id(messages[-1]), 'newest_id': _message_id(messages[0])}
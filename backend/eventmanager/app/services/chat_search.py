@@ -0,0 +1,143 @@
+"""
+Full-text search over event and task chat messages.
+
+On SQLite the chat tables are indexed by FTS5 (see migration ``0014_chat_fts``),
+so a search looks up matching rows in the index instead of scanning every
+message with ``LIKE``. Hits are ranked with ``bm25`` and paged with a keyset
+cursor on ``(rank, id)``. Other databases fall back to ``icontains``, newest
+first.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from ..models import Chat, EventChat
+
+# Sentinels wrapped around matches by highlight(), swapped for <mark> after escaping
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+
+SEARCH_COLUMNS = {
+    EventChat: 'message',
+    Chat: 'text',
+}
+
+
+class SearchCursorError(ValueError):
+    """Raised for a malformed search cursor"""
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def _fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query. Every word must match and the last one
+    matches as a prefix, so results update while the user is still typing.
+    Returns None when the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def parse_search_cursor(value):
+    """Decode ``"<rank>:<id>"`` as returned in ``next_cursor``"""
+    if not value:
+        return None
+    try:
+        rank, message_id = value.rsplit(':', 1)
+        return float(rank), int(message_id)
+    except (TypeError, ValueError):
+        raise SearchCursorError('Invalid search cursor')
+
+
+def format_search_cursor(rank, message_id):
+    return f"{rank!r}:{message_id}"
+
+
+def filter_matching(queryset, text):
+    """Restrict a chat queryset to messages matching ``text``"""
+    column = SEARCH_COLUMNS[queryset.model]
+    if not fts_available():
+        return queryset.filter(**{f'{column}__icontains': text})
+
+    match = build_match_query(text)
+    if match is None:
+        return queryset.none()
+    fts = _fts_table(queryset.model)
+    return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [match]))
+
+
+def _highlight(text):
+    escaped = html.escape(text)
+    return escaped.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>')
+
+
+def search_messages(queryset, text, limit, cursor=None):
+    """
+    Rank the messages of ``queryset`` that match ``text``.
+
+    Returns ``(hits, next_cursor)`` where each hit is ``(message, rank,
+    highlighted_text)``. ``highlighted_text`` is HTML-escaped with matches
+    wrapped in ``<mark>``.
+    """
+    model = queryset.model
+    column = SEARCH_COLUMNS[model]
+    # A limit below one would slice an empty page or become LIMIT -1 (no limit)
+    limit = max(1, limit)
+
+    if not fts_available():
+        rows = queryset.filter(**{f'{column}__icontains': text}).order_by('-id')
+        if cursor is not None:
+            rows = rows.filter(id__lt=cursor[1])
+        rows = list(rows.select_related('user')[:limit + 1])
+        more = len(rows) > limit
+        hits = [(m, 0.0, html.escape(getattr(m, column))) for m in rows[:limit]]
+        next_cursor = format_search_cursor(0.0, hits[-1][0].id) if more else None
+        return hits, next_cursor
+
+    match = build_match_query(text)
+    if match is None:
+        return [], None
+
+    fts = _fts_table(model)
+    scope_sql, scope_params = queryset.order_by().values('id').query.sql_with_params()
+    sql = (
+        f"SELECT {fts}.rowid, bm25({fts}) AS rank, "
+        f"highlight({fts}, 0, %s, %s) "
+        f"FROM {fts} "
+        f"WHERE {fts} MATCH %s AND {fts}.rowid IN ({scope_sql})"
+    )
+    params = [_HIGHLIGHT_START, _HIGHLIGHT_END, match, *scope_params]
+    if cursor is not None:
+        # bm25 is lower for better matches, so the next page continues upwards
+        sql += f" AND (bm25({fts}) > %s OR (bm25({fts}) = %s AND {fts}.rowid > %s))"
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += " ORDER BY rank, rowid LIMIT %s"
+    params.append(limit + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    messages = model.objects.select_related('user').in_bulk([row[0] for row in rows])
+    hits = [
+        (messages[message_id], rank, _highlight(highlighted))
+        for message_id, rank, highlighted in rows
+        if message_id in messages
+    ]
+    next_cursor = format_search_cursor(rows[-1][1], rows[-1][0]) if more else None
+    return hits, next_cursor
@@ -0,0 +1,106 @@
+"""
+Helpers for reading many conversations at once.
+
+Instead of one query per event or task chat, the latest messages of every
+conversation are fetched with a single ``ROW_NUMBER() OVER (PARTITION BY ...)``
+query per chat table.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from ..models import EventInfo, TaskInfo
+
+
+def latest_messages_by_conversation(model, conversation_field, conversation_ids, limit, since_id=None):
+    """
+    Return ``{conversation_id: [messages newest first]}`` holding at most
+    ``limit`` messages per conversation, using one windowed query. With
+    ``since_id`` only messages newer than it are read.
+    """
+    if not conversation_ids:
+        return {}
+
+    messages = model.objects.filter(**{f'{conversation_field}__in': conversation_ids})
+    if since_id is not None:
+        messages = messages.filter(id__gt=since_id)
+    rows = (messages
+            .select_related('user')
+            .annotate(row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F(conversation_field)],
+                order_by=[F('timestamp').desc(), F('id').desc()],
+            ))
+            .filter(row_number__lte=limit)
+            .order_by(conversation_field, 'row_number'))
+
+    grouped = defaultdict(list)
+    for message in rows:
+        grouped[getattr(message, conversation_field)].append(message)
+    return grouped
+
+
+def new_message_counts(model, conversation_field, conversation_ids, since_id, exclude_user):
+    """Count messages newer than ``since_id`` per conversation, ignoring the user's own."""
+    if not conversation_ids:
+        return {}
+    rows = (model.objects
+            .filter(**{f'{conversation_field}__in': conversation_ids}, id__gt=since_id)
+            .exclude(user=exclude_user)
+            .values(conversation_field)
+            .annotate(count=Count('id')))
+    return {row[conversation_field]: row['count'] for row in rows}
+
+
+def user_event_conversations(user):
+    """Events whose community chat the user takes part in, as ``{id: name}``."""
+    if user.isHost:
+        events = EventInfo.objects.filter(host=user)
+    else:
+        events = user.enrolled_events.all()
+    return dict(events.values_list('id', 'event_name'))
+
+
+def user_task_conversations(user):
+    """Tasks whose chat the user takes part in, as ``{id: (task_name, event_id, event_name)}``."""
+    if user.isHost:
+        tasks = TaskInfo.objects.filter(event__host=user)
+    else:
+        tasks = user.assigned_tasks.all()
+    return {
+        row[0]: row[1:]
+        for row in tasks.values_list('id', 'task_name', 'event_id', 'event__event_name')
+    }
+
+
+def parse_sync_cursor(value):
+    """
+    Split a sync cursor of the form ``"<event chat id>:<task chat id>"``.
+    A missing cursor means the client has never synced.
+    """
+    if not value:
+        return None, None
+    try:
+        event_part, task_part = value.split(':')
+        return int(event_part), int(task_part)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid sync cursor')
+
+
+def parse_sync_limit(value, default=20, maximum=100):
+    """Messages returned per conversation: a positive integer, capped at ``maximum``"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def format_sync_cursor(event_chat_id, task_chat_id):
+    return f"{event_chat_id or 0}:{task_chat_id or 0}"
+
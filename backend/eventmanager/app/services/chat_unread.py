@@ -0,0 +1,142 @@
+"""
+Unread counters for event and task chats.
+
+Each user has a ``ChatReadMarker`` per conversation they have read. For small
+conversations the marker's ``unread_count`` is bumped whenever a message is
+saved (fan-out on write). Large conversations would need too many updates per
+message, so their markers keep ``unread_count`` null and the count is taken
+from the chat table on read. Both cases resolve inside one query, because
+``COALESCE`` only evaluates the counting subquery when the stored counter is
+null.
+"""
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from ..models import Chat, ChatReadMarker, EventChat, EventInfo, TaskInfo, User
+
+CONVERSATION_TYPES = ('event', 'task')
+
+
+def _fanout_limit():
+    return getattr(settings, 'CHAT_UNREAD_FANOUT_LIMIT', 200)
+
+
+def _chat_model(conversation_type):
+    if conversation_type == 'event':
+        return EventChat, 'event_id'
+    return Chat, 'task_id'
+
+
+def conversation_member_count(conversation_type, conversation_id):
+    """Number of users who can take part in a conversation (volunteers plus the host)"""
+    if conversation_type == 'event':
+        return User.objects.filter(enrolled_events__id=conversation_id).count() + 1
+    return User.objects.filter(assigned_tasks__id=conversation_id).count() + 1
+
+
+def is_conversation_member(user, conversation_type, conversation_id):
+    """
+    Apply the same access rules as the chat views: hosts, the event's host and
+    the event's volunteers (the task's volunteers for task chats). Raises
+    ``DoesNotExist`` when the event or task is missing.
+    """
+    if conversation_type == 'event':
+        event = EventInfo.objects.get(id=conversation_id)
+        return (user.isHost or user.id == event.host_id or
+                event.volunteer_enrolled.filter(id=user.id).exists())
+    task = TaskInfo.objects.select_related('event').get(id=conversation_id)
+    return (user.isHost or user.id == task.event.host_id or
+            task.volunteers.filter(id=user.id).exists())
+
+
+def record_new_message(conversation_type, conversation_id, sender_id):
+    """
+    Called for every saved message, once its transaction has committed. Small
+    conversations get their counters incremented; large ones have them
+    switched to compute-on-read.
+    """
+    markers = ChatReadMarker.objects.filter(
+        conversation_type=conversation_type,
+        conversation_id=conversation_id,
+        unread_count__isnull=False
+    )
+    if conversation_member_count(conversation_type, conversation_id) <= _fanout_limit():
+        markers.exclude(user_id=sender_id).update(unread_count=F('unread_count') + 1)
+    else:
+        markers.update(unread_count=None)
+
+
+def mark_read(user, conversation_type, conversation_id, last_read_id=None):
+    """
+    Move the user's marker forward to ``last_read_id`` (the newest message when
+    omitted). Markers never move backwards. Returns the marker and the number
+    of messages still unread after it.
+    """
+    model, field = _chat_model(conversation_type)
+    messages = model.objects.filter(**{field: conversation_id})
+    if last_read_id is None:
+        last_read_id = messages.order_by('-id').values_list('id', flat=True).first() or 0
+
+    marker, _ = ChatReadMarker.objects.get_or_create(
+        user=user, conversation_type=conversation_type, conversation_id=conversation_id
+    )
+    marker.last_read_id = max(marker.last_read_id, last_read_id)
+    unread = messages.filter(id__gt=marker.last_read_id).exclude(user=user).count()
+
+    # Start counting on write again only while the conversation is small
+    if conversation_member_count(conversation_type, conversation_id) <= _fanout_limit():
+        marker.unread_count = unread
+    else:
+        marker.unread_count = None
+    marker.save(update_fields=['last_read_id', 'unread_count', 'updated_at'])
+    return marker, unread
+
+
+def _with_unread(conversations, conversation_type, user):
+    """Annotate a queryset of events or tasks with the user's read state"""
+    model, field = _chat_model(conversation_type)
+    marker = ChatReadMarker.objects.filter(
+        user=user, conversation_type=conversation_type, conversation_id=OuterRef('pk')
+    )
+    unread_messages = (model.objects
+                       .filter(**{field: OuterRef('pk')}, id__gt=OuterRef('last_read_id'))
+                       .exclude(user=user)
+                       .order_by()
+                       .values(field)
+                       .annotate(count=Count('id'))
+                       .values('count'))
+    return (conversations
+            .annotate(
+                conversation_type=Value(conversation_type),
+                last_read_id=Coalesce(Subquery(marker.values('last_read_id')[:1]), Value(0)),
+            )
+            .annotate(unread_count=Coalesce(
+                Subquery(marker.values('unread_count')[:1]),
+                Subquery(unread_messages, output_field=IntegerField()),
+                Value(0),
+            ))
+            .order_by()
+            .values_list('conversation_type', 'id', 'last_read_id', 'unread_count'))
+
+
+def unread_counts(user):
+    """
+    Return ``{(conversation_type, conversation_id): {'last_read_id', 'unread_count'}}``
+    for every conversation the user belongs to, in a single query.
+    """
+    if user.isHost:
+        events = EventInfo.objects.filter(host=user)
+        tasks = TaskInfo.objects.filter(event__host=user)
+    else:
+        events = user.enrolled_events.all()
+        tasks = user.assigned_tasks.all()
+
+    rows = _with_unread(events, 'event', user).union(_with_unread(tasks, 'task', user), all=True)
+    return {
+        (conversation_type, conversation_id): {
+            'last_read_id': last_read_id,
+            'unread_count': unread_count,
+        }
+        for conversation_type, conversation_id, last_read_id, unread_count in rows
+    }
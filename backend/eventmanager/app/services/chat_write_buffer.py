@@ -0,0 +1,230 @@
+"""
+Batched writer for chat messages.
+
+Every chat message sent over a WebSocket, and every message posted over HTTP
+when ``CHAT_BATCH_HTTP_WRITES = True``, is handed to one background thread per
+process. The thread stores everything submitted within
+``CHAT_WRITER_BATCH_MS`` (or until ``CHAT_WRITER_BATCH_SIZE`` messages are
+queued) with one ``bulk_create`` per chat table in a single transaction, then
+fires ``post_save`` for each message, as ``Model.save()`` would. During live
+events this turns hundreds of competing single-row transactions on SQLite's
+write lock into a few batched ones.
+
+Callers wait until their message is stored, so the response they send has
+the message's real id and timestamp, and a message that cannot be stored is
+reported to its sender instead of being acknowledged and lost. Ids and
+timestamps are assigned by the insert itself, so they follow commit order like
+those of messages saved one by one; the sync cursor, ``Last-Event-ID`` and the
+unread markers all rely on that.
+
+A batch that fails is stored again message by message, so one bad message
+only fails its own sender. Pending messages are flushed when the process
+exits cleanly.
+"""
+import asyncio
+import atexit
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+
+from ..models import Chat, EventChat
+
+
+def is_enabled():
+    """Whether messages posted over HTTP go through the writer too"""
+    return getattr(settings, 'CHAT_BATCH_HTTP_WRITES', False)
+
+
+class ChatWriter:
+    """Queue chat messages and store them in batches from a background thread."""
+
+    def __init__(self, batch_size=None, batch_ms=None):
+        self.batch_size = batch_size or getattr(settings, 'CHAT_WRITER_BATCH_SIZE', 100)
+        self.batch_ms = batch_ms or getattr(settings, 'CHAT_WRITER_BATCH_MS', 20)
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._flushing = False
+
+        self._enqueued = 0
+        self._flushed = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._failed = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, chat_message):
+        """
+        Queue an unsaved ``EventChat`` or ``Chat`` for the next batch. Returns a
+        ``concurrent.futures.Future`` resolved with the saved message, or with
+        the error that kept it from being stored.
+        """
+        # Model.save() would look this up per message; bulk_create skips save()
+        chat_message.is_host = chat_message.user.isHost
+        future = Future()
+
+        with self._condition:
+            self._ensure_started()
+            self._pending.append((chat_message, future, time.monotonic()))
+            self._enqueued += 1
+            self._condition.notify()
+        return future
+
+    def save(self, chat_message):
+        """Store a message with the next batch and return it once it is saved"""
+        return self.submit(chat_message).result()
+
+    async def asave(self, chat_message):
+        """``save`` for the event loop; waiting holds no thread"""
+        return await asyncio.wrap_future(self.submit(chat_message))
+
+    def _take_batch(self):
+        with self._condition:
+            if self._pending:
+                # Give the batch a moment to fill unless it already is full
+                oldest = self._pending[0][2]
+                wait = self.batch_ms / 1000 - (time.monotonic() - oldest)
+                if wait > 0 and len(self._pending) < self.batch_size:
+                    self._condition.wait(wait)
+            else:
+                self._condition.wait()
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.batch_size))]
+            self._flushing = bool(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        failed = 0
+        try:
+            close_old_connections()
+            try:
+                self._write([chat_message for chat_message, _, _ in batch])
+                results = [(future, chat_message, None) for chat_message, future, _ in batch]
+            except Exception as e:
+                print(f"Error in chat writer flush: {str(e)}")
+                with self._condition:
+                    self._failed_flushes += 1
+                # One bad message should not fail the others; store them one by one
+                results = self._write_individually(batch)
+                failed = sum(1 for _, _, error in results if error is not None)
+        finally:
+            close_old_connections()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._condition:
+            self._flushed += len(batch) - failed
+            self._failed += failed
+            self._flushes += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            self._flushing = False
+            self._condition.notify_all()
+
+        for future, chat_message, error in results:
+            if error is None:
+                future.set_result(chat_message)
+            else:
+                future.set_exception(error)
+
+    def _write_individually(self, batch):
+        results = []
+        for chat_message, future, _ in batch:
+            # Forget the id a rolled back bulk_create may have set
+            chat_message.pk = None
+            try:
+                self._write([chat_message])
+                results.append((future, chat_message, None))
+            except Exception as e:
+                print(f"Error storing chat message from user {chat_message.user_id}: {str(e)}")
+                results.append((future, chat_message, e))
+        return results
+
+    @staticmethod
+    def _write(messages):
+        """Insert a batch and fire post_save so counters and stream subscribers are notified."""
+        event_messages = [m for m in messages if isinstance(m, EventChat)]
+        task_messages = [m for m in messages if isinstance(m, Chat)]
+
+        with transaction.atomic():
+            # The insert assigns ids and (auto_now_add) timestamps, in commit order
+            if event_messages:
+                EventChat.objects.bulk_create(event_messages)
+            if task_messages:
+                Chat.objects.bulk_create(task_messages)
+
+            for chat_message in event_messages + task_messages:
+                post_save.send(sender=type(chat_message), instance=chat_message,
+                               created=True, update_fields=None, raw=False,
+                               using='default')
+
+    def flush(self, timeout=10):
+        """
+        Block until everything queued so far is stored. Returns False if the
+        queue did not drain within ``timeout`` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if self._pending:
+                self._ensure_started()
+                self._condition.notify_all()
+            while self._pending or self._flushing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def metrics(self):
+        with self._condition:
+            oldest_age_ms = (time.monotonic() - self._pending[0][2]) * 1000 if self._pending else 0.0
+            return {
+                'http_writes_batched': is_enabled(),
+                'queue_depth': len(self._pending),
+                'oldest_pending_ms': round(oldest_age_ms, 2),
+                'enqueued_total': self._enqueued,
+                'flushed_total': self._flushed,
+                'failed_total': self._failed,
+                'flush_count': self._flushes,
+                'failed_flushes': self._failed_flushes,
+                'last_flush_ms': round(self._last_flush_ms, 2),
+                'max_flush_ms': round(self._max_flush_ms, 2),
+                'avg_flush_ms': round(self._total_flush_ms / self._flushes, 2) if self._flushes else 0.0,
+                'avg_batch_size': round(self._flushed / self._flushes, 2) if self._flushes else 0.0,
+            }
+
+
+writer = ChatWriter()
+
+
+def save_message(chat_message):
+    """Save a new chat message posted over HTTP, directly or with the writer's next batch."""
+    if is_enabled():
+        return writer.save(chat_message)
+    chat_message.save()
+    return chat_message
+
+
+@atexit.register
+def _flush_on_exit():
+    if writer._pending:
+        writer.flush(timeout=getattr(settings, 'CHAT_WRITER_SHUTDOWN_SECONDS', 10))
@@ -0,0 +1,414 @@
+"""
+Real-time fan-out of chat messages for the Server-Sent Events endpoints.
+
+Messages are published to an in-process broker as soon as they are committed.
+Because every worker process has its own broker, a single background poller per
+process also watches the chat tables for rows written by other workers and
+publishes them locally, so all subscribers see every message no matter which
+worker stored it.
+
+Under ASGI a stream is an async iterator that waits on its subscription
+without holding a thread, so idle clients cost only a queue each. Under WSGI
+the server has no other way to stream than to keep a worker thread per open
+stream; those streams are capped at ``CHAT_STREAM_MAX_SYNC_CLIENTS`` per
+process, and clients over the cap are told to retry (see ``accepts_stream``).
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# Number of recently published ids remembered per channel, used to drop the
+# duplicates that arrive once through the local publish and once via the poller
+SEEN_IDS_PER_CHANNEL = 256
+
+
+def event_channel(event_id):
+    return f"event:{event_id}"
+
+
+def task_channel(task_id):
+    return f"task:{task_id}"
+
+
+def format_sse(data=None, event_id=None, event=None, comment=None, retry=None):
+    """Format a single Server-Sent Events frame."""
+    lines = []
+    if comment is not None:
+        lines.append(f": {comment}")
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if data is not None:
+        payload = data if isinstance(data, str) else json.dumps(data)
+        for line in payload.splitlines() or ['']:
+            lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """A single client's view of one channel."""
+
+    def __init__(self, channel, max_pending):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=max_pending)
+        # Set when the client fell too far behind; the stream closes and the
+        # client reconnects with Last-Event-ID to catch up from the database
+        self.overflowed = False
+        # Event loop of an async reader, woken when a message is queued
+        self._loop = None
+        self._ready = None
+
+    def get(self, timeout):
+        """Return the next (message_id, payload) pair or None on timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def bind_loop(self):
+        """Let ``aget`` be awaited from the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    def notify(self):
+        """Wake an async reader; called by publishers, from any thread"""
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # The loop has closed: the stream is gone
+                pass
+
+    async def aget(self, timeout):
+        """``get`` for async readers: waits on the event loop, not in a thread"""
+        while True:
+            try:
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._ready.clear()
+            # A message queued between the check above and clear() is caught here
+            try:
+                return self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+
+class ChatBroker:
+    """Thread-safe in-process pub/sub keyed by chat channel name."""
+
+    def __init__(self, max_pending=500):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._seen = defaultdict(lambda: deque(maxlen=SEEN_IDS_PER_CHANNEL))
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, self.max_pending)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.channel]
+                self._seen.pop(subscription.channel, None)
+
+    def channels(self):
+        with self._lock:
+            return list(self._subscribers.keys())
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, channel, message_id, payload):
+        """Deliver a message to every subscriber of ``channel`` exactly once."""
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if not subscribers:
+                return 0
+            seen = self._seen[channel]
+            if message_id in seen:
+                return 0
+            seen.append(message_id)
+            targets = list(subscribers)
+
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait((message_id, payload))
+            except queue.Full:
+                subscription.overflowed = True
+            subscription.notify()
+        return len(targets)
+
+
+class DatabasePoller(threading.Thread):
+    """
+    Background thread that bridges workers through the shared database.
+
+    It only runs while this process has subscribers, and each pass issues at
+    most two indexed queries per chat table regardless of how many clients are
+    connected.
+    """
+
+    def __init__(self, broker, interval):
+        super().__init__(name='chat-stream-poller', daemon=True)
+        self.broker = broker
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.last_event_chat_id = None
+        self.last_task_chat_id = None
+
+    @staticmethod
+    def _poll(model, conversation_field, conversation_ids, cursor, publish):
+        """Publish rows newer than ``cursor`` and return the new cursor."""
+        latest = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        if cursor is None or latest <= cursor:
+            return latest if cursor is None else cursor
+
+        if conversation_ids:
+            rows = (model.objects
+                    .filter(id__gt=cursor, id__lte=latest, **{f'{conversation_field}__in': conversation_ids})
+                    .select_related('user')
+                    .order_by('id'))
+            for chat_message in rows:
+                publish(chat_message)
+        return latest
+
+    def run(self):
+        from ..models import Chat, EventChat
+
+        while True:
+            channels = self.broker.channels()
+            if not channels:
+                # Sleep until someone subscribes again, then start from the
+                # current tail so idle periods are never replayed
+                self.last_event_chat_id = None
+                self.last_task_chat_id = None
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+
+            try:
+                close_old_connections()
+                event_ids = [int(c.split(':')[1]) for c in channels if c.startswith('event:')]
+                task_ids = [int(c.split(':')[1]) for c in channels if c.startswith('task:')]
+
+                self.last_event_chat_id = self._poll(
+                    EventChat, 'event_id', event_ids, self.last_event_chat_id, publish_event_message
+                )
+                self.last_task_chat_id = self._poll(
+                    Chat, 'task_id', task_ids, self.last_task_chat_id, publish_task_message
+                )
+            except Exception as e:
+                print(f"Error in chat stream poller: {str(e)}")
+            finally:
+                close_old_connections()
+
+            time.sleep(self.interval)
+
+
+broker = ChatBroker(max_pending=getattr(settings, 'CHAT_STREAM_MAX_PENDING', 500))
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def ensure_poller():
+    """Start the cross-worker bridge on first use, if it is enabled."""
+    global _poller
+    if getattr(settings, 'CHAT_STREAM_BRIDGE', 'sqlite') != 'sqlite':
+        return
+    with _poller_lock:
+        if _poller is None:
+            _poller = DatabasePoller(broker, getattr(settings, 'CHAT_STREAM_POLL_SECONDS', 1.0))
+            _poller.start()
+    _poller.wakeup.set()
+
+
+def publish_event_message(chat_message):
+    from ..serializers.eventchat import EventChatSerializer
+
+    payload = EventChatSerializer(chat_message).data
+    return broker.publish(event_channel(chat_message.event_id), chat_message.id, dict(payload))
+
+
+def publish_task_message(chat_message):
+    from ..serializers.chat import TaskChatSerializer
+
+    payload = TaskChatSerializer(chat_message).data
+    return broker.publish(task_channel(chat_message.task_id), chat_message.id, dict(payload))
+
+
+def parse_last_event_id(request):
+    """Read the resume point sent by EventSource on reconnect (or as a query param)."""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+# Missed messages are replayed in pages of this size, however many there are
+BACKLOG_PAGE_SIZE = 500
+
+_sync_streams = 0
+_sync_streams_lock = threading.Lock()
+
+
+def _is_asgi(request):
+    from django.core.handlers.asgi import ASGIRequest
+
+    return isinstance(request, ASGIRequest)
+
+
+def accepts_stream(request):
+    """Whether another stream can be opened: always under ASGI, under WSGI while threads are left"""
+    if _is_asgi(request):
+        return True
+    with _sync_streams_lock:
+        return _sync_streams < getattr(settings, 'CHAT_STREAM_MAX_SYNC_CLIENTS', 50)
+
+
+def backlog_fetcher(messages, serializer_class):
+    """``fetch(after_id, limit)`` over a conversation's messages, for ``open_stream``"""
+    def fetch(after_id, limit):
+        page = messages.filter(id__gt=after_id).select_related('user').order_by('id')[:limit]
+        return [dict(item) for item in serializer_class(page, many=True).data]
+    return fetch
+
+
+class MessageStream:
+    """
+    The SSE frames for one client: first the messages it missed while
+    disconnected (when it sent Last-Event-ID), page by page from the database,
+    then live messages from its subscription. The subscription must be created
+    before the backlog is read so that nothing published in between is lost;
+    duplicates are skipped.
+
+    ``close()`` unsubscribes. Django calls it when the response is closed,
+    including when the stream was never iterated.
+    """
+
+    def __init__(self, request, subscription, fetch_backlog, last_event_id):
+        self.user_id = request.user.id
+        self.subscription = subscription
+        self.fetch_backlog = fetch_backlog
+        self.last_event_id = last_event_id
+        self.heartbeat = getattr(settings, 'CHAT_STREAM_HEARTBEAT_SECONDS', 15)
+        self.deadline = time.monotonic() + getattr(settings, 'CHAT_STREAM_MAX_SECONDS', 300)
+        self.last_backlog_id = 0
+        self.recently_sent = deque(maxlen=SEEN_IDS_PER_CHANNEL)
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            broker.unsubscribe(self.subscription)
+
+    def _frame(self, message_id, payload):
+        payload = dict(payload)
+        payload['is_current_user'] = payload.get('user') == self.user_id
+        return format_sse(payload, event_id=message_id, event='message')
+
+    def _backlog_frames(self, page):
+        for payload in page:
+            self.last_backlog_id = payload['id']
+            yield self._frame(payload['id'], payload)
+
+    def _live(self):
+        return time.monotonic() < self.deadline and not self.subscription.overflowed
+
+    def _live_frame(self, item):
+        if item is None:
+            return format_sse(comment='heartbeat')
+        message_id, payload = item
+        if message_id <= self.last_backlog_id or message_id in self.recently_sent:
+            return None
+        self.recently_sent.append(message_id)
+        return self._frame(message_id, payload)
+
+
+class SyncMessageStream(MessageStream):
+    """Iterated by a WSGI server thread"""
+
+    def __init__(self, *args):
+        global _sync_streams
+        super().__init__(*args)
+        with _sync_streams_lock:
+            _sync_streams += 1
+
+    def close(self):
+        global _sync_streams
+        if not self.closed:
+            with _sync_streams_lock:
+                _sync_streams -= 1
+        super().close()
+
+    def __iter__(self):
+        try:
+            yield format_sse(retry=3000, comment='connected')
+
+            after_id = self.last_event_id
+            while after_id is not None:
+                page = self.fetch_backlog(after_id, BACKLOG_PAGE_SIZE)
+                yield from self._backlog_frames(page)
+                after_id = page[-1]['id'] if len(page) == BACKLOG_PAGE_SIZE else None
+
+            while self._live():
+                frame = self._live_frame(self.subscription.get(timeout=self.heartbeat))
+                if frame:
+                    yield frame
+        finally:
+            self.close()
+
+
+class AsyncMessageStream(MessageStream):
+    """Iterated on the ASGI event loop; waiting for messages holds no thread"""
+
+    async def __aiter__(self):
+        from asgiref.sync import sync_to_async
+
+        self.subscription.bind_loop()
+        fetch_backlog = sync_to_async(self.fetch_backlog)
+        try:
+            yield format_sse(retry=3000, comment='connected')
+
+            after_id = self.last_event_id
+            while after_id is not None:
+                page = await fetch_backlog(after_id, BACKLOG_PAGE_SIZE)
+                for frame in self._backlog_frames(page):
+                    yield frame
+                after_id = page[-1]['id'] if len(page) == BACKLOG_PAGE_SIZE else None
+
+            while self._live():
+                frame = self._live_frame(await self.subscription.aget(timeout=self.heartbeat))
+                if frame:
+                    yield frame
+        finally:
+            self.close()
+
+
+def open_stream(request, subscription, fetch_backlog):
+    """The stream for the server the request came through (see the module docstring)"""
+    stream_class = AsyncMessageStream if _is_asgi(request) else SyncMessageStream
+    return stream_class(request, subscription, fetch_backlog, parse_last_event_id(request))
@@ -1,10 +1,11 @@
-from django.core.mail import send_mass_mail, EmailMessage, EmailMultiAlternatives
+from django.core.mail import send_mass_mail, EmailMessage, EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from typing import List, Dict, Union
 import threading
 from app.models import User
+from app.services import jobs
 
 class EmailThread(threading.Thread):
     """Handle emails in separate threads to prevent blocking"""
@@ -19,6 +20,22 @@ class EmailThread(threading.Thread):
 class EmailService:
     """Service for handling all email operations"""
     
+    @staticmethod
+    def html_message(subject: str, template_name: str, email: str, context: Dict,
+                     from_email: str) -> EmailMultiAlternatives:
+        """Render a template into an HTML email with a plain text alternative"""
+        html_content = render_to_string(template_name, context)
+        text_content = strip_tags(html_content)
+        
+        msg = EmailMultiAlternatives(
+            subject,
+            text_content,
+            from_email,
+            [email]
+        )
+        msg.attach_alternative(html_content, "text/html")
+        return msg
+    
     @staticmethod
     def send_mass_html_mail(subject: str, 
                            template_name: str, 
@@ -44,20 +61,9 @@ class EmailService:
                 # Merge global and recipient-specific context
                 email_context = context.copy() if context else {}
                 email_context.update(recipient.get('context', {}))
-                
-                # Render HTML content
-                html_content = render_to_string(template_name, email_context)
-                text_content = strip_tags(html_content)
-                
-                # Create message
-                msg = EmailMultiAlternatives(
-                    subject,
-                    text_content,
-                    from_email,
-                    [recipient['email']]
-                )
-                msg.attach_alternative(html_content, "text/html")
-                messages.append(msg)
+                messages.append(EmailService.html_message(
+                    subject, template_name, recipient['email'], email_context, from_email
+                ))
             
             # Send emails in separate threads
             for message in messages:
@@ -128,7 +134,17 @@ class EmailService:
     def notify_new_event(event):
         """
         Send notification to all users about a new event
+        With JOB_QUEUE_EMAILS a worker sends them (send_new_event_notification)
         """
+        if getattr(settings, 'JOB_QUEUE_EMAILS', False):
+            try:
+                # Not retried: a second attempt would email again everyone the first one reached
+                jobs.enqueue('new_event_notification', {'event_id': event.id}, max_attempts=1)
+                return True
+            except Exception as e:
+                print(f"Error queueing new event notification: {str(e)}")
+                return False
+        
         try:
             # Get all non-host users
             recipients = User.objects.filter(isHost=False, is_active=True)
@@ -164,4 +180,35 @@ class EmailService:
             
         except Exception as e:
             print(f"Error sending new event notification: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+    
+    @staticmethod
+    def send_new_event_notification(event, batch_size: int = 100) -> int:
+        """
+        Email all volunteers about a new event from a job: recipients are read
+        and rendered batch by batch and sent over a single connection
+        Returns the number of emails sent
+        """
+        recipients = User.objects.filter(isHost=False, is_active=True).order_by('id').values_list(
+            'id', 'name', 'email'
+        )
+        subject = f"New Event: {event.event_name}"
+        context = {
+            'event': event,
+            'base_url': settings.FRONTEND_URL,
+        }
+        
+        sent = 0
+        with get_connection() as connection:
+            batch = []
+            for user_id, name, email in recipients.iterator(chunk_size=batch_size):
+                batch.append(EmailService.html_message(
+                    subject, 'email/new_event_notification.html', email,
+                    {**context, 'user': {'name': name, 'id': user_id}}, settings.DEFAULT_FROM_EMAIL
+                ))
+                if len(batch) == batch_size:
+                    sent += connection.send_messages(batch) or 0
+                    batch = []
+            if batch:
+                sent += connection.send_messages(batch) or 0
+        return sent
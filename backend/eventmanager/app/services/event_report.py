@@ -0,0 +1,106 @@
+"""
+The event report: feedback analysis, task summary and recommendations of one
+event, built by ``ml.feedback_report.generate_event_report``.
+
+Reports are stored in ``EventReport`` with the data version they were built
+from. Signals call ``invalidate`` whenever something the report shows changes
+(feedback, tasks, subtasks, the event itself, enrollments, scored sentiment,
+the host's name), which only increments ``data_version``. ``get`` returns the stored report
+with a single-row read while the versions match, and rebuilds it otherwise.
+
+A rebuild reads ratings and willingness from the feedback rollup, sentiment
+from the stored scores, and task and subtask counts from one aggregate each;
+only the feedback texts and task notifications the report lists are read as
+rows.
+
+The numbers can therefore differ from those of the old builder, which read
+every feedback row:
+
+* The sentiment label is taken from the mean of the stored per-feedback
+  polarities. The old builder ran TextBlob once over all feedback text joined
+  together, so an event near the +-0.2 thresholds can get a different label.
+  While some feedback is not scored yet, the label is still computed the old
+  way.
+* Rating means leave out feedback that did not give the rating (null), like
+  ``Avg``. The old builder divided by the number of feedbacks and failed on
+  nulls. A rating nobody gave is 0.
+"""
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from ..models import EventReport, Feedback, SubTask, TaskInfo
+from . import feedback_rollup, feedback_sentiment
+
+
+def invalidate(event_id):
+    """Mark the stored report of an event as out of date"""
+    EventReport.objects.filter(event_id=event_id).update(data_version=F('data_version') + 1)
+
+
+def invalidate_for_task(task_id):
+    EventReport.objects.filter(event__tasks=task_id).update(data_version=F('data_version') + 1)
+
+
+def invalidate_for_host(host_id):
+    EventReport.objects.filter(event__host=host_id).update(data_version=F('data_version') + 1)
+
+
+def build(event):
+    """The report of an event, built from the current data"""
+    feedback_list = list(Feedback.objects.filter(event=event).order_by('id').values(
+        'strengths', 'improvements', 'additional_comments'
+    ))
+
+    task_list = list(TaskInfo.objects.filter(event=event).order_by('id').values('notification_message'))
+
+    tasks = TaskInfo.objects.filter(event=event).aggregate(
+        total=Count('id'), completed=Count('id', filter=Q(status='Completed'))
+    )
+    subtasks = SubTask.objects.filter(parent_task__event=event).aggregate(
+        total=Count('id'), completed=Count('id', filter=Q(status='Completed'))
+    )
+
+    event_data = {
+        'event_name': event.event_name,
+        'start_time': event.start_time.strftime('%Y-%m-%d %H:%M'),
+        'end_time': event.end_time.strftime('%Y-%m-%d %H:%M'),
+        'location': event.location,
+        'host': event.host.name,
+        'volunteer_enrolled': event.volunteer_enrolled.count(),
+        'required_volunteers': event.required_volunteers,
+        'overview': event.overview,
+        'task_analysis': event.task_analysis
+    }
+
+    rollup = feedback_rollup.for_event(event.id)
+    from ..ml.feedback_report import generate_event_report
+    return generate_event_report(
+        event=event_data,
+        feedback_list=feedback_list,
+        task_list=task_list,
+        subtask_list=[],
+        sentiment=feedback_sentiment.summary(event.id),
+        ratings=feedback_rollup.averages(rollup),
+        task_counts=(tasks['completed'], tasks['total'], subtasks['completed'], subtasks['total']),
+        volunteer_willingness=rollup.would_volunteer_again_count
+    )
+
+
+def get(event):
+    """The report of an event: the stored one if still current, else a fresh build, which is stored"""
+    stored = EventReport.objects.filter(event_id=event.id).first()
+    if stored is not None and stored.is_current:
+        return stored.report
+
+    if stored is None:
+        # Create the row before building, so changes made during the build invalidate it
+        stored, _ = EventReport.objects.get_or_create(event_id=event.id)
+    version = stored.data_version
+    report = build(event)
+    # Built from data at least as new as `version`; a change made meanwhile has
+    # already raised data_version, so the next read rebuilds. A build of a newer
+    # version that finished first is not overwritten.
+    EventReport.objects.filter(event_id=event.id, built_version__lt=version).update(
+        report=report, built_version=version, built_at=timezone.now()
+    )
+    return report
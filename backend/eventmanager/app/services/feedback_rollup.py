@@ -0,0 +1,180 @@
+"""
+Per-event rating statistics kept up to date with every feedback write.
+
+The chart, export and analytics views all need the same numbers: how many
+feedbacks an event has, how many would volunteer again, and the mean (and
+spread) of each of the ten rating fields. Instead of aggregating the feedback
+table on every request, ``FeedbackRollup`` holds for each rating its count,
+sum, sum of squares and 1-10 histogram, and ``apply`` adjusts them in the same
+transaction as the feedback insert, edit or delete.
+
+Concurrent writes to one event's rollup are serialised by the row lock (by
+the database write lock on SQLite, whose transactions begin IMMEDIATE; see
+settings.DATABASES).
+
+A missing rollup (an event whose feedback predates this) is rebuilt from the
+feedback table on first use. Null ratings are left out, as ``Avg`` does.
+"""
+import math
+
+from django.db import IntegrityError, transaction
+
+from ..models import Feedback, FeedbackRollup
+
+RATING_FIELDS = [
+    'overall_experience', 'organization_quality', 'communication',
+    'host_interaction', 'volunteer_support', 'task_clarity',
+    'impact_awareness', 'inclusivity', 'time_management', 'recognition'
+]
+
+VALUE_FIELDS = RATING_FIELDS + ['would_volunteer_again']
+
+
+def feedback_values(feedback):
+    """
+    The fields of a Feedback instance the rollup depends on, as they are
+    stored (views may have assigned form strings)
+    """
+    return {field: Feedback._meta.get_field(field).to_python(getattr(feedback, field)) for field in VALUE_FIELDS}
+
+
+def stored_values(feedback_id):
+    return Feedback.objects.filter(id=feedback_id).values(*VALUE_FIELDS).first()
+
+
+def _empty_metric():
+    return {'count': 0, 'sum': 0, 'sum_squares': 0, 'histogram': [0] * 10}
+
+
+def _add_values(rollup, values, sign):
+    rollup.feedback_count += sign
+    if values['would_volunteer_again']:
+        rollup.would_volunteer_again_count += sign
+    for field in RATING_FIELDS:
+        rating = values[field]
+        if rating is None:
+            continue
+        metric = rollup.metrics.setdefault(field, _empty_metric())
+        metric['count'] += sign
+        metric['sum'] += sign * rating
+        metric['sum_squares'] += sign * rating * rating
+        if 1 <= rating <= 10:
+            metric['histogram'][rating - 1] += sign
+
+
+def _build(event_id):
+    rollup = FeedbackRollup(event_id=event_id, metrics={field: _empty_metric() for field in RATING_FIELDS})
+    for values in Feedback.objects.filter(event_id=event_id).values(*VALUE_FIELDS).iterator():
+        _add_values(rollup, values, 1)
+    return rollup
+
+
+def _locked(event_id):
+    """The event's rollup, locked for update; built from the table if there is none yet"""
+    rollup = FeedbackRollup.objects.select_for_update().filter(event_id=event_id).first()
+    if rollup is not None:
+        return rollup, False
+    try:
+        with transaction.atomic():
+            rollup = _build(event_id)
+            rollup.save(force_insert=True)
+            return rollup, True
+    except IntegrityError:
+        # Built concurrently: use that row
+        return FeedbackRollup.objects.select_for_update().get(event_id=event_id), False
+
+
+def apply(event_id, old_values=None, new_values=None):
+    """
+    Replace one feedback's contribution to its event's rollup: ``old_values``
+    (None for an insert) by ``new_values`` (None for a delete). Must run in the
+    transaction that writes the feedback.
+    """
+    with transaction.atomic():
+        if new_values is None and not FeedbackRollup.objects.filter(event_id=event_id).exists():
+            # Nothing to take the feedback out of (the event may be being deleted)
+            return
+        rollup, built = _locked(event_id)
+        if built:
+            # Built from the table, which already reflects this write
+            return
+        if old_values is not None:
+            _add_values(rollup, old_values, -1)
+        if new_values is not None:
+            _add_values(rollup, new_values, 1)
+        rollup.save(update_fields=['feedback_count', 'would_volunteer_again_count', 'metrics', 'updated_at'])
+
+
+def recount(event_id):
+    """Rebuild an event's rollup from its feedback"""
+    with transaction.atomic():
+        rollup, built = _locked(event_id)
+        if not built:
+            fresh = _build(event_id)
+            rollup.feedback_count = fresh.feedback_count
+            rollup.would_volunteer_again_count = fresh.would_volunteer_again_count
+            rollup.metrics = fresh.metrics
+            rollup.save(update_fields=['feedback_count', 'would_volunteer_again_count', 'metrics', 'updated_at'])
+
+
+def for_event(event_id):
+    """The event's rollup, built on first use"""
+    rollup = FeedbackRollup.objects.filter(event_id=event_id).first()
+    if rollup is None:
+        with transaction.atomic():
+            rollup, _ = _locked(event_id)
+    return rollup
+
+
+def combined(event_ids):
+    """One unsaved rollup summing those of several events, read with one query"""
+    event_ids = list(event_ids)
+    rollups = {rollup.event_id: rollup for rollup in FeedbackRollup.objects.filter(event_id__in=event_ids)}
+    total = FeedbackRollup(metrics={field: _empty_metric() for field in RATING_FIELDS})
+    for event_id in event_ids:
+        rollup = rollups.get(event_id) or for_event(event_id)
+        total.feedback_count += rollup.feedback_count
+        total.would_volunteer_again_count += rollup.would_volunteer_again_count
+        for field in RATING_FIELDS:
+            metric, part = total.metrics[field], rollup.metrics.get(field, _empty_metric())
+            metric['count'] += part['count']
+            metric['sum'] += part['sum']
+            metric['sum_squares'] += part['sum_squares']
+            metric['histogram'] = [a + b for a, b in zip(metric['histogram'], part['histogram'])]
+    return total
+
+
+def _metric(rollup, field):
+    return rollup.metrics.get(field) or _empty_metric()
+
+
+def averages(rollup):
+    """``{rating field: mean}``, 0 for fields nobody rated"""
+    averages = {}
+    for field in RATING_FIELDS:
+        metric = _metric(rollup, field)
+        averages[field] = metric['sum'] / metric['count'] if metric['count'] else 0
+    return averages
+
+
+def standard_deviations(rollup):
+    """``{rating field: population standard deviation}``"""
+    deviations = {}
+    for field in RATING_FIELDS:
+        metric = _metric(rollup, field)
+        if metric['count']:
+            mean = metric['sum'] / metric['count']
+            deviations[field] = math.sqrt(max(metric['sum_squares'] / metric['count'] - mean * mean, 0))
+        else:
+            deviations[field] = 0
+    return deviations
+
+
+def histograms(rollup):
+    """``{rating field: {rating: count}}`` for ratings 1-10"""
+    return {field: {rating: count for rating, count in enumerate(_metric(rollup, field)['histogram'], 1)}
+            for field in RATING_FIELDS}
+
+
+def would_not_volunteer_again_count(rollup):
+    return rollup.feedback_count - rollup.would_volunteer_again_count
@@ -0,0 +1,200 @@
+"""
+Sentiment of feedback text, scored once per feedback and aggregated per event.
+
+``GenerateEventReportView`` used to join the text of every feedback of an
+event and run TextBlob over it on each request. Each ``Feedback`` now gets its
+own polarity and subjectivity, computed on a background thread after the row
+is committed (and again if its text is edited), and every score is added to the
+event's ``EventSentiment`` totals with a single ``UPDATE``. The report reads
+the averages and histogram from that one row.
+
+Feedback without any text is not scored and not counted.
+``manage.py score_feedback_sentiment`` scores rows saved before this existed;
+``summary`` also queues any unscored feedback it finds and returns None until
+it is scored, so the report analyses the text itself meanwhile.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+
+from ..models import EventSentiment, Feedback
+from . import event_report
+
+TEXT_FIELDS = ['strengths', 'improvements', 'additional_comments']
+
+# EventSentiment histogram fields, from the most negative polarity bucket up
+BUCKETS = ['very_negative', 'negative', 'neutral', 'positive', 'very_positive']
+
+
+def feedback_text(feedback):
+    return " ".join(getattr(feedback, field) or '' for field in TEXT_FIELDS).strip()
+
+
+def has_text():
+    """Filter for feedback with any text to score"""
+    condition = Q()
+    for field in TEXT_FIELDS:
+        condition |= ~Q(**{field: ''})
+    return condition
+
+
+def analyze(text):
+    """``(polarity, subjectivity)`` of ``text``"""
+    from textblob import TextBlob
+
+    sentiment = TextBlob(text).sentiment
+    return float(sentiment.polarity), float(sentiment.subjectivity)
+
+
+def bucket(polarity):
+    """Histogram bucket of a polarity; 'neutral' matches the report's neutral label"""
+    if polarity < -0.6:
+        return 'very_negative'
+    if polarity < -0.2:
+        return 'negative'
+    if polarity <= 0.2:
+        return 'neutral'
+    if polarity <= 0.6:
+        return 'positive'
+    return 'very_positive'
+
+
+def label(polarity):
+    """The label the event report has always used"""
+    if polarity > 0.2:
+        return "Positive"
+    elif polarity < -0.2:
+        return "Negative"
+    return "Neutral"
+
+
+def _add(event_id, polarity, subjectivity, sign=1):
+    """Add (or with ``sign=-1`` remove) one scored feedback to the event's totals."""
+    changes = {
+        'feedback_count': F('feedback_count') + sign,
+        'polarity_sum': F('polarity_sum') + sign * polarity,
+        'subjectivity_sum': F('subjectivity_sum') + sign * subjectivity,
+    }
+    name = bucket(polarity)
+    changes[name] = F(name) + sign
+    # The report shows the event's sentiment
+    event_report.invalidate(event_id)
+    if EventSentiment.objects.filter(event_id=event_id).update(**changes) or sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            EventSentiment.objects.create(event_id=event_id, feedback_count=1, polarity_sum=polarity,
+                                          subjectivity_sum=subjectivity, **{name: 1})
+    except IntegrityError:
+        # Created concurrently: add to that row instead
+        _add(event_id, polarity, subjectivity, sign)
+
+
+def score(feedback_id):
+    """
+    Score one feedback and update its event's totals, replacing an earlier
+    score. Returns ``(polarity, subjectivity)``, or None without text.
+    """
+    feedback = Feedback.objects.filter(id=feedback_id).only(*TEXT_FIELDS).first()
+    text = feedback_text(feedback) if feedback else ''
+    # Scored outside the transaction: TextBlob is the slow part
+    scores = analyze(text) if text else None
+
+    with transaction.atomic():
+        current = (Feedback.objects.select_for_update().filter(id=feedback_id)
+                   .values('event_id', 'sentiment_polarity', 'sentiment_subjectivity').first())
+        if current is None:
+            return None
+        if current['sentiment_polarity'] is not None:
+            _add(current['event_id'], current['sentiment_polarity'], current['sentiment_subjectivity'], -1)
+        polarity, subjectivity = scores or (None, None)
+        # update() rather than save(): no post_save, so no rescoring loop
+        Feedback.objects.filter(id=feedback_id).update(sentiment_polarity=polarity,
+                                                       sentiment_subjectivity=subjectivity)
+        if scores:
+            _add(current['event_id'], polarity, subjectivity)
+    return scores
+
+
+def remove(feedback_id):
+    """
+    Take a feedback that is being deleted out of its event's totals. Its score
+    is read from the database: instances loaded before it was scored lack it.
+    """
+    current = (Feedback.objects.select_for_update().filter(id=feedback_id)
+               .values('event_id', 'sentiment_polarity', 'sentiment_subjectivity').first())
+    if current and current['sentiment_polarity'] is not None:
+        _add(current['event_id'], current['sentiment_polarity'], current['sentiment_subjectivity'], -1)
+
+
+def move(feedback_id, from_event_id, to_event_id):
+    """
+    Carry a feedback's score from one event's totals to another's when the
+    feedback is moved. Must run in the transaction that moves it.
+    """
+    current = (Feedback.objects.select_for_update().filter(id=feedback_id)
+               .values('sentiment_polarity', 'sentiment_subjectivity').first())
+    if current and current['sentiment_polarity'] is not None:
+        _add(from_event_id, current['sentiment_polarity'], current['sentiment_subjectivity'], -1)
+        _add(to_event_id, current['sentiment_polarity'], current['sentiment_subjectivity'])
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='feedback-sentiment')
+
+
+def _score_in_background(feedback_id):
+    try:
+        close_old_connections()
+        score(feedback_id)
+    except Exception as e:
+        print(f"Error scoring sentiment of feedback {feedback_id}: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def schedule(feedback_id):
+    """Score a feedback off the request path, once the transaction that saved it commits"""
+    transaction.on_commit(lambda: _executor.submit(_score_in_background, feedback_id))
+
+
+def _score_unscored(feedback_ids):
+    # The single worker also runs schedule()'s jobs, so a row is never scored twice at once
+    try:
+        close_old_connections()
+        feedback_ids = list(Feedback.objects.filter(id__in=feedback_ids, sentiment_polarity__isnull=True)
+                            .values_list('id', flat=True))
+    finally:
+        close_old_connections()
+    for feedback_id in feedback_ids:
+        _score_in_background(feedback_id)
+
+
+def unscored_ids(event_id):
+    """Ids of the event's feedback that has text but no score yet"""
+    feedbacks = (Feedback.objects.filter(has_text(), event_id=event_id, sentiment_polarity__isnull=True)
+                 .only('id', *TEXT_FIELDS))
+    return [feedback.id for feedback in feedbacks if feedback_text(feedback)]
+
+
+def summary(event_id):
+    """
+    The event's sentiment for reports: averages, label and histogram. None
+    while some of its feedback is not scored yet; that feedback is queued.
+    """
+    unscored = unscored_ids(event_id)
+    if unscored:
+        transaction.on_commit(lambda: _executor.submit(_score_unscored, unscored))
+        return None
+
+    totals = EventSentiment.objects.filter(event_id=event_id).first()
+    count = totals.feedback_count if totals else 0
+    polarity = totals.polarity_sum / count if count else 0.0
+    subjectivity = totals.subjectivity_sum / count if count else 0.0
+    return {
+        'label': label(polarity),
+        'average_polarity': round(polarity, 3),
+        'average_subjectivity': round(subjectivity, 3),
+        'scored_feedback': count,
+        'distribution': {name: getattr(totals, name) if totals else 0 for name in BUCKETS},
+    }
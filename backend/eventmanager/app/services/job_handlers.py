@@ -0,0 +1,97 @@
+"""
+What each kind of background job does (see ``services.jobs``).
+
+A handler takes the claimed ``Job``, reads its ``params`` and either returns a
+``jobs.Result`` naming the file it wrote for the owner to download, or None.
+Anything it raises is recorded on the job, and the job is retried.
+"""
+import io
+import json
+
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ..models import EventInfo
+from . import analytics_charts, event_report, jobs, volunteer_export, zip_stream
+from .emailservice import EmailService
+
+# Commands the ml_recompute job may run (manage.py <command>)
+ML_COMMANDS = ['embed_events', 'precompute_recommendations', 'train_cf']
+
+
+def _event(job):
+    return EventInfo.objects.get(id=job.params['event_id'])
+
+
+def run_volunteer_export(job):
+    event = _event(job)
+    export_format = job.params.get('format', 'xlsx')
+    sheet = job.params.get('sheet', 'volunteers')
+    name = volunteer_export.filename(event, export_format, sheet)
+    path = jobs.result_path(job, name)
+
+    if export_format == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            output.writelines(volunteer_export.stream_csv(event, sheet))
+        return jobs.Result(path, name, 'text/csv')
+
+    with open(path, 'wb') as output:
+        volunteer_export.write_xlsx(event, output)
+    return jobs.Result(path, name, volunteer_export.XLSX_CONTENT_TYPE)
+
+
+def run_chart_export(job):
+    event = _event(job)
+    name = analytics_charts.export_filename(event)
+    path = jobs.result_path(job, name)
+    # The workers already run in parallel, so each renders its charts in process
+    with open(path, 'wb') as output:
+        for chunk in zip_stream.stream_zip(analytics_charts.export_pngs(event, workers=1)):
+            output.write(chunk)
+    return jobs.Result(path, name, 'application/zip')
+
+
+def run_event_report(job):
+    event = _event(job)
+    report = event_report.get(event)
+    name = f"event_{event.id}_report.json"
+    path = jobs.result_path(job, name)
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump({'status': 'success', 'report': report}, output, cls=DjangoJSONEncoder)
+    return jobs.Result(path, name, 'application/json')
+
+
+def run_new_event_notification(job):
+    sent = EmailService.send_new_event_notification(_event(job))
+    print(f"Job {job.id}: new event notification sent to {sent} volunteers")
+
+
+def run_embed_event(job):
+    from ..ml import embedding_store
+
+    # Deleting an event deletes its tasks, whose signals queue this job for it
+    events = EventInfo.objects.filter(id=job.params['event_id'])
+    embedding_store.embed_events(events)
+
+
+def run_ml_recompute(job):
+    command = job.params['command']
+    if command not in ML_COMMANDS:
+        raise ValueError(f"Invalid command: {command}")
+    output = io.StringIO()
+    call_command(command, stdout=output)
+    name = f"{command}.log"
+    path = jobs.result_path(job, name)
+    with open(path, 'w', encoding='utf-8') as log:
+        log.write(output.getvalue())
+    return jobs.Result(path, name, 'text/plain')
+
+
+HANDLERS = {
+    'volunteer_export': run_volunteer_export,
+    'chart_export': run_chart_export,
+    'event_report': run_event_report,
+    'new_event_notification': run_new_event_notification,
+    'ml_recompute': run_ml_recompute,
+    'embed_event': run_embed_event,
+}
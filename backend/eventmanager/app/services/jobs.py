@@ -0,0 +1,210 @@
+"""
+Job queue in the database, worked by ``manage.py runworker``.
+
+Exports, reports, email fan-out and ML recomputation take seconds to minutes.
+Run inside a request they hold a server thread and can outlast proxy
+timeouts; run in fire-and-forget threads they are lost when the process
+restarts. ``enqueue`` stores a ``Job`` row instead, and worker processes claim
+and run jobs in priority order (see ``job_handlers`` for what each kind does).
+
+Claiming is a compare-and-set: a worker reads the id of the next pending job,
+then runs ``UPDATE ... SET status='Running' WHERE id=? AND status='Pending'``.
+Only one worker's update can match the row, on SQLite (which serialises
+writes) as on PostgreSQL (which re-checks the WHERE clause once it holds the
+row lock); a worker that loses simply tries the next job. No
+``SELECT ... FOR UPDATE`` is needed, which SQLite does not have.
+
+A job that raises is retried with exponential backoff until it has been
+attempted ``max_attempts`` times. A job still running after
+``JOB_TIMEOUT_SECONDS`` (its worker died) is put back in the queue; kinds that
+take longer, such as ML recomputation, get their own limit in
+``JOB_KIND_TIMEOUT_SECONDS``. Results
+are files under ``JOB_RESULTS_DIR``, deleted with their job
+``JOB_RESULT_TTL_SECONDS`` after it finished.
+"""
+import os
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Job
+
+PRIORITY_INTERACTIVE = 10  # Someone is waiting for the result
+PRIORITY_DEFAULT = 0
+PRIORITY_BACKGROUND = -10  # Recomputation nobody is waiting for
+
+# Losing this many claims in a row means many workers are racing for few jobs; poll again later
+CLAIM_RETRIES = 5
+
+RETRY_BASE_SECONDS = 30
+
+# Returned by a handler that wrote a file for the owner to download
+Result = namedtuple('Result', ['path', 'name', 'content_type'])
+
+
+def results_dir():
+    return getattr(settings, 'JOB_RESULTS_DIR', os.path.join(settings.BASE_DIR, 'job_results'))
+
+
+def kind_timeouts():
+    return getattr(settings, 'JOB_KIND_TIMEOUT_SECONDS', {'ml_recompute': 6 * 60 * 60})
+
+
+def timeout(kind=None):
+    """Seconds a job of ``kind`` may run before it counts as abandoned"""
+    return kind_timeouts().get(kind, getattr(settings, 'JOB_TIMEOUT_SECONDS', 30 * 60))
+
+
+def result_ttl():
+    return getattr(settings, 'JOB_RESULT_TTL_SECONDS', 24 * 60 * 60)
+
+
+def _handlers():
+    # job_handlers imports the services the jobs run, some of which enqueue jobs
+    from .job_handlers import HANDLERS
+    return HANDLERS
+
+
+def enqueue(kind, params=None, owner=None, priority=PRIORITY_DEFAULT, max_attempts=3):
+    """Queue a job for the workers"""
+    if kind not in _handlers():
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, params=params or {}, owner=owner, priority=priority,
+                              max_attempts=max_attempts)
+
+
+def enqueue_once(kind, params=None, **options):
+    """Queue a job unless one of the same kind and params is already waiting; returns the job"""
+    pending = Job.objects.filter(kind=kind, params=params or {}, status='Pending').order_by('id').first()
+    return pending or enqueue(kind, params, **options)
+
+
+def claim(worker):
+    """The next pending job, now marked as running for ``worker``; None when there is nothing to do"""
+    for _ in range(CLAIM_RETRIES):
+        now = timezone.now()
+        job_id = (Job.objects.filter(status='Pending', run_after__lte=now)
+                  .order_by('-priority', 'id').values_list('id', flat=True).first())
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(id=job_id, status='Pending').update(
+            status='Running', claimed_by=worker, claimed_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def result_path(job, name):
+    """Where the current attempt of a job writes its result file"""
+    directory = results_dir()
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{job.id}-{job.attempts}-{name}")
+
+
+def _finish(job, worker, **fields):
+    # Only the claim that is still current may record an outcome; a timed-out
+    # attempt that finishes late is ignored
+    return Job.objects.filter(id=job.id, status='Running', claimed_by=worker, attempts=job.attempts).update(**fields)
+
+
+def run(job, worker):
+    """Run a claimed job and record its outcome"""
+    try:
+        handler = _handlers().get(job.kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        result = handler(job)
+    except Exception as e:
+        print(f"Error in job {job.id} ({job.kind}): {str(e)}")
+        print(traceback.format_exc())
+        if job.attempts < job.max_attempts:
+            delay = RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+            _finish(job, worker, status='Pending', claimed_by='', error=str(e),
+                    run_after=timezone.now() + timedelta(seconds=delay))
+        else:
+            _finish(job, worker, status='Failed', error=str(e), finished_at=timezone.now())
+        return False
+
+    fields = {'status': 'Completed', 'error': '', 'finished_at': timezone.now()}
+    if result is not None:
+        fields.update(result_path=result.path, result_name=result.name, result_content_type=result.content_type)
+    if not _finish(job, worker, **fields) and result is not None:
+        # The job was given to another worker meanwhile; its result is the one kept
+        _remove_file(result.path)
+    return True
+
+
+def requeue_stale():
+    """Give running jobs whose worker stopped answering to another worker, or fail them; returns the count"""
+    now = timezone.now()
+    overrides = kind_timeouts()
+
+    def started_before(seconds):
+        return Q(claimed_at__lt=now - timedelta(seconds=seconds))
+
+    expired = started_before(timeout()) & ~Q(kind__in=list(overrides))
+    for kind, seconds in overrides.items():
+        expired |= Q(kind=kind) & started_before(seconds)
+
+    stale = Job.objects.filter(expired, status='Running')
+    retried = stale.filter(attempts__lt=F('max_attempts')).update(status='Pending', claimed_by='', run_after=now)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='Failed', error='Timed out', finished_at=now
+    )
+    return retried + failed
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def purge_expired():
+    """Delete finished jobs older than JOB_RESULT_TTL_SECONDS and their files; returns the count"""
+    expired = Job.objects.filter(status__in=['Completed', 'Failed'],
+                                 finished_at__lt=timezone.now() - timedelta(seconds=result_ttl()))
+    for path in expired.exclude(result_path='').values_list('result_path', flat=True):
+        _remove_file(path)
+    return expired.delete()[0]
+
+
+def work(worker, stop, poll_seconds=2, exit_when_idle=False):
+    """Claim and run jobs until ``stop`` (a threading or multiprocessing Event) is set"""
+    while not stop.is_set():
+        # Workers live for days; drop connections the database may have closed, as requests do
+        close_old_connections()
+        job = claim(worker)
+        if job is None:
+            if exit_when_idle:
+                return
+            stop.wait(poll_seconds)
+            continue
+        run(job, worker)
+
+
+def describe(job):
+    """A job as returned by the API"""
+    data = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': f"{reverse('job_status')}?job_id={job.id}",
+    }
+    if job.error:
+        data['error'] = job.error
+    if job.status == 'Completed' and job.result_path:
+        data['download_url'] = f"{reverse('job_download')}?job_id={job.id}"
+    return data
@@ -0,0 +1,89 @@
+"""
+Time-decayed popularity of events, for trending lists and cold-start ranking.
+
+Every enrollment, chat message and detail view adds a weight ``w`` to the
+event's score, and the score halves every ``POPULARITY_HALF_LIFE_HOURS``.
+Rather than decaying every row over time, a signal at time ``t`` adds
+``w * exp(lambda * (t - EPOCH))``: the ratio between any two events is then
+the same as with real decay, so rows never need rewriting and one index on the
+score keeps them in trending order. The score is stored as a logarithm
+(``log_score``) so it cannot overflow, and updated with log-add-exp in a
+single ``UPDATE``.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from ..models import EventPopularity
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+DEFAULT_WEIGHTS = {
+    'enrollment': 5.0,
+    'chat': 1.0,
+    'view': 0.5,
+}
+
+
+def decay_rate():
+    """lambda per second"""
+    return math.log(2) / (getattr(settings, 'POPULARITY_HALF_LIFE_HOURS', 48) * 3600)
+
+
+def _log_weight(weight, at):
+    return math.log(weight) + decay_rate() * (at - EPOCH).total_seconds()
+
+
+def record(event_id, kind, at=None):
+    """Add one ``kind`` signal ('enrollment', 'chat' or 'view') to an event's score."""
+    weight = getattr(settings, 'POPULARITY_WEIGHTS', DEFAULT_WEIGHTS).get(kind)
+    if not weight:
+        return
+    at = at or timezone.now()
+    x = _log_weight(weight, at)
+
+    # log(e^a + e^x) = max(a, x) + log(1 + e^-|a - x|)
+    updated = EventPopularity.objects.filter(event_id=event_id).update(
+        log_score=Greatest(F('log_score'), Value(x)) + Ln(Value(1.0) + Exp(-Abs(F('log_score') - Value(x)))),
+        last_activity=at,
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                EventPopularity.objects.create(event_id=event_id, log_score=x, last_activity=at)
+        except IntegrityError:
+            # Created concurrently: add to that row instead
+            record(event_id, kind, at)
+
+
+def record_view(event_id, user=None):
+    """A detail view; repeated views by the same user within 10 minutes count once."""
+    viewer = user.pk if user is not None and user.is_authenticated else None
+    if viewer is not None and not cache.add(f'popularity:view:{event_id}:{viewer}', 1, 600):
+        return
+    record(event_id, 'view')
+
+
+def current_score(log_score, now=None):
+    """The decayed score at ``now``, in signal-weight units."""
+    now = now or timezone.now()
+    return math.exp(log_score - decay_rate() * (now - EPOCH).total_seconds())
+
+
+def trending(limit=10, statuses=('Upcoming', 'Ongoing')):
+    """The ``limit`` most popular events with these statuses, best first."""
+    return (EventPopularity.objects.filter(event__status__in=statuses)
+            .select_related('event').order_by('-log_score')[:limit])
+
+
+def popular_first(events):
+    """``events`` ordered by popularity, then start time (a prior for users we know nothing about)."""
+    return events.annotate(popularity_score=F('popularity__log_score')).order_by(
+        F('popularity_score').desc(nulls_last=True), 'start_time'
+    )
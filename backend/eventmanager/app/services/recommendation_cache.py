@@ -0,0 +1,374 @@
+"""
+Cached event rankings for the recommendation views.
+
+Ranking every candidate event against a volunteer's skills is the expensive
+part of a recommendation request, so the ranked ``(event id, score)`` list is
+cached per user, view parameters and model version. The cache key also holds
+generation counters (see ``cache_versions``):
+
+* ``recommendations:user:<id>`` is bumped when the user's skills or
+  enrollments change;
+* ``recommendations:status:<status>`` is bumped when an event with that
+  status, or one of its tasks, is created, changed or deleted.
+
+A bump therefore only invalidates the rankings that could have changed.
+Rankings that were requested recently are recomputed on a background thread
+right after the change, so the next request is served from the cache.
+
+Volunteers covered by the nightly ``manage.py precompute_recommendations``
+run are served from the ``Recommendation`` table before any of this; the cache
+and online ranking are the fallback for new users and uncovered requests.
+Events created or edited since the run are ranked online and merged in.
+
+The skills shown with each recommended event are extracted by the ML model
+too, so they are cached per event content rather than extracted per request.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, IntegerField, Min, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import EventInfo, Recommendation, TaskInfo, User
+from .cache_versions import bump_generation, get_generations
+
+ALL_STATUSES = [status for status, _ in EventInfo.STATUS_CHOICES]
+
+# Event statuses ranked by precompute_recommendations
+PRECOMPUTED_STATUSES = ['Upcoming', 'Ongoing']
+
+
+def model_version():
+    return getattr(settings, 'RECOMMENDATION_MODEL_VERSION', 'skills-minilm-v1')
+
+
+# Candidate sets: each returns (queryset ordered by start time, statuses it draws from)
+
+def recommend_events_queryset(user, status='Upcoming', include_enrolled=False):
+    """Candidates of RecommendEventsForVolunteerView"""
+    events = EventInfo.objects.filter(status=status)
+    if not include_enrolled:
+        events = events.exclude(volunteer_enrolled=user)
+    return events.order_by('start_time'), [status]
+
+
+def sorted_events_queryset(user, status='active', include_past=False):
+    """Candidates of GetSortedEventsByRelevanceView"""
+    now = timezone.now()
+    if status == 'all':
+        events, statuses = EventInfo.objects.all(), ALL_STATUSES
+    elif status == 'active':
+        events = EventInfo.objects.filter(
+            (Q(status='Ongoing') | Q(status='Upcoming')) &
+            (Q(end_time__gte=now) | Q(start_time__gte=now))
+        )
+        statuses = ['Ongoing', 'Upcoming']
+    elif status == 'ongoing':
+        events, statuses = EventInfo.objects.filter(status='Ongoing'), ['Ongoing']
+    elif status == 'upcoming':
+        events, statuses = EventInfo.objects.filter(status='Upcoming'), ['Upcoming']
+    else:
+        events, statuses = EventInfo.objects.filter(status=status), [status]
+
+    if not include_past:
+        events = events.filter(end_time__gte=now)
+    return events.order_by('start_time'), statuses
+
+
+CANDIDATE_SETS = {
+    'recommend_events': recommend_events_queryset,
+    'sorted_events': sorted_events_queryset,
+}
+
+
+def _count(model, field):
+    rows = (model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(count=Count('*')).values('count'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def build_events_data(events, user):
+    """
+    Event dicts in the format the recommenders expect, plus volunteer and task
+    counts, using three queries however many events there are.
+    """
+    events = events.annotate(
+        volunteer_count=_count(EventInfo.volunteer_enrolled.through, 'eventinfo_id'),
+        task_count=_count(TaskInfo, 'event_id'),
+    ).prefetch_related(Prefetch('tasks', queryset=TaskInfo.objects.order_by('id')))
+    enrolled_ids = set(user.enrolled_events.values_list('id', flat=True))
+
+    events_data = []
+    for event in events:
+        events_data.append({
+            'id': event.id,
+            'name': event.event_name,
+            'description': event.description,
+            'overview': event.overview,
+            'tasks': [
+                {
+                    'id': task.id,
+                    'name': task.task_name,
+                    'description': task.description,
+                    'required_skills': task.required_skills
+                }
+                for task in event.tasks.all()
+            ],
+            'start_time': event.start_time.isoformat(),
+            'end_time': event.end_time.isoformat(),
+            'location': event.location,
+            'status': event.status,
+            'enrolled': event.id in enrolled_ids,
+            'volunteer_count': event.volunteer_count,
+            'task_count': event.task_count,
+        })
+    return events_data
+
+
+def _rank(user, events_data):
+    """
+    Rank by skills, blended with the collaborative-filtering score for users
+    with enrollment history; users without skills are ranked by the latter
+    alone. None for users with neither, who have nothing to be ranked by.
+    """
+    from ..ml import collaborative
+
+    cf_scores = collaborative.scores_for_user(user.id, [event['id'] for event in events_data])
+    if not user.skills:
+        if not cf_scores:
+            return None
+        ranked = [dict(event, relevance_score=cf_scores.get(event['id'], 0.0)) for event in events_data]
+        return sorted(ranked, key=lambda event: event['relevance_score'], reverse=True)
+
+    from ..ml.loader import recommender
+    ranked = recommender().recommend_events_for_volunteer(user.skills, events_data)
+    if cf_scores:
+        for event in ranked:
+            event['relevance_score'] = collaborative.blend(event['relevance_score'], cf_scores.get(event['id'], 0.0))
+        ranked.sort(key=lambda event: event['relevance_score'], reverse=True)
+    return ranked
+
+
+def _precomputed(user, item_type, candidates, limit):
+    """
+    ``([(id, score)], changed_ids)`` from the nightly run: the best
+    precomputed candidates, and the ids of candidates created or edited since
+    the run, whose stored rows (if any) are left out because they are missing
+    or stale. None when the table does not cover the candidates (no rows yet,
+    or too few for ``limit``).
+    """
+    rows = Recommendation.objects.filter(user=user, item_type=item_type, model_version=model_version())
+    computed_at = rows.aggregate(computed_at=Min('computed_at'))['computed_at']
+    if computed_at is None:
+        return None
+
+    # The event text the run ranked includes the event's tasks
+    if item_type == 'event':
+        changed = candidates.filter(Q(updated_at__gt=computed_at) | Q(tasks__updated_at__gt=computed_at))
+        rows = rows.filter(event__in=candidates).values_list('event_id', 'score')
+    else:
+        changed = candidates.filter(Q(updated_at__gt=computed_at) | Q(event__updated_at__gt=computed_at))
+        rows = rows.filter(task__in=candidates).values_list('task_id', 'score')
+    changed_ids = set(changed.order_by().values_list('id', flat=True))
+
+    rows = [row for row in rows.order_by('rank')[:limit + len(changed_ids)] if row[0] not in changed_ids][:limit]
+    if len(rows) < limit and len(rows) < candidates.count() - len(changed_ids):
+        return None
+    return rows, changed_ids
+
+
+def precomputed_task_ids(user, tasks, limit):
+    """
+    Ids of the best tasks of queryset ``tasks`` for ``user`` from the nightly
+    run, or None (also when tasks changed since the run, so all are ranked live)
+    """
+    precomputed = _precomputed(user, 'task', tasks, limit)
+    if precomputed is None or precomputed[1]:
+        return None
+    return [task_id for task_id, _ in precomputed[0]]
+
+
+def discard_precomputed(user_id):
+    """Rows ranked against skills the user no longer has"""
+    Recommendation.objects.filter(user_id=user_id).delete()
+
+
+def _cache_key(kind, user_id, params, statuses):
+    generations = get_generations(
+        [f'recommendations:user:{user_id}'] + [f'recommendations:status:{status}' for status in statuses]
+    )
+    from ..ml.collaborative import model_stamp
+
+    raw = f"{kind}|{sorted(params.items())}|{model_version()}|{model_stamp()}|{generations}"
+    return f"recommendations:{kind}:{user_id}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def _compute(kind, user, params, key):
+    events, _ = CANDIDATE_SETS[kind](user, **params)
+    ranked = _rank(user, build_events_data(events, user))
+    if ranked is not None:
+        cache.set(key, [[event['id'], event['relevance_score']] for event in ranked],
+                  getattr(settings, 'RECOMMENDATION_CACHE_SECONDS', 3600))
+    return ranked
+
+
+def ranked_events(kind, user, limit, **params):
+    """
+    Return ``(events, total)``: the ``limit`` best events for ``user`` as event
+    dicts with ``relevance_score``, and how many candidates were ranked. None
+    for users with neither skills nor enrollment history.
+    """
+    events, statuses = CANDIDATE_SETS[kind](user, **params)
+    if set(statuses) <= set(PRECOMPUTED_STATUSES):
+        precomputed = _precomputed(user, 'event', events, limit)
+        if precomputed is not None:
+            ranking, changed_ids = precomputed
+            if changed_ids:
+                # Events created or edited since the nightly run are ranked now and merged in
+                live = _rank(user, build_events_data(events.filter(id__in=changed_ids), user)) or []
+                ranking = sorted(ranking + [(event['id'], event['relevance_score']) for event in live],
+                                 key=lambda item: item[1], reverse=True)[:limit]
+            return _events_for(events, ranking, user), events.count()
+
+    key = _cache_key(kind, user.id, params, statuses)
+    _remember(kind, user.id, params, statuses)
+
+    ranking = cache.get(key)
+    if ranking is None:
+        ranked = _compute(kind, user, params, key)
+        return None if ranked is None else (ranked[:limit], len(ranked))
+
+    # Fetch a few spare events in case some left the candidate set since ranking
+    ranked = _events_for(events, ranking[:limit + 20], user)
+    if len(ranked) < limit and len(ranking) > limit + 20:
+        # More than the spares have left; the rest of the cached ranking may be
+        # just as stale, so rank the current candidates again
+        ranked = _compute(kind, user, params, key) or []
+        return ranked[:limit], len(ranked)
+    return ranked[:limit], len(ranking)
+
+
+def _events_for(events, ranking, user):
+    """Event dicts for ``[(id, score)]`` in ranking order, skipping events no longer in ``events``"""
+    by_id = {event['id']: event for event in
+             build_events_data(events.filter(id__in=[event_id for event_id, _ in ranking]), user)}
+    ranked = []
+    for event_id, score in ranking:
+        if event_id in by_id:
+            by_id[event_id]['relevance_score'] = score
+            ranked.append(by_id[event_id])
+    return ranked
+
+
+def _skills_key(event):
+    tasks = [(task['name'], task['description'], task['required_skills']) for task in event['tasks']]
+    raw = f"{model_version()}|{event['name']}|{event['description']}|{tasks}"
+    return f"recommendations:event_skills:{event['id']}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def add_extracted_skills(events):
+    """
+    Set ``extracted_skills`` on event dicts. The key covers the text the
+    skills are extracted from, so an edited event is extracted again, and the
+    ML stack is only needed for events missing from the cache.
+    """
+    keys = {event['id']: _skills_key(event) for event in events}
+    cached = cache.get_many(list(keys.values()))
+    extracted = {}
+    for event in events:
+        skills = cached.get(keys[event['id']])
+        if skills is None:
+            from ..ml.loader import recommender
+            skills = recommender().extract_event_skills(event)
+            extracted[keys[event['id']]] = skills
+        event['extracted_skills'] = skills
+    if extracted:
+        cache.set_many(extracted, getattr(settings, 'RECOMMENDATION_CACHE_SECONDS', 3600))
+    return events
+
+
+# Warming
+
+_recent = {}
+_recent_lock = threading.Lock()
+_pending = set()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommendation-warmer')
+
+
+def _remember(kind, user_id, params, statuses):
+    """Track which rankings are in use so they can be warmed after a change."""
+    now = time.monotonic()
+    window = getattr(settings, 'RECOMMENDATION_WARM_WINDOW_SECONDS', 3600)
+    with _recent_lock:
+        _recent[(kind, user_id, tuple(sorted(params.items())))] = (now, frozenset(statuses))
+        if len(_recent) > getattr(settings, 'RECOMMENDATION_WARM_MAX_ENTRIES', 1000):
+            for entry, (last_used, _) in list(_recent.items()):
+                if now - last_used > window:
+                    del _recent[entry]
+
+
+def _warm(entry):
+    kind, user_id, params = entry
+    with _recent_lock:
+        _pending.discard(entry)
+    try:
+        close_old_connections()
+        user = User.objects.get(id=user_id)
+        params = dict(params)
+        _, statuses = CANDIDATE_SETS[kind](user, **params)
+        key = _cache_key(kind, user.id, params, statuses)
+        if cache.get(key) is None:
+            _compute(kind, user, params, key)
+    except Exception as e:
+        print(f"Error warming recommendations for user {user_id}: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def _schedule(entries):
+    with _recent_lock:
+        # Several changes in a row queue a single recomputation per ranking
+        entries = [entry for entry in entries if entry not in _pending]
+        _pending.update(entries)
+    for entry in entries:
+        _executor.submit(_warm, entry)
+
+
+def warm_user(user_id):
+    with _recent_lock:
+        entries = [entry for entry in _recent if entry[1] == user_id]
+    _schedule(entries)
+
+
+def warm_statuses(statuses):
+    statuses = set(statuses)
+    with _recent_lock:
+        entries = [entry for entry, (_, entry_statuses) in _recent.items() if entry_statuses & statuses]
+    _schedule(entries)
+
+
+# Invalidation (called from signals)
+
+def invalidate_user(user_id):
+    """The user's skills or enrollments changed"""
+    def run():
+        bump_generation(f'recommendations:user:{user_id}')
+        warm_user(user_id)
+    transaction.on_commit(run)
+
+
+def invalidate_statuses(statuses):
+    """An event with one of these statuses, or one of its tasks, changed"""
+    statuses = {status for status in statuses if status}
+
+    def run():
+        for status in statuses:
+            bump_generation(f'recommendations:status:{status}')
+        warm_statuses(statuses)
+    transaction.on_commit(run)
@@ -0,0 +1,152 @@
+"""
+Skill coverage of an event: what its tasks require, what its enrolled
+volunteers offer, and which other volunteers would close the gaps.
+
+Volunteer skills are parsed once into a boolean volunteer x skill matrix, so
+the counts are column sums rather than a re-split of every volunteer's skills
+for every skill. Extra volunteers are suggested with the greedy set-cover
+heuristic: repeatedly take the volunteer who covers the most still-missing
+skills.
+
+Results are cached per event version: a generation bumped when the event's
+tasks or enrollments change, or when a volunteer gains or loses a skill the
+analysis counts. The suggested volunteers name people who are not enrolled,
+so views show them only to the event's host.
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q
+
+from ..models import EventInfo, TaskInfo, User
+from .cache_versions import bump_generation, get_generations
+
+
+def parse_skills(text):
+    """Normalised, de-duplicated skills of a comma-separated string"""
+    return list(dict.fromkeys(s.strip().lower() for s in (text or '').split(',') if s.strip()))
+
+
+def skill_matrix(skill_texts, skills):
+    """Boolean ``len(skill_texts) x len(skills)`` matrix of who has which skill"""
+    column = {skill: j for j, skill in enumerate(skills)}
+    matrix = np.zeros((len(skill_texts), len(skills)), dtype=bool)
+    for i, text in enumerate(skill_texts):
+        for skill in parse_skills(text):
+            j = column.get(skill)
+            if j is not None:
+                matrix[i, j] = True
+    return matrix
+
+
+def greedy_cover(matrix, demand):
+    """
+    Rows of ``matrix`` picked greedily until the per-column ``demand`` is met
+    or no row helps. Returns ``(picks, remaining demand)`` where each pick is
+    ``(row, columns it helped with)``.
+    """
+    remaining = np.asarray(demand, dtype=np.int64).copy()
+    available = np.ones(len(matrix), dtype=bool)
+    picked = []
+    while (remaining > 0).any() and available.any():
+        gains = matrix[:, remaining > 0].sum(axis=1)
+        gains[~available] = 0
+        best = int(np.argmax(gains))
+        if gains[best] == 0:
+            break
+        picked.append((best, matrix[best] & (remaining > 0)))
+        available[best] = False
+        remaining -= matrix[best]
+    return picked, np.maximum(remaining, 0)
+
+
+def analyze(event, skill_counts):
+    """
+    Coverage of ``skill_counts`` (skill -> number of tasks requiring it) by the
+    volunteers enrolled in ``event``, and the extra volunteers that would close
+    the gaps.
+    """
+    skills = sorted(skill_counts, key=lambda skill: (-skill_counts[skill], skill))
+    required = np.array([skill_counts[skill] for skill in skills], dtype=np.int64)
+
+    enrolled = list(event.volunteer_enrolled.values_list('skills', flat=True))
+    available = skill_matrix(enrolled, skills).sum(axis=0).astype(np.int64)
+    shortfall = np.maximum(required - available, 0)
+
+    suggested, uncovered = [], shortfall
+    gap_skills = [skill for skill, gap in zip(skills, shortfall) if gap > 0]
+    if gap_skills:
+        condition = Q()
+        for skill in gap_skills:
+            condition |= Q(skills__icontains=skill)
+        candidates = list(
+            User.objects.filter(condition, isHost=False, is_active=True)
+            .exclude(enrolled_events=event).order_by('id').values_list('id', 'name', 'skills')
+        )
+        matrix = skill_matrix([row[2] for row in candidates], skills)
+        picked, uncovered = greedy_cover(matrix, shortfall)
+        for row, helped in picked:
+            user_id, name, _ = candidates[row]
+            suggested.append({
+                'id': user_id,
+                'name': name,
+                'covers': [skill for skill, covers in zip(skills, helped) if covers]
+            })
+
+    total_required = int(required.sum())
+    covered = int(np.minimum(required, available).sum())
+    return {
+        'skills': skills,
+        'volunteer_skill_counts': {skill: int(count) for skill, count in zip(skills, available)},
+        'skill_gaps': [
+            {'skill': skill, 'required': int(req), 'available': int(avail), 'gap': int(gap)}
+            for skill, req, avail, gap in sorted(zip(skills, required, available, shortfall),
+                                                 key=lambda item: item[3], reverse=True)
+            if gap > 0
+        ],
+        'coverage_percentage': round(covered / total_required * 100 if total_required else 0, 1),
+        'suggested_volunteers': suggested,
+        'uncovered_skills': {skill: int(gap) for skill, gap in zip(skills, uncovered) if gap > 0},
+        'total_volunteers': len(enrolled),
+    }
+
+
+def cache_keys(event_ids):
+    """``{cache key: event id}`` of the current analyses of the events"""
+    event_ids = list(event_ids)
+    generations = get_generations([f'skill_coverage:event:{event_id}' for event_id in event_ids])
+    return {f"skill_coverage:{event_id}:{generation}": event_id
+            for event_id, generation in zip(event_ids, generations)}
+
+
+def cache_key(event_id):
+    return next(iter(cache_keys([event_id])))
+
+
+def invalidate_event(event_id):
+    bump_generation(f'skill_coverage:event:{event_id}')
+
+
+def invalidate_for_skill_change(old_skills, new_skills):
+    """
+    Invalidate the events a volunteer's skill change can affect: those whose
+    coverage counts a skill they gained or lost, whether the volunteer is
+    enrolled or a possible suggestion. Those are the skills the event's tasks
+    require or, for events whose tasks require none, the skills the ML model
+    extracted from the event text, which only the cached analysis records.
+    """
+    changed = set(parse_skills(old_skills)) ^ set(parse_skills(new_skills))
+    if not changed:
+        return
+    condition = Q()
+    for skill in changed:
+        condition |= Q(required_skills__icontains=skill)
+    event_ids = set(TaskInfo.objects.filter(condition).values_list('event_id', flat=True).distinct())
+
+    with_required = TaskInfo.objects.filter(required_skills__regex=r'[^\s,]').values('event_id')
+    keys = cache_keys(EventInfo.objects.exclude(id__in=with_required).values_list('id', flat=True))
+    for key, analysis in cache.get_many(list(keys)).items():
+        if changed & set(analysis['skills']):
+            event_ids.add(keys[key])
+
+    for event_id in event_ids:
+        invalidate_event(event_id)
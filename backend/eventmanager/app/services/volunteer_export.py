@@ -0,0 +1,241 @@
+"""
+Volunteer export of an event, as an Excel workbook or as CSV.
+
+Every sheet is read with a single query: task counts and completion rates
+are annotated per volunteer, each feedback's average rating is computed in the
+database, and the summary comes from a few aggregates. Rows are taken from
+``.iterator()`` and written out as they arrive. The workbook is written in
+xlsxwriter's ``constant_memory`` mode, which flushes each row to a temporary
+file as soon as the next one starts. CSV is streamed straight to the client,
+so memory use does not grow with the size of the event.
+"""
+import csv
+import datetime
+import itertools
+import tempfile
+
+import xlsxwriter
+from django.db.models import Avg, Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, NullIf
+
+from ..models import Feedback, TaskInfo
+from .feedback_rollup import RATING_FIELDS
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def _average_rating():
+    """Mean of a feedback's non-null ratings, 0 when it has none (as Feedback.average_rating)"""
+    total = sum((Coalesce(F(field), 0) for field in RATING_FIELDS), Value(0))
+    rated = sum((Case(When(**{f'{field}__isnull': False}, then=1), default=0) for field in RATING_FIELDS), Value(0))
+    return Coalesce(ExpressionWrapper(total * 1.0 / NullIf(rated, 0), output_field=FloatField()), 0.0)
+
+
+def _date(value, fmt):
+    return value.strftime(fmt) if value else ''
+
+
+def _yes_no(value):
+    return 'Yes' if value else 'No'
+
+
+# Sheets
+
+VOLUNTEER_COLUMNS = ['Volunteer ID', 'Name', 'Email', 'Contact', 'Skills', 'Organization', 'Location',
+                     'Assigned Tasks', 'Completed Tasks', 'Completion Rate', 'Feedback Submitted',
+                     'Overall Rating', 'Would Volunteer Again', 'Signup Date']
+
+
+def volunteer_rows(event):
+    """One row per enrolled volunteer with their task counts and feedback"""
+    in_event = Q(assigned_tasks__event=event)
+    feedback = Feedback.objects.filter(event=event, user=OuterRef('pk'))
+    volunteers = event.volunteer_enrolled.annotate(
+        assigned=Count('assigned_tasks', filter=in_event),
+        completed=Count('assigned_tasks', filter=in_event & Q(assigned_tasks__status='Completed')),
+        completion_rate=Case(
+            When(assigned=0, then=Value(0.0)),
+            default=ExpressionWrapper(F('completed') * 100.0 / F('assigned'), output_field=FloatField()),
+        ),
+        feedback_rating=Subquery(feedback.annotate(rating=_average_rating()).values('rating')[:1]),
+        feedback_again=Subquery(feedback.values('would_volunteer_again')[:1]),
+    ).order_by('id').values_list(
+        'id', 'name', 'email', 'contact', 'skills', 'organization', 'location', 'assigned', 'completed',
+        'completion_rate', 'feedback_rating', 'feedback_again', 'date_joined',
+    )
+
+    for (volunteer_id, name, email, contact, skills, organization, location, assigned, completed,
+         completion_rate, rating, again, date_joined) in volunteers.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        has_feedback = again is not None
+        yield [
+            volunteer_id, name, email, contact, skills, organization, location, assigned, completed,
+            f"{completion_rate:.1f}%",
+            _yes_no(has_feedback),
+            f"{rating:.1f}" if has_feedback else '-',
+            _yes_no(again) if has_feedback else '-',
+            _date(date_joined, '%Y-%m-%d'),
+        ]
+
+
+ASSIGNMENT_COLUMNS = ['Volunteer Name', 'Volunteer ID', 'Task ID', 'Task Name', 'Status', 'Start Time',
+                      'End Time', 'Required Skills', 'Completion Notified', 'Completion Message']
+
+
+def assignment_rows(event):
+    """One row per task assignment of an enrolled volunteer"""
+    assignments = TaskInfo.volunteers.through.objects.filter(
+        taskinfo__event=event, user__enrolled_events=event
+    ).order_by('user_id', 'taskinfo_id').values_list(
+        'user__name', 'user_id', 'taskinfo_id', 'taskinfo__task_name', 'taskinfo__status', 'taskinfo__start_time',
+        'taskinfo__end_time', 'taskinfo__required_skills', 'taskinfo__completion_notified',
+        'taskinfo__notification_message',
+    )
+
+    for (name, volunteer_id, task_id, task_name, status, start_time, end_time, skills, notified,
+         message) in assignments.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield [
+            name, volunteer_id, task_id, task_name, status,
+            _date(start_time, '%Y-%m-%d %H:%M'), _date(end_time, '%Y-%m-%d %H:%M'), skills,
+            _yes_no(notified), message if notified else '',
+        ]
+
+
+FEEDBACK_COLUMNS = ['Volunteer Name', 'Volunteer ID', 'Overall Experience', 'Organization Quality',
+                    'Communication', 'Host Interaction', 'Volunteer Support', 'Task Clarity', 'Impact Awareness',
+                    'Inclusivity', 'Time Management', 'Recognition', 'Strengths', 'Improvements',
+                    'Additional Comments', 'Would Volunteer Again', 'Average Rating', 'Submitted At']
+
+
+def feedback_rows(event):
+    """One row per feedback on the event"""
+    feedbacks = Feedback.objects.filter(event=event).annotate(rating=_average_rating()).order_by('id').values_list(
+        'user__name', 'user_id', *RATING_FIELDS, 'strengths', 'improvements', 'additional_comments',
+        'would_volunteer_again', 'rating', 'created_at',
+    )
+
+    for row in feedbacks.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        name, volunteer_id = row[:2]
+        ratings = row[2:2 + len(RATING_FIELDS)]
+        strengths, improvements, comments, again, rating, created_at = row[2 + len(RATING_FIELDS):]
+        yield [
+            name, volunteer_id, *('-' if value is None else value for value in ratings),
+            strengths, improvements, comments, _yes_no(again), f"{rating:.1f}",
+            _date(created_at, '%Y-%m-%d %H:%M'),
+        ]
+
+
+SUMMARY_COLUMNS = ['Metric', 'Value']
+
+
+def summary_rows(event):
+    """Headline numbers of the event, from one aggregate per table"""
+    volunteer_count = event.volunteer_enrolled.count()
+    tasks = TaskInfo.objects.filter(event=event).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='Completed')),
+        in_progress=Count('id', filter=Q(status='In Progress')),
+        pending=Count('id', filter=Q(status='Pending')),
+    )
+    feedback = Feedback.objects.filter(event=event).aggregate(
+        count=Count('id'), again=Count('id', filter=Q(would_volunteer_again=True)), rating=Avg(_average_rating())
+    )
+
+    def percent(part, whole):
+        return f"{(part / whole * 100) if whole else 0:.1f}%"
+
+    return [
+        ['Event Name', event.event_name],
+        ['Event Status', event.status],
+        ['Event Start Date', event.start_time.strftime('%Y-%m-%d') if event.start_time else 'Not set'],
+        ['Event End Date', event.end_time.strftime('%Y-%m-%d') if event.end_time else 'Not set'],
+        ['Total Volunteers', volunteer_count],
+        ['Total Tasks', tasks['total']],
+        ['Completed Tasks', tasks['completed']],
+        ['In Progress Tasks', tasks['in_progress']],
+        ['Pending Tasks', tasks['pending']],
+        ['Feedback Submission Rate', percent(feedback['count'], volunteer_count)],
+        ['Avg. Volunteer Rating', f"{feedback['rating'] or 0:.1f}/10.0"],
+        ['Would Volunteer Again Rate', percent(feedback['again'], feedback['count'])],
+        ['Report Generated', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+    ]
+
+
+# sheet parameter -> (sheet title, columns, rows, message when empty)
+SHEETS = {
+    'volunteers': ('Volunteers Overview', VOLUNTEER_COLUMNS, volunteer_rows, 'No volunteers enrolled in this event'),
+    'assignments': ('Task Assignments', ASSIGNMENT_COLUMNS, assignment_rows, 'No task assignments for this event'),
+    'feedback': ('Volunteer Feedback', FEEDBACK_COLUMNS, feedback_rows, 'No feedback submitted for this event'),
+    'summary': ('Event Summary', SUMMARY_COLUMNS, summary_rows, ''),
+}
+
+WIDE_COLUMNS = {'Strengths', 'Improvements', 'Additional Comments'}
+
+
+# Output
+
+def filename(event, export_format='xlsx', sheet='volunteers'):
+    """Download name of an export: the workbook, or one sheet as CSV"""
+    safe_event_name = event.event_name.replace(' ', '_').replace('/', '-')
+    today = datetime.date.today().strftime('%Y-%m-%d')
+    if export_format == 'csv':
+        return f"{safe_event_name}_{sheet}_{today}.csv"
+    return f"{safe_event_name}_Volunteers_{today}.xlsx"
+
+
+def write_xlsx(event, output=None):
+    """
+    Write the workbook of all sheets to the binary file ``output`` (by default
+    an unnamed temporary file) and return it rewound for reading
+    """
+    output = output or tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#D9EAD3', 'border': 1})
+    metric_format = workbook.add_format({'bold': True})
+
+    for sheet, (title, columns, rows, empty_message) in SHEETS.items():
+        worksheet = workbook.add_worksheet(title)
+        rows = iter(rows(event))
+        first = next(rows, None)
+        if first is None:
+            worksheet.write(0, 0, empty_message)
+            continue
+
+        for col_num, column in enumerate(columns):
+            if sheet == 'summary':
+                width = 25
+            elif column in WIDE_COLUMNS:
+                width = 40
+            else:
+                width = max(len(column) + 2, 12)
+            worksheet.set_column(col_num, col_num, width)
+        worksheet.write_row(0, 0, columns, header_format)
+
+        # constant_memory only allows writing rows in order, each one whole before the next
+        for row_num, row in enumerate(itertools.chain([first], rows), start=1):
+            if sheet == 'summary':
+                worksheet.write(row_num, 0, row[0], metric_format)
+                worksheet.write(row_num, 1, row[1])
+            else:
+                worksheet.write_row(row_num, 0, row)
+
+    workbook.close()
+    output.seek(0)
+    return output
+
+
+class _Echo:
+    """File-like object whose write returns the line csv.writer produced"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(event, sheet):
+    """Lines of one sheet as CSV, header first"""
+    _, columns, rows, _ = SHEETS[sheet]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows(event):
+        yield writer.writerow(row)
@@ -0,0 +1,46 @@
+"""
+ZIP archives streamed as they are built.
+
+``zipfile`` can write to a stream that cannot seek: it then follows each
+member with a data descriptor instead of going back to patch its header. The
+archive is written into an in-memory buffer that is emptied after every
+member, so only one member is held in memory at a time and nothing touches the
+filesystem.
+"""
+import io
+import zipfile
+
+
+class _Output(io.RawIOBase):
+    """Write-only, unseekable buffer that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(members, compression=zipfile.ZIP_STORED):
+    """Yield the bytes of a ZIP archive of ``(name, bytes)`` members, one member at a time"""
+    output = _Output()
+    with zipfile.ZipFile(output, 'w', compression=compression) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+            yield output.drain()
+    # Central directory
+    yield output.drain()
@@ -0,0 +1,344 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from .models import Chat, EventChat, EventInfo, Feedback, SubTask, TaskInfo, User
+from .services import chatstream, chat_unread, event_report, feedback_rollup, feedback_sentiment, jobs, popularity, recommendation_cache, skill_coverage
+
+
+def _broadcast(group, payload):
+    """Forward a saved message to WebSocket clients, if a channel layer is configured"""
+    try:
+        from channels.layers import get_channel_layer
+    except ImportError:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, {'type': 'chat.message', 'message': payload})
+    except Exception as e:
+        print(f"Error broadcasting chat message to {group}: {str(e)}")
+
+
+def _deliver_event_message(instance):
+    from .serializers.eventchat import EventChatSerializer
+
+    chatstream.publish_event_message(instance)
+    _broadcast(f"event_chat_{instance.event_id}", dict(EventChatSerializer(instance).data))
+
+
+def _deliver_task_message(instance):
+    from .serializers.chat import TaskChatSerializer
+
+    chatstream.publish_task_message(instance)
+    _broadcast(f"task_chat_{instance.task_id}", dict(TaskChatSerializer(instance).data))
+
+
+@receiver(post_save, sender=EventChat)
+def publish_event_chat_message(sender, instance, created, **kwargs):
+    """Update unread counters and push new community chat messages to connected clients"""
+    if created:
+        # After commit, so the counter queries stay out of the sender's transaction
+        transaction.on_commit(lambda: chat_unread.record_new_message('event', instance.event_id, instance.user_id))
+        transaction.on_commit(lambda: _deliver_event_message(instance))
+
+
+@receiver(post_save, sender=Chat)
+def publish_task_chat_message(sender, instance, created, **kwargs):
+    """Update unread counters and push new task chat messages to connected clients"""
+    if created:
+        transaction.on_commit(lambda: chat_unread.record_new_message('task', instance.task_id, instance.user_id))
+        transaction.on_commit(lambda: _deliver_task_message(instance))
+
+
+@receiver(post_init, sender=User)
+def remember_original_skills(sender, instance, **kwargs):
+    # Deferred loads leave skills out of __dict__; those saves are never treated as changes
+    instance._original_skills = instance.__dict__.get('skills')
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_skills_change(sender, instance, created, **kwargs):
+    """Drop cached rankings of a user whose skills changed, and skill coverage that may count them"""
+    skills = instance.__dict__.get('skills')
+    if not created and skills != instance._original_skills:
+        recommendation_cache.discard_precomputed(instance.id)
+        recommendation_cache.invalidate_user(instance.id)
+    if skills != instance._original_skills or (created and skills):
+        original = instance._original_skills
+        transaction.on_commit(lambda: skill_coverage.invalidate_for_skill_change(original, skills))
+    instance._original_skills = skills
+
+
+@receiver(post_init, sender=EventInfo)
+def remember_original_status(sender, instance, **kwargs):
+    instance._original_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=EventInfo)
+def invalidate_recommendations_on_event_save(sender, instance, **kwargs):
+    """Drop cached rankings whose candidates include this event, before or after the change"""
+    recommendation_cache.invalidate_statuses({instance.status, instance._original_status})
+    instance._original_status = instance.status
+
+
+@receiver(post_delete, sender=EventInfo)
+def invalidate_recommendations_on_event_delete(sender, instance, **kwargs):
+    recommendation_cache.invalidate_statuses({instance.status})
+
+
+@receiver(post_save, sender=TaskInfo)
+@receiver(post_delete, sender=TaskInfo)
+def invalidate_recommendations_on_task_change(sender, instance, **kwargs):
+    """Tasks are part of the event text the recommenders rank on"""
+    status = EventInfo.objects.filter(id=instance.event_id).values_list('status', flat=True).first()
+    recommendation_cache.invalidate_statuses({status})
+
+
+@receiver(m2m_changed, sender=EventInfo.volunteer_enrolled.through)
+def invalidate_recommendations_on_enrollment(sender, instance, action, reverse, pk_set, **kwargs):
+    """Enrolled events are excluded from (or flagged in) a volunteer's recommendations"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = list(instance.volunteer_enrolled.values_list('id', flat=True))
+    else:
+        user_ids = pk_set or []
+    for user_id in user_ids:
+        recommendation_cache.invalidate_user(user_id)
+
+
+@receiver(m2m_changed, sender=TaskInfo.volunteers.through)
+def invalidate_recommendations_on_assignment(sender, instance, action, reverse, pk_set, **kwargs):
+    """Task assignments are part of the enrollment history collaborative filtering scores on"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = list(instance.volunteers.values_list('id', flat=True))
+    else:
+        user_ids = pk_set or []
+    for user_id in user_ids:
+        recommendation_cache.invalidate_user(user_id)
+
+
+@receiver(m2m_changed, sender=EventInfo.volunteer_enrolled.through)
+def count_enrollment_popularity(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        for event_id in pk_set:
+            popularity.record(event_id, 'enrollment')
+    else:
+        for _ in pk_set:
+            popularity.record(instance.pk, 'enrollment')
+
+
+@receiver(post_save, sender=EventChat)
+def count_event_chat_popularity(sender, instance, created, **kwargs):
+    # After the commit, so the message transaction (or write-buffer batch) is not held up
+    if created:
+        transaction.on_commit(lambda: popularity.record(instance.event_id, 'chat'))
+
+
+@receiver(post_save, sender=Chat)
+def count_task_chat_popularity(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if Chat.task.is_cached(instance):
+        event_id = instance.task.event_id
+        transaction.on_commit(lambda: popularity.record(event_id, 'chat'))
+    else:
+        def record():
+            event_id = TaskInfo.objects.filter(id=instance.task_id).values_list('event_id', flat=True).first()
+            if event_id is not None:
+                popularity.record(event_id, 'chat')
+        transaction.on_commit(record)
+
+
+def _embed_event(event_id):
+    if getattr(settings, 'SEMANTIC_SEARCH_EMBED_ON_SAVE', True):
+        transaction.on_commit(lambda: jobs.enqueue_once('embed_event', {'event_id': event_id},
+                                                        priority=jobs.PRIORITY_BACKGROUND))
+
+
+@receiver(post_save, sender=EventInfo)
+@receiver(post_delete, sender=EventInfo)
+def update_event_search_on_event_change(sender, instance, **kwargs):
+    """Searches are filtered by event status and host; saved events are embedded in the background"""
+    from .ml import embedding_store
+
+    transaction.on_commit(embedding_store.invalidate_allowed_ids)
+    if kwargs['signal'] is post_save:
+        _embed_event(instance.pk)
+
+
+@receiver(post_save, sender=TaskInfo)
+@receiver(post_delete, sender=TaskInfo)
+def embed_event_on_task_change(sender, instance, **kwargs):
+    """Tasks are part of the embedded event text"""
+    _embed_event(instance.event_id)
+
+
+@receiver(post_save, sender=EventInfo)
+def invalidate_skill_coverage_on_event_save(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: skill_coverage.invalidate_event(instance.pk))
+
+
+@receiver(post_save, sender=TaskInfo)
+@receiver(post_delete, sender=TaskInfo)
+def invalidate_skill_coverage_on_task_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: skill_coverage.invalidate_event(instance.event_id))
+
+
+@receiver(m2m_changed, sender=EventInfo.volunteer_enrolled.through)
+def invalidate_skill_coverage_on_enrollment(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        event_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # Cleared from the volunteer's side: post_clear has no pk_set, so read the events now
+        event_ids = list(instance.enrolled_events.values_list('id', flat=True))
+    else:
+        event_ids = pk_set or []
+    for event_id in event_ids:
+        transaction.on_commit(lambda event_id=event_id: skill_coverage.invalidate_event(event_id))
+
+
+@receiver(post_init, sender=Feedback)
+def remember_original_event(sender, instance, **kwargs):
+    instance._original_event_id = instance.__dict__.get('event_id') if instance.pk else None
+
+
+def _moved_from(feedback):
+    """The event a saved feedback was moved away from, or None"""
+    original = feedback._original_event_id
+    return original if original is not None and original != feedback.event_id else None
+
+
+@receiver(post_init, sender=Feedback)
+def remember_original_feedback_text(sender, instance, **kwargs):
+    instance._original_text = [instance.__dict__.get(field) for field in feedback_sentiment.TEXT_FIELDS]
+
+
+@receiver(post_save, sender=Feedback)
+def score_feedback_sentiment(sender, instance, created, **kwargs):
+    """Score new feedback, and feedback whose text was edited, in the background"""
+    previous_event_id = None if created else _moved_from(instance)
+    if previous_event_id is not None:
+        feedback_sentiment.move(instance.pk, previous_event_id, instance.event_id)
+    text = [instance.__dict__.get(field) for field in feedback_sentiment.TEXT_FIELDS]
+    if created or text != instance._original_text:
+        feedback_sentiment.schedule(instance.pk)
+    instance._original_text = text
+
+
+@receiver(pre_delete, sender=Feedback)
+def remove_feedback_sentiment(sender, instance, **kwargs):
+    feedback_sentiment.remove(instance.pk)
+
+
+@receiver(post_init, sender=Feedback)
+def remember_original_ratings(sender, instance, **kwargs):
+    # Only instances loaded from the database with every field count as known
+    fields = feedback_rollup.VALUE_FIELDS
+    if instance.pk and all(field in instance.__dict__ for field in fields):
+        instance._original_ratings = feedback_rollup.feedback_values(instance)
+    else:
+        instance._original_ratings = None
+
+
+@receiver(post_save, sender=Feedback)
+def update_feedback_rollup(sender, instance, created, **kwargs):
+    """Keep the event's rating statistics in step, in the transaction that saved the feedback"""
+    values = feedback_rollup.feedback_values(instance)
+    previous_event_id = None if created else _moved_from(instance)
+    if created:
+        feedback_rollup.apply(instance.event_id, None, values)
+    elif previous_event_id is not None:
+        # Moved to another event: out of the old event's rollup, into the new one's
+        if instance._original_ratings is None:
+            feedback_rollup.recount(previous_event_id)
+            feedback_rollup.recount(instance.event_id)
+        else:
+            feedback_rollup.apply(previous_event_id, instance._original_ratings, None)
+            feedback_rollup.apply(instance.event_id, None, values)
+    elif instance._original_ratings is None:
+        # Unknown starting point (deferred fields): recount the event
+        feedback_rollup.recount(instance.event_id)
+    elif values != instance._original_ratings:
+        feedback_rollup.apply(instance.event_id, instance._original_ratings, values)
+    instance._original_ratings = values
+
+
+@receiver(pre_delete, sender=Feedback)
+def remove_from_feedback_rollup(sender, instance, **kwargs):
+    values = feedback_rollup.stored_values(instance.pk)
+    if values is not None:
+        feedback_rollup.apply(instance.event_id, values, None)
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+@receiver(post_save, sender=TaskInfo)
+@receiver(post_delete, sender=TaskInfo)
+def invalidate_event_report(sender, instance, **kwargs):
+    """Mark the stored report out of date, in the transaction that made the change"""
+    event_report.invalidate(instance.event_id)
+
+
+@receiver(post_save, sender=Feedback)
+def invalidate_event_report_on_feedback_move(sender, instance, created, **kwargs):
+    """A feedback moved to another event also leaves the old event's report"""
+    previous_event_id = None if created else _moved_from(instance)
+    if previous_event_id is not None:
+        event_report.invalidate(previous_event_id)
+    instance._original_event_id = instance.event_id
+
+
+@receiver(post_save, sender=EventInfo)
+def invalidate_event_report_on_event_save(sender, instance, created, **kwargs):
+    if not created:
+        event_report.invalidate(instance.pk)
+
+
+@receiver(post_init, sender=User)
+def remember_original_name(sender, instance, **kwargs):
+    instance._original_name = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=User)
+def invalidate_event_reports_on_host_rename(sender, instance, created, **kwargs):
+    """Reports show their host's name"""
+    name = instance.__dict__.get('name')
+    if not created and name != instance._original_name:
+        event_report.invalidate_for_host(instance.pk)
+    instance._original_name = name
+
+
+@receiver(post_save, sender=SubTask)
+@receiver(post_delete, sender=SubTask)
+def invalidate_event_report_on_subtask_change(sender, instance, **kwargs):
+    event_report.invalidate_for_task(instance.parent_task_id)
+
+
+@receiver(m2m_changed, sender=EventInfo.volunteer_enrolled.through)
+def invalidate_event_report_on_enrollment(sender, instance, action, reverse, pk_set, **kwargs):
+    """The report shows the number of enrolled volunteers"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        event_ids = [instance.pk]
+    elif action == 'pre_clear':
+        event_ids = list(instance.enrolled_events.values_list('id', flat=True))
+    else:
+        event_ids = pk_set or []
+    for event_id in event_ids:
+        event_report.invalidate(event_id)
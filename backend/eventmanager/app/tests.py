@@ -1,3 +1,1237 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models.signals import post_save
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .consumers import event_group
+from .ml import batch_recommendations, collaborative, embedding_store, loader, volunteer_recommendation
+from .models import (
+    Chat, ChatReadMarker, EventChat, EventEmbedding, EventInfo, EventPopularity, EventReport, EventSentiment,
+    Feedback, FeedbackRollup, Job, Recommendation, SubTask, TaskInfo, User,
+)
+from .routing import websocket_urlpatterns
+from .serializers.eventchat import EventChatSerializer
+from .services import (
+    analytics_charts, cache_versions, chart_cache, chat_archive, chat_pagination, chat_search, chat_sync,
+    chat_unread, chatstream, event_report, feedback_rollup, feedback_sentiment, job_handlers, jobs, popularity,
+    recommendation_cache, skill_coverage,
+)
+from .services.chat_write_buffer import ChatWriter, writer
+
+
+class AppTestCase(TestCase):
+    """A host, two volunteers enrolled in one event with one task, and a second event"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.host = User.objects.create_user('host@example.com', 'pass', name='Host', contact='100', isHost=True)
+        cls.volunteer = User.objects.create_user('vol@example.com', 'pass', name='Vol', contact='101',
+                                                 skills='teaching, python')
+        cls.other_volunteer = User.objects.create_user('vol2@example.com', 'pass', name='Vol2', contact='102',
+                                                       skills='design')
+        cls.event = EventInfo.objects.create(
+            event_name='Tutoring', overview='Overview', description='Tutoring kids', host=cls.host,
+            start_time=now + timedelta(days=1), end_time=now + timedelta(days=2), required_volunteers=5,
+            status='Upcoming'
+        )
+        cls.other_event = EventInfo.objects.create(
+            event_name='Cleanup', overview='Overview', description='Beach cleanup', host=cls.host,
+            start_time=now + timedelta(days=3), end_time=now + timedelta(days=4), required_volunteers=5,
+            status='Upcoming'
+        )
+        cls.event.volunteer_enrolled.add(cls.volunteer, cls.other_volunteer)
+        cls.task = TaskInfo.objects.create(
+            event=cls.event, task_name='Teach', description='Teach maths', start_time=now,
+            end_time=now + timedelta(hours=2), required_skills='teaching'
+        )
+        cls.task.volunteers.add(cls.volunteer)
+
+    def feedback(self, event=None, user=None, **fields):
+        return Feedback.objects.create(event=event or self.event, user=user or self.volunteer, **fields)
+
+
+class FeedbackRollupTests(AppTestCase):
+    def rollup(self, event):
+        return FeedbackRollup.objects.get(event=event)
+
+    def test_insert_edit_and_delete(self):
+        feedback = self.feedback(overall_experience=8, would_volunteer_again=True)
+        self.feedback(user=self.other_volunteer, overall_experience=4, would_volunteer_again=False)
+
+        rollup = self.rollup(self.event)
+        self.assertEqual(rollup.feedback_count, 2)
+        self.assertEqual(rollup.would_volunteer_again_count, 1)
+        self.assertEqual(feedback_rollup.averages(rollup)['overall_experience'], 6)
+        # Null ratings are left out, as Avg does
+        self.assertEqual(rollup.metrics['volunteer_support']['count'], 0)
+
+        feedback.overall_experience = 10
+        feedback.save()
+        rollup = self.rollup(self.event)
+        self.assertEqual(feedback_rollup.averages(rollup)['overall_experience'], 7)
+        self.assertEqual(rollup.metrics['overall_experience']['histogram'][9], 1)
+        self.assertEqual(rollup.metrics['overall_experience']['histogram'][7], 0)
+        self.assertEqual(feedback_rollup.standard_deviations(rollup)['overall_experience'], 3)
+
+        feedback.delete()
+        rollup = self.rollup(self.event)
+        self.assertEqual(rollup.feedback_count, 1)
+        self.assertEqual(rollup.would_volunteer_again_count, 0)
+        self.assertEqual(feedback_rollup.averages(rollup)['overall_experience'], 4)
+
+    def test_edit_of_a_deferred_instance_recounts(self):
+        self.feedback(overall_experience=8)
+        feedback = Feedback.objects.only('id', 'event_id', 'overall_experience').get()
+        feedback.overall_experience = 2
+        feedback.save(update_fields=['overall_experience'])
+        self.assertEqual(feedback_rollup.averages(self.rollup(self.event))['overall_experience'], 2)
+
+    def test_move_to_another_event(self):
+        feedback = self.feedback(overall_experience=8)
+        self.feedback(event=self.other_event, user=self.other_volunteer, overall_experience=2)
+
+        feedback.event = self.other_event
+        feedback.save()
+        self.assertEqual(self.rollup(self.event).feedback_count, 0)
+        self.assertEqual(feedback_rollup.averages(self.rollup(self.event))['overall_experience'], 0)
+        self.assertEqual(self.rollup(self.other_event).feedback_count, 2)
+        self.assertEqual(feedback_rollup.averages(self.rollup(self.other_event))['overall_experience'], 5)
+
+    def test_combined_builds_missing_rollups(self):
+        self.feedback(overall_experience=8)
+        self.feedback(event=self.other_event, overall_experience=4)
+        FeedbackRollup.objects.filter(event=self.other_event).delete()
+
+        rollup = feedback_rollup.combined([self.event.id, self.other_event.id])
+        self.assertEqual(rollup.feedback_count, 2)
+        self.assertEqual(feedback_rollup.averages(rollup)['overall_experience'], 6)
+        self.assertTrue(FeedbackRollup.objects.filter(event=self.other_event).exists())
+
+        with self.assertNumQueries(1):
+            feedback_rollup.combined([self.event.id, self.other_event.id])
+
+
+@mock.patch.object(feedback_sentiment, 'schedule')
+class FeedbackRollupConcurrencyTests(TransactionTestCase):
+    def test_concurrent_submits_are_all_counted(self, schedule):
+        now = timezone.now()
+        host = User.objects.create_user('host@example.com', 'pass', name='Host', contact='100', isHost=True)
+        event = EventInfo.objects.create(
+            event_name='Tutoring', overview='Overview', description='Tutoring kids', host=host,
+            start_time=now, end_time=now + timedelta(days=1), required_volunteers=5, status='Completed'
+        )
+        volunteers = [User.objects.create_user(f'vol{i}@example.com', 'pass', name=f'Vol{i}', contact=str(200 + i))
+                      for i in range(8)]
+        feedback_rollup.for_event(event.id)
+        barrier = threading.Barrier(len(volunteers))
+        errors = []
+
+        def submit(volunteer):
+            try:
+                barrier.wait()
+                Feedback.objects.create(event=event, user=volunteer, overall_experience=7)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(volunteer,)) for volunteer in volunteers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        rollup = FeedbackRollup.objects.get(event=event)
+        self.assertEqual(rollup.feedback_count, len(volunteers))
+        self.assertEqual(rollup.metrics['overall_experience']['sum'], 7 * len(volunteers))
+
+
+def fake_sentiment(text):
+    return (0.5, 0.4) if 'good' in text else (-0.5, 0.6)
+
+
+@mock.patch.object(feedback_sentiment, 'analyze', side_effect=fake_sentiment)
+class FeedbackSentimentTests(AppTestCase):
+    def totals(self, event):
+        return EventSentiment.objects.filter(event=event).first()
+
+    def test_score_rescore_and_delete(self, analyze):
+        feedback = self.feedback(strengths='good organisation')
+        self.assertEqual(feedback_sentiment.score(feedback.id), (0.5, 0.4))
+        totals = self.totals(self.event)
+        self.assertEqual((totals.feedback_count, totals.polarity_sum, totals.positive), (1, 0.5, 1))
+
+        feedback.strengths = 'bad organisation'
+        feedback.save(update_fields=['strengths'])
+        feedback_sentiment.score(feedback.id)
+        totals = self.totals(self.event)
+        self.assertEqual((totals.feedback_count, totals.polarity_sum), (1, -0.5))
+        self.assertEqual((totals.positive, totals.negative), (0, 1))
+        self.assertEqual(feedback_sentiment.summary(self.event.id)['label'], 'Negative')
+
+        feedback.delete()
+        totals = self.totals(self.event)
+        self.assertEqual((totals.feedback_count, totals.polarity_sum, totals.negative), (0, 0, 0))
+
+    def test_feedback_without_text_is_not_counted(self, analyze):
+        feedback = self.feedback(strengths='   ')
+        self.assertIsNone(feedback_sentiment.score(feedback.id))
+        self.assertIsNone(self.totals(self.event))
+        self.assertEqual(feedback_sentiment.summary(self.event.id)['scored_feedback'], 0)
+
+    def test_summary_is_none_while_feedback_is_unscored(self, analyze):
+        feedback = self.feedback(strengths='good')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertIsNone(feedback_sentiment.summary(self.event.id))
+        self.assertEqual(len(callbacks), 1)
+
+        feedback_sentiment.score(feedback.id)
+        self.assertEqual(feedback_sentiment.summary(self.event.id)['scored_feedback'], 1)
+
+    def test_move_to_another_event(self, analyze):
+        feedback = self.feedback(strengths='good')
+        feedback_sentiment.score(feedback.id)
+
+        feedback.event = self.other_event
+        feedback.save(update_fields=['event'])
+        self.assertEqual(self.totals(self.event).feedback_count, 0)
+        totals = self.totals(self.other_event)
+        self.assertEqual((totals.feedback_count, totals.polarity_sum), (1, 0.5))
+
+    def test_command_scores_what_is_unscored(self, analyze):
+        self.feedback(strengths='good')
+        self.feedback(user=self.other_volunteer, strengths='bad')
+        self.feedback(event=self.other_event, strengths='')
+
+        def run(**options):
+            out = io.StringIO()
+            call_command('score_feedback_sentiment', stdout=out, **options)
+            return out.getvalue()
+
+        self.assertIn('Scored 0 feedback', run(event_id=self.other_event.id))
+        self.assertIn('Scored 2 feedback', run())
+        self.assertIn('Scored 0 feedback', run())
+        self.assertEqual(analyze.call_count, 2)
+        self.assertIn('Scored 2 feedback', run(all=True))
+        totals = self.totals(self.event)
+        self.assertEqual((totals.feedback_count, totals.positive, totals.negative), (2, 1, 1))
+
+
+class ChatStreamTests(AppTestCase):
+    def subscribe(self):
+        subscription = chatstream.broker.subscribe(chatstream.event_channel(self.event.id))
+        self.addCleanup(chatstream.broker.unsubscribe, subscription)
+        return subscription
+
+    def test_sse_frames(self):
+        self.assertEqual(chatstream.format_sse({'a': 1}, event_id=3, event='message'),
+                         'id: 3\nevent: message\ndata: {"a": 1}\n\n')
+        self.assertEqual(chatstream.format_sse('one\ntwo'), 'data: one\ndata: two\n\n')
+        self.assertEqual(chatstream.format_sse(comment='heartbeat'), ': heartbeat\n\n')
+
+    def test_committed_messages_reach_subscribers_once(self):
+        subscription = self.subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            message = EventChat.objects.create(event=self.event, user=self.volunteer, message='Hello')
+            self.assertIsNone(subscription.get(timeout=0))
+
+        message_id, payload = subscription.get(timeout=0)
+        self.assertEqual((message_id, payload['message']), (message.id, 'Hello'))
+        # The poller publishes rows from other workers again; they are dropped
+        self.assertEqual(chatstream.publish_event_message(message), 0)
+        self.assertIsNone(subscription.get(timeout=0))
+
+    @override_settings(CHAT_STREAM_MAX_SECONDS=0)
+    def test_stream_replays_messages_after_last_event_id(self):
+        messages = [EventChat.objects.create(event=self.event, user=self.volunteer, message=f"message {i}")
+                    for i in range(3)]
+        request = RequestFactory().get('/', headers={'Last-Event-ID': str(messages[0].id)})
+        request.user = self.volunteer
+        fetch = chatstream.backlog_fetcher(EventChat.objects.filter(event=self.event), EventChatSerializer)
+
+        frames = list(chatstream.open_stream(request, self.subscribe(), fetch))
+        self.assertIn('connected', frames[0])
+        self.assertEqual([frame.split('\n')[0] for frame in frames[1:]],
+                         [f'id: {message.id}' for message in messages[1:]])
+        self.assertIn('"is_current_user": true', frames[1])
+        self.assertTrue(chatstream.accepts_stream(request))
+
+
+class ChatSocketTests(AppTestCase):
+    def communicator(self, user, event=None):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns),
+                                             f'/ws/events/{(event or self.event).id}/chat/')
+        communicator.scope['user'] = user
+        return communicator
+
+    async def test_only_participants_connect(self):
+        connected, code = await self.communicator(AnonymousUser()).connect()
+        self.assertEqual((connected, code), (False, 4401))
+        connected, code = await self.communicator(self.volunteer, self.other_event).connect()
+        self.assertEqual((connected, code), (False, 4403))
+
+    async def test_send_and_receive(self):
+        communicator = self.communicator(self.volunteer)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({'message': '  '})
+        self.assertEqual((await communicator.receive_json_from())['status'], 'error')
+
+        with mock.patch.object(writer, 'asave', mock.AsyncMock(return_value=EventChat(id=41))) as asave:
+            await communicator.send_json_to({'message': 'Hello', 'client_id': 'c1'})
+            self.assertEqual(await communicator.receive_json_from(),
+                             {'status': 'success', 'type': 'ack', 'id': 41, 'client_id': 'c1'})
+        self.assertEqual(asave.call_args.args[0].message, 'Hello')
+
+        # Saved messages reach the sockets through the group broadcast
+        await get_channel_layer().group_send(event_group(self.event.id), {
+            'type': 'chat.message', 'message': {'id': 41, 'user': self.volunteer.id, 'message': 'Hello'}
+        })
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'message')
+        self.assertTrue(response['message']['is_current_user'])
+        await communicator.disconnect()
+
+
+class ChatPaginationTests(AppTestCase):
+    def setUp(self):
+        self.messages = [EventChat.objects.create(event=self.event, user=self.volunteer, message=f"message {i}")
+                         for i in range(5)]
+        # Ties on timestamp are broken by id
+        EventChat.objects.update(timestamp=timezone.now())
+        self.ids = [message.id for message in self.messages]
+
+    def page(self, **cursor):
+        rows, has_more = chat_pagination.paginate_messages(EventChat.objects.filter(event=self.event), 2, **cursor)
+        return [row.id for row in rows], has_more
+
+    def test_pages_backwards_and_forwards(self):
+        self.assertEqual(self.page(), ([self.ids[4], self.ids[3]], True))
+        self.assertEqual(self.page(before_id=self.ids[3]), ([self.ids[2], self.ids[1]], True))
+        self.assertEqual(self.page(before_id=self.ids[1]), ([self.ids[0]], False))
+        self.assertEqual(self.page(after_id=self.ids[1]), ([self.ids[3], self.ids[2]], True))
+        self.assertEqual(self.page(after_id=self.ids[3]), ([self.ids[4]], False))
+
+    def test_cursors_and_params(self):
+        rows, _ = chat_pagination.paginate_messages(EventChat.objects.all(), 2)
+        self.assertEqual(chat_pagination.page_cursors(rows), {'oldest_id': self.ids[3], 'newest_id': self.ids[4]})
+        self.assertEqual(chat_pagination.page_cursors([]), {'oldest_id': None, 'newest_id': None})
+
+        page = chat_pagination.parse_page_params({'limit': '1000', 'before_id': '7'}, default_limit=50)
+        self.assertEqual((page['limit'], page['before_id'], page['after_id']), (500, 7, None))
+        with self.assertRaises(chat_pagination.PaginationError):
+            chat_pagination.parse_page_params({'before_id': '1', 'after_id': '2'}, default_limit=50)
+        with self.assertRaises(chat_pagination.PaginationError):
+            chat_pagination.parse_page_params({'limit': 'ten'}, default_limit=50)
+
+    def test_history_view_follows_the_cursors(self):
+        self.client.force_login(self.volunteer)
+        url = reverse('event_chat_history')
+        first = self.client.get(url, {'event_id': self.event.id, 'limit': 3}).json()
+        self.assertEqual([m['id'] for m in first['messages']], self.ids[:1:-1])
+        self.assertTrue(first['has_more'])
+        self.assertNotIn('total_count', first)
+
+        rest = self.client.get(url, {'event_id': self.event.id, 'limit': 3, 'before_id': first['oldest_id']}).json()
+        self.assertEqual([m['id'] for m in rest['messages']], [self.ids[1], self.ids[0]])
+        self.assertFalse(rest['has_more'])
+
+        response = self.client.get(url, {'event_id': self.event.id, 'before_id': 1, 'after_id': 2})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChatArchiveTests(AppTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(CHAT_ARCHIVE_DIR=directory.name))
+
+        messages = [EventChat.objects.create(event=self.event, user=self.volunteer, message=f"message {i}")
+                    for i in range(8)]
+        records = EventChatSerializer(messages[:6], many=True).data
+        EventChat.objects.filter(id__in=[message.id for message in messages[:6]]).delete()
+        index = chat_archive.load_index(self.event.id)
+        for segment in (records[:3], records[3:]):
+            index['segments'].append(chat_archive.write_segment(self.event.id, 'event', self.event.id, segment))
+        chat_archive.save_index(self.event.id, index)
+        self.records = records
+
+    def history(self, **params):
+        self.client.force_login(self.volunteer)
+        response = self.client.get(reverse('event_chat_history'),
+                                   {'event_id': self.event.id, 'include_total': 'true', **params})
+        return response.json()
+
+    def test_command_archives_completed_events(self):
+        ids = [EventChat.objects.create(event=self.other_event, user=self.host, message=f"note {i}").id
+               for i in range(5)]
+        call_command('archive_chats', event_id=self.other_event.id, stdout=io.StringIO())
+        self.assertEqual(EventChat.objects.filter(event=self.other_event).count(), 5)
+
+        EventInfo.objects.filter(id=self.other_event.id).update(
+            status='Completed', end_time=timezone.now() - timedelta(days=100)
+        )
+        call_command('archive_chats', event_id=self.other_event.id, segment_size=2, stdout=io.StringIO())
+        self.assertFalse(EventChat.objects.filter(event=self.other_event).exists())
+        self.assertEqual([segment['count'] for segment in chat_archive.load_index(self.other_event.id)['segments']],
+                         [2, 2, 1])
+
+        self.client.force_login(self.host)
+        seen, params = [], {'event_id': self.other_event.id, 'limit': 2}
+        while True:
+            page = self.client.get(reverse('event_chat_history'), params).json()
+            seen += [message['id'] for message in page['messages']]
+            if not page['has_more']:
+                break
+            params['before_id'] = page['oldest_id']
+        self.assertEqual(seen, ids[::-1])
+
+        out = io.StringIO()
+        call_command('archive_chats', event_id=self.other_event.id, stdout=out)
+        self.assertIn('Archived 0 messages', out.getvalue())
+
+    def test_total_count_is_independent_of_the_cursor(self):
+        self.assertEqual(self.history()['total_count'], 8)
+        # The page only reads the newer segment
+        self.assertEqual(self.history(after_id=self.records[4]['id'], limit=2)['total_count'], 8)
+        self.assertEqual(self.history(before_id=self.records[1]['id'], search='message 4')['total_count'], 1)
+
+
+class ChatSyncTests(AppTestCase):
+    def test_latest_messages_since_cursor(self):
+        first = [EventChat.objects.create(event=self.event, user=self.volunteer, message=f"a{i}") for i in range(3)]
+        other = EventChat.objects.create(event=self.other_event, user=self.host, message='b')
+
+        latest = chat_sync.latest_messages_by_conversation(
+            EventChat, 'event_id', [self.event.id, self.other_event.id], limit=2
+        )
+        self.assertEqual([m.id for m in latest[self.event.id]], [first[2].id, first[1].id])
+        self.assertEqual([m.id for m in latest[self.other_event.id]], [other.id])
+
+        latest = chat_sync.latest_messages_by_conversation(
+            EventChat, 'event_id', [self.event.id, self.other_event.id], limit=20, since_id=first[1].id
+        )
+        self.assertEqual([m.id for m in latest[self.event.id]], [first[2].id])
+        self.assertEqual([m.id for m in latest[self.other_event.id]], [other.id])
+
+        counts = chat_sync.new_message_counts(EventChat, 'event_id', [self.event.id], 0, self.host)
+        self.assertEqual(counts, {self.event.id: 3})
+
+    def test_view_returns_what_is_new_since_the_cursor(self):
+        EventChat.objects.create(event=self.event, user=self.volunteer, message='first')
+        self.client.force_login(self.volunteer)
+        url = reverse('chat_sync')
+
+        first = self.client.get(url).json()
+        conversations = {(c['type'], c['id']): c for c in first['conversations']}
+        self.assertEqual(set(conversations), {('event', self.event.id), ('task', self.task.id)})
+        self.assertIsNone(conversations[('event', self.event.id)]['new_count'])
+        self.assertEqual(conversations[('event', self.event.id)]['last_message']['text'], 'first')
+
+        reply = EventChat.objects.create(event=self.event, user=self.host, message='reply')
+        sync = self.client.get(url, {'cursor': first['cursor']}).json()
+        event = next(c for c in sync['conversations'] if c['type'] == 'event')
+        self.assertEqual(event['new_count'], 1)
+        self.assertEqual([m['id'] for m in event['new_messages']], [reply.id])
+        self.assertFalse(event['has_more_new'])
+        self.assertEqual(chat_sync.parse_sync_cursor(sync['cursor'])[0], reply.id)
+
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 400)
+
+    def test_cursor_and_limit_parsing(self):
+        self.assertEqual(chat_sync.parse_sync_cursor('12:7'), (12, 7))
+        self.assertEqual(chat_sync.parse_sync_cursor(''), (None, None))
+        self.assertEqual(chat_sync.format_sync_cursor(None, 7), '0:7')
+        with self.assertRaises(ValueError):
+            chat_sync.parse_sync_cursor('12')
+        self.assertEqual(chat_sync.parse_sync_limit(None), 20)
+        self.assertEqual(chat_sync.parse_sync_limit('500'), 100)
+        with self.assertRaises(ValueError):
+            chat_sync.parse_sync_limit('0')
+
+
+class ChatUnreadTests(AppTestCase):
+    def post(self, user, text='hello'):
+        # The counters are updated once the message's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return EventChat.objects.create(event=self.event, user=user, message=text)
+
+    def unread(self, user):
+        return chat_unread.unread_counts(user)[('event', self.event.id)]['unread_count']
+
+    def test_counts_on_write(self):
+        chat_unread.mark_read(self.volunteer, 'event', self.event.id)
+        self.post(self.host)
+        self.post(self.host)
+        self.post(self.volunteer)
+
+        marker = ChatReadMarker.objects.get(user=self.volunteer, conversation_type='event')
+        self.assertEqual(marker.unread_count, 2)
+        self.assertEqual(self.unread(self.volunteer), 2)
+        # Without a marker everything from others is unread
+        self.assertEqual(self.unread(self.other_volunteer), 3)
+
+        _, unread = chat_unread.mark_read(self.volunteer, 'event', self.event.id)
+        self.assertEqual(unread, 0)
+        self.assertEqual(self.unread(self.volunteer), 0)
+
+    def test_markers_never_move_backwards(self):
+        first = self.post(self.host)
+        self.post(self.host)
+        chat_unread.mark_read(self.volunteer, 'event', self.event.id)
+        marker, unread = chat_unread.mark_read(self.volunteer, 'event', self.event.id, last_read_id=first.id)
+        self.assertEqual(unread, 0)
+        self.assertGreater(marker.last_read_id, first.id)
+
+    @override_settings(CHAT_UNREAD_FANOUT_LIMIT=1)
+    def test_large_conversations_count_on_read(self):
+        chat_unread.mark_read(self.volunteer, 'event', self.event.id)
+        self.post(self.host)
+        self.post(self.host)
+
+        marker = ChatReadMarker.objects.get(user=self.volunteer, conversation_type='event')
+        self.assertIsNone(marker.unread_count)
+        self.assertEqual(self.unread(self.volunteer), 2)
+
+    def test_views(self):
+        message = self.post(self.host)
+        self.post(self.host)
+        self.client.force_login(self.volunteer)
+
+        response = self.client.post(reverse('chat_mark_read'), {
+            'conversation_type': 'event', 'conversation_id': self.event.id, 'last_read_id': message.id
+        }, content_type='application/json')
+        self.assertEqual(response.json()['unread_count'], 1)
+        counts = self.client.get(reverse('chat_unread_counts')).json()
+        self.assertEqual(counts['total_unread'], 1)
+
+        for data, status in (({'conversation_type': 'group', 'conversation_id': 1}, 400),
+                             ({'conversation_type': 'task', 'conversation_id': 'x'}, 400),
+                             ({'conversation_type': 'event', 'conversation_id': self.other_event.id}, 403),
+                             ({'conversation_type': 'task', 'conversation_id': 10 ** 6}, 404)):
+            response = self.client.post(reverse('chat_mark_read'), data, content_type='application/json')
+            self.assertEqual(response.status_code, status)
+
+    def test_membership(self):
+        self.assertTrue(chat_unread.is_conversation_member(self.volunteer, 'task', self.task.id))
+        self.assertFalse(chat_unread.is_conversation_member(self.other_volunteer, 'task', self.task.id))
+        self.assertTrue(chat_unread.is_conversation_member(self.host, 'task', self.task.id))
+        self.assertFalse(chat_unread.is_conversation_member(self.volunteer, 'event', self.other_event.id))
+
+
+class ChatSearchTests(AppTestCase):
+    def search(self, text, cursor=None, limit=10, event=None):
+        queryset = EventChat.objects.filter(event=event or self.event)
+        return chat_search.search_messages(queryset, text, limit, cursor)
+
+    def test_triggers_keep_the_index_in_step(self):
+        message = EventChat.objects.create(event=self.event, user=self.volunteer, message='Bring water bottles')
+        EventChat.objects.create(event=self.event, user=self.volunteer, message='Meet at the gate')
+        EventChat.objects.create(event=self.other_event, user=self.volunteer, message='Water for everyone')
+
+        hits, next_cursor = self.search('wat')
+        self.assertEqual([hit[0].id for hit in hits], [message.id])
+        self.assertEqual(hits[0][2], 'Bring <mark>water</mark> bottles')
+        self.assertIsNone(next_cursor)
+
+        message.message = 'Bring juice <b>bottles</b>'
+        message.save()
+        self.assertEqual(self.search('water')[0], [])
+        hits, _ = self.search('juice')
+        self.assertEqual(hits[0][2], 'Bring <mark>juice</mark> &lt;b&gt;bottles&lt;/b&gt;')
+
+        message.delete()
+        self.assertEqual(self.search('juice')[0], [])
+        self.assertEqual(self.search('!!!')[0], [])
+
+    def test_pages_by_rank(self):
+        for i in range(5):
+            EventChat.objects.create(event=self.event, user=self.volunteer, message=f"volunteer shift {i}")
+
+        seen = []
+        cursor = None
+        while True:
+            hits, next_cursor = self.search('shift', cursor=chat_search.parse_search_cursor(cursor), limit=2)
+            seen += [hit[0].id for hit in hits]
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+        self.assertEqual(sorted(seen), sorted(EventChat.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+        with self.assertRaises(chat_search.SearchCursorError):
+            chat_search.parse_search_cursor('nonsense')
+
+    def test_view_searches_only_the_users_conversations(self):
+        Chat.objects.create(task=self.task, user=self.host, text='Bring the lesson plans')
+        EventChat.objects.create(event=self.other_event, user=self.host, message='Bring the lesson plans')
+        url = reverse('chat_search')
+
+        self.client.force_login(self.volunteer)
+        response = self.client.get(url, {'q': 'lesson', 'type': 'task'})
+        self.assertEqual([r['text'] for r in response.json()['results']], ['Bring the lesson plans'])
+        self.assertEqual(self.client.get(url, {'q': 'lesson'}).json()['results'], [])
+        self.assertEqual(self.client.get(url, {'q': 'lesson', 'event_id': self.other_event.id}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'q': ' '}).status_code, 400)
+
+        self.client.force_login(self.other_volunteer)
+        self.assertEqual(self.client.get(url, {'q': 'lesson', 'task_id': self.task.id}).status_code, 403)
+
+    def test_view_clamps_the_limit(self):
+        for i in range(3):
+            EventChat.objects.create(event=self.event, user=self.volunteer, message=f"volunteer shift {i}")
+        self.client.force_login(self.volunteer)
+        url = reverse('chat_search')
+
+        for limit, returned in (('0', 1), ('-1', 1), ('500', 3)):
+            response = self.client.get(url, {'q': 'shift', 'event_id': self.event.id, 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), returned)
+
+        response = self.client.get(url, {'q': 'shift', 'event_id': self.event.id, 'limit': 'ten'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.search('shift', limit=0)[0]), 1)
+
+
+class ChatWriterTests(TransactionTestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.host = User.objects.create_user('host@example.com', 'pass', name='Host', contact='100', isHost=True)
+        self.event = EventInfo.objects.create(
+            event_name='Tutoring', overview='Overview', description='Tutoring kids', host=self.host,
+            start_time=now, end_time=now + timedelta(days=1), required_volunteers=5, status='Ongoing'
+        )
+        self.saved = []
+
+        def record(sender, instance, created, **kwargs):
+            self.saved.append(instance.id)
+
+        post_save.connect(record, sender=EventChat, weak=False, dispatch_uid='chat-writer-test')
+        self.addCleanup(post_save.disconnect, sender=EventChat, dispatch_uid='chat-writer-test')
+
+    def test_batches_and_isolates_failures(self):
+        chat_writer = ChatWriter(batch_size=10, batch_ms=200)
+        futures = [chat_writer.submit(EventChat(event=self.event, user=self.host, message=f"m{i}")) for i in range(3)]
+        messages = [future.result(timeout=10) for future in futures]
+
+        ids = [message.id for message in messages]
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(message.is_host for message in messages))
+        self.assertEqual(self.saved, ids)
+        metrics = chat_writer.metrics()
+        self.assertEqual((metrics['flush_count'], metrics['flushed_total']), (1, 3))
+
+        good = chat_writer.submit(EventChat(event=self.event, user=self.host, message='good'))
+        bad = chat_writer.submit(EventChat(event_id=10 ** 6, user=self.host, message='bad'))
+        self.assertEqual(good.result(timeout=10).message, 'good')
+        with self.assertRaises(IntegrityError):
+            bad.result(timeout=10)
+        self.assertTrue(chat_writer.flush())
+        metrics = chat_writer.metrics()
+        self.assertEqual((metrics['failed_flushes'], metrics['failed_total']), (1, 1))
+        self.assertEqual(EventChat.objects.count(), 4)
+
+
+class RecommendationViewTests(AppTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fallbacks_do_not_need_ml(self):
+        newcomer = User.objects.create_user('new@example.com', 'pass', name='New', contact='103')
+        with mock.patch.object(loader, 'recommender', side_effect=ImportError('no ML')):
+            self.client.force_login(newcomer)
+            response = self.client.get(reverse('recommend_events'))
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.json()['personalized'])
+
+            self.client.force_login(self.volunteer)
+            response = self.client.get(reverse('events_sorted_by_relevance'), {'status': 'all'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ML modules not available', response.json()['message'])
+            self.assertEqual(response.json()['count'], 2)
+
+    def test_extracted_skills_are_cached_per_event_content(self):
+        def events():
+            return recommendation_cache.build_events_data(EventInfo.objects.filter(id=self.event.id), self.volunteer)
+
+        with mock.patch.object(loader, 'recommender') as recommender:
+            recommender.return_value.extract_event_skills.return_value = ['teaching']
+            self.assertEqual(recommendation_cache.add_extracted_skills(events())[0]['extracted_skills'], ['teaching'])
+            self.assertEqual(recommendation_cache.add_extracted_skills(events())[0]['extracted_skills'], ['teaching'])
+            self.assertEqual(recommender.return_value.extract_event_skills.call_count, 1)
+
+            TaskInfo.objects.filter(id=self.task.id).update(required_skills='teaching, patience')
+            recommendation_cache.add_extracted_skills(events())
+            self.assertEqual(recommender.return_value.extract_event_skills.call_count, 2)
+
+
+class MLLoaderTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.object(loader, '_module', None))
+        self.enterContext(mock.patch.dict(loader._state, {
+            'state': loader.NOT_LOADED, 'error': None, 'model_error': None, 'timings': {},
+            'warm_up_started_at': None, 'ready_at': None,
+        }))
+
+    def status_code(self):
+        return self.client.get(reverse('ml_status')).status_code
+
+    @override_settings(ML_WARM_UP=True)
+    def test_failed_import_is_reported_and_remembered(self):
+        self.assertEqual(self.status_code(), 503)
+        with mock.patch('importlib.import_module', side_effect=ModuleNotFoundError('langchain')) as import_module:
+            self.assertFalse(loader.available())
+            self.assertFalse(loader.available())
+            self.assertEqual(import_module.call_count, 1)
+        self.assertEqual(loader.status()['state'], loader.FAILED)
+        self.assertIn('langchain', loader.status()['error'])
+        # Nothing left to wait for: the fallbacks serve
+        self.assertEqual(self.status_code(), 200)
+
+    def test_warm_up(self):
+        module = mock.Mock(_MODEL_INSTANCE=None, _SKILL_EMBEDDINGS_CACHE=None)
+        module.get_embedding_model.side_effect = OSError('download failed')
+        with mock.patch('importlib.import_module', return_value=module):
+            self.assertFalse(loader.warm_up())
+            self.assertEqual(loader.status()['state'], loader.IMPORTED)
+            self.assertIn('download failed', loader.status()['model_error'])
+            # The module stays usable and loads the model on first use
+            self.assertIs(loader.recommender(), module)
+
+            module.get_embedding_model.side_effect = None
+            self.assertTrue(loader.warm_up())
+        status = loader.status()
+        self.assertTrue(status['ready'])
+        self.assertIsNone(status['model_error'])
+        self.assertIn('model_load_seconds', status['timings'])
+
+    def test_only_hosts_start_a_warm_up(self):
+        self.assertEqual(self.client.post(reverse('ml_status')).status_code, 403)
+
+
+def fake_rank(user, events_data):
+    return [dict(event, relevance_score=1.0 / (i + 1)) for i, event in enumerate(events_data)]
+
+
+@mock.patch.object(recommendation_cache, '_schedule')
+@mock.patch.object(recommendation_cache, '_rank', side_effect=fake_rank)
+class RankingCacheTests(AppTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def rank(self):
+        events, total = recommendation_cache.ranked_events('sorted_events', self.volunteer, 5, status='upcoming')
+        return [event['id'] for event in events], total
+
+    def test_rankings_are_invalidated_only_by_relevant_changes(self, rank, schedule):
+        self.assertEqual(self.rank(), ([self.event.id, self.other_event.id], 2))
+        self.assertEqual(self.rank(), ([self.event.id, self.other_event.id], 2))
+        self.assertEqual(rank.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EventInfo.objects.create(
+                event_name='Done', overview='Overview', description='Finished', host=self.host,
+                start_time=timezone.now(), end_time=timezone.now(), required_volunteers=1, status='Completed'
+            )
+            self.other_volunteer.skills = 'design, python'
+            self.other_volunteer.save()
+        self.rank()
+        self.assertEqual(rank.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.volunteer.skills = 'python'
+            self.volunteer.save()
+        self.rank()
+        self.assertEqual(rank.call_count, 2)
+        # Rankings requested recently are recomputed in the background
+        self.assertIn(('sorted_events', self.volunteer.id, (('status', 'upcoming'),)), schedule.call_args.args[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskInfo.objects.filter(id=self.task.id).get().save()
+        self.rank()
+        self.assertEqual(rank.call_count, 3)
+
+    def test_events_that_left_the_candidates_are_skipped(self, rank, schedule):
+        self.rank()
+        EventInfo.objects.filter(id=self.event.id).update(status='Ongoing')
+        self.assertEqual(self.rank(), ([self.other_event.id], 2))
+        self.assertEqual(rank.call_count, 1)
+
+
+@mock.patch.object(recommendation_cache, '_rank', side_effect=fake_rank)
+class PrecomputedRecommendationTests(AppTestCase):
+    def setUp(self):
+        cache.clear()
+        self.computed_at = timezone.now() + timedelta(hours=1)
+        Recommendation.objects.bulk_create([
+            Recommendation(user=self.other_volunteer, item_type='event', event=event, score=score, rank=rank,
+                           model_version=recommendation_cache.model_version(), computed_at=self.computed_at)
+            for rank, (event, score) in enumerate([(self.other_event, 0.9), (self.event, 0.4)], 1)
+        ])
+
+    def rank(self, limit=2):
+        events, total = recommendation_cache.ranked_events('recommend_events', self.other_volunteer, limit,
+                                                           status='Upcoming', include_enrolled=True)
+        return [(event['id'], event['relevance_score']) for event in events], total
+
+    def test_served_from_the_nightly_run(self, rank):
+        self.assertEqual(self.rank(), ([(self.other_event.id, 0.9), (self.event.id, 0.4)], 2))
+        rank.assert_not_called()
+
+    def test_events_edited_since_the_run_are_ranked_live(self, rank):
+        TaskInfo.objects.filter(id=self.task.id).update(updated_at=self.computed_at + timedelta(minutes=1))
+        self.assertEqual(self.rank(), ([(self.event.id, 1.0), (self.other_event.id, 0.9)], 2))
+        self.assertEqual([event['id'] for event in rank.call_args.args[1]], [self.event.id])
+
+    def test_too_few_rows_fall_back_to_online_ranking(self, rank):
+        Recommendation.objects.filter(event=self.event).delete()
+        self.rank()
+        self.assertEqual(rank.call_count, 1)
+        self.assertIsNone(recommendation_cache.precomputed_task_ids(self.volunteer, TaskInfo.objects.all(), 5))
+
+    def test_top_n(self, rank):
+        scores = np.array([[0.1, 0.9, -np.inf, 0.5], [0.3, 0.2, 0.8, 0.0]])
+        columns, best = batch_recommendations.top_n(scores, 2)
+        self.assertEqual(columns.tolist(), [[1, 3], [2, 0]])
+        self.assertEqual(best.tolist(), [[0.9, 0.5], [0.8, 0.3]])
+        self.assertEqual(batch_recommendations.top_n(scores, 0)[0].shape, (2, 0))
+
+
+class CollaborativeFilteringTests(AppTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(CF_MODEL_PATH=f'{directory.name}/collaborative.npz'))
+        self.other_event.volunteer_enrolled.add(self.other_volunteer)
+
+    def train(self, **options):
+        out = io.StringIO()
+        call_command('train_cf', stdout=out, **options)
+        return out.getvalue()
+
+    def test_train_and_score(self):
+        self.assertEqual(collaborative.scores_for_user(self.volunteer.id, [self.event.id]), {})
+        self.assertIn('Trained 1 factors on 3 interactions', self.train())
+
+        scores = collaborative.scores_for_user(self.volunteer.id, [self.event.id, self.other_event.id])
+        self.assertAlmostEqual(scores[self.event.id], 1.0)
+        # Liked by the volunteer who shares their enrollment
+        self.assertGreater(scores[self.other_event.id], 0)
+        self.assertEqual(collaborative.scores_for_user(self.host.id, [self.event.id]), {})
+        self.assertAlmostEqual(collaborative.blend(1.0, 0.0, weight=0.3), 0.7)
+
+    def test_new_events_are_folded_in(self):
+        self.train()
+        stamp = collaborative.model_stamp()
+        event = EventInfo.objects.create(
+            event_name='Painting', overview='Overview', description='Mural', host=self.host,
+            start_time=timezone.now(), end_time=timezone.now() + timedelta(days=1), required_volunteers=5,
+            status='Upcoming'
+        )
+        event.volunteer_enrolled.add(self.other_volunteer)
+
+        self.assertIn('folded in 1 new events', self.train(retrain_threshold=1.0))
+        self.assertNotEqual(collaborative.model_stamp(), stamp)
+        self.assertGreater(collaborative.scores_for_user(self.volunteer.id, [event.id])[event.id], 0)
+        self.assertIn('Trained', self.train(full=True))
+
+
+def fake_skill_vectors(texts):
+    return np.array([[1.0, 0.0] if 'teaching' in text else [0.0, 1.0] for text in texts], dtype=np.float32)
+
+
+@mock.patch.object(volunteer_recommendation, 'task_query', return_value=(np.array([1.0, 0.0]), ['management']))
+class VolunteerRecommendationTests(AppTestCase):
+    def get(self, **params):
+        return self.client.get(reverse('recommend_volunteers_for_task'), {'task_id': self.task.id, **params})
+
+    def test_rank_volunteers(self, task_query):
+        vectors = np.array([[0.0, 1.0], [1.0, 0.0], [0.8, 0.6]], dtype=np.float32)
+        rows, scores = volunteer_recommendation.rank_volunteers(np.array([1.0, 0.0]), vectors, 1, 0.5)
+        self.assertEqual(rows.tolist(), [1, 2])
+        rows, _ = volunteer_recommendation.rank_volunteers(np.array([1.0, 0.0]), vectors, 2, 0.5)
+        self.assertEqual(rows.tolist(), [1, 2, 0])
+
+    def test_view_ranks_by_stored_skill_vectors(self, task_query):
+        self.client.force_login(self.host)
+        with mock.patch.object(embedding_store, 'embed_documents', side_effect=fake_skill_vectors) as embed:
+            response = self.get(include_assigned='true').json()
+            self.assertEqual([v['id'] for v in response['volunteers']], [self.volunteer.id, self.other_volunteer.id])
+            self.assertEqual(response['volunteers'][0]['score'], 100.0)
+            self.assertEqual(response['volunteers'][0]['matching_skills'], ['teaching'])
+            self.assertFalse(response['volunteers'][1]['above_threshold'])
+
+            # Assigned volunteers are left out, and stored vectors reused
+            response = self.get().json()
+            self.assertEqual([v['id'] for v in response['volunteers']], [self.other_volunteer.id])
+            self.assertEqual(embed.call_count, 1)
+
+        self.assertEqual(self.get(scope='everyone').status_code, 400)
+        self.client.force_login(self.volunteer)
+        self.assertEqual(self.get().status_code, 403)
+
+
+class SkillCoverageTests(AppTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_greedy_cover(self):
+        matrix = np.array([[1, 0, 0], [1, 1, 0], [0, 0, 1]], dtype=bool)
+        picked, remaining = skill_coverage.greedy_cover(matrix, [1, 1, 1])
+        self.assertEqual([row for row, _ in picked], [1, 2])
+        self.assertEqual(remaining.tolist(), [0, 0, 0])
+        picked, remaining = skill_coverage.greedy_cover(matrix[:1], [0, 2, 0])
+        self.assertEqual((picked, remaining.tolist()), ([], [0, 2, 0]))
+
+    @mock.patch.object(loader, 'recommender')
+    def test_analysis_view(self, recommender):
+        TaskInfo.objects.create(event=self.event, task_name='First aid', description='Stand by',
+                                start_time=timezone.now(), end_time=timezone.now(),
+                                required_skills='Teaching, first aid')
+        medic = User.objects.create_user('medic@example.com', 'pass', name='Medic', contact='104',
+                                         skills='first aid, teaching')
+        url = reverse('analyze_event_skills')
+
+        self.client.force_login(self.host)
+        with mock.patch.object(skill_coverage, 'analyze', wraps=skill_coverage.analyze) as analyze:
+            response = self.client.get(url, {'event_id': self.event.id}).json()
+            self.client.get(url, {'event_id': self.event.id})
+            self.assertEqual(analyze.call_count, 1)
+        self.assertEqual(response['skills'], ['teaching', 'first aid'])
+        self.assertEqual(response['volunteer_skill_counts'], {'teaching': 1, 'first aid': 0})
+        self.assertEqual(response['coverage_percentage'], 33.3)
+        self.assertEqual(response['suggested_volunteers'],
+                         [{'id': medic.id, 'name': 'Medic', 'covers': ['teaching', 'first aid']}])
+        self.assertEqual(response['uncovered_skills'], {})
+        recommender.return_value.extract_event_skills.assert_not_called()
+
+        self.client.force_login(self.volunteer)
+        self.assertNotIn('suggested_volunteers', self.client.get(url, {'event_id': self.event.id}).json())
+
+    def test_skill_change_reaches_events_analysed_from_extracted_skills(self):
+        # other_event has no tasks, so its analysis counts skills extracted from its text
+        cache.set(skill_coverage.cache_key(self.other_event.id), {'skills': ['swimming']})
+        cache.set(skill_coverage.cache_key(self.event.id), {'skills': ['teaching']})
+
+        skill_coverage.invalidate_for_skill_change('design', 'design, cooking')
+        self.assertIsNotNone(cache.get(skill_coverage.cache_key(self.other_event.id)))
+        self.assertIsNotNone(cache.get(skill_coverage.cache_key(self.event.id)))
+
+        skill_coverage.invalidate_for_skill_change('design', 'design, swimming')
+        self.assertIsNone(cache.get(skill_coverage.cache_key(self.other_event.id)))
+        self.assertIsNotNone(cache.get(skill_coverage.cache_key(self.event.id)))
+
+        skill_coverage.invalidate_for_skill_change('teaching', '')
+        self.assertIsNone(cache.get(skill_coverage.cache_key(self.event.id)))
+
+    def test_clearing_a_volunteers_enrollments(self):
+        key = skill_coverage.cache_key(self.event.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.volunteer.enrolled_events.clear()
+        self.assertNotEqual(skill_coverage.cache_key(self.event.id), key)
+
+
+class PopularityTests(AppTestCase):
+    def score(self):
+        return popularity.current_score(EventPopularity.objects.get(event=self.event).log_score)
+
+    def test_chat_messages_count_once_committed(self):
+        before = self.score()
+        with self.captureOnCommitCallbacks(execute=True):
+            Chat.objects.create(task_id=self.task.id, user=self.volunteer, text='On my way')
+            Chat.objects.create(task=self.task, user=self.volunteer, text='Here')
+            EventChat.objects.create(event=self.event, user=self.volunteer, message='Hello')
+            self.assertAlmostEqual(self.score(), before, places=2)
+        self.assertAlmostEqual(self.score() - before, 3, places=2)
+
+    def test_scores_decay(self):
+        now = timezone.now()
+        half_life = timedelta(hours=48)
+        popularity.record(self.other_event.id, 'chat', at=now - half_life)
+        score = EventPopularity.objects.get(event=self.other_event).log_score
+        self.assertAlmostEqual(popularity.current_score(score, now), 0.5)
+        popularity.record(self.other_event.id, 'enrollment', at=now)
+        score = EventPopularity.objects.get(event=self.other_event).log_score
+        self.assertAlmostEqual(popularity.current_score(score, now), 5.5)
+        self.assertAlmostEqual(popularity.current_score(score, now + half_life), 2.75)
+
+    def test_repeated_views_by_a_user_count_once(self):
+        cache.clear()
+        before = self.score()
+        url = reverse('get_event_details')
+        self.client.get(url, {'event_id': self.event.id})
+        self.client.get(url, {'event_id': self.event.id})
+        self.assertAlmostEqual(self.score() - before, 1.0, places=2)
+
+        self.client.force_login(self.volunteer)
+        self.client.get(url, {'event_id': self.event.id})
+        self.client.get(url, {'event_id': self.event.id})
+        self.assertAlmostEqual(self.score() - before, 1.5, places=2)
+
+    def test_trending_view(self):
+        for _ in range(3):
+            popularity.record(self.other_event.id, 'enrollment')
+        response = self.client.get(reverse('trending_events')).json()
+        self.assertEqual([event['id'] for event in response['events']], [self.other_event.id, self.event.id])
+        self.assertEqual(self.client.get(reverse('trending_events'), {'status': 'Completed'}).json()['count'], 0)
+        self.assertEqual(self.client.get(reverse('trending_events'), {'limit': 'x'}).status_code, 400)
+
+
+@mock.patch.object(embedding_store, 'embed_query', return_value=np.ones(4, dtype=np.float32))
+class SemanticSearchTests(AppTestCase):
+    def test_events_without_embedding_are_found_by_keyword(self, embed_query):
+        EventEmbedding.objects.create(event=self.other_event, model_name=embedding_store.model_name(),
+                                      dimensions=4, vector=np.ones(4, dtype=np.float32).tobytes(), text_hash='x')
+        embedding_store.get_index().refresh(force=True)
+
+        results = {result[0]: result for result in
+                   embedding_store.search_events('tutoring', EventInfo.objects.all(), alpha=0.7)}
+        self.assertEqual(set(results), {self.event.id, self.other_event.id})
+        self.assertIsNone(results[self.event.id][2])
+        self.assertAlmostEqual(results[self.event.id][1], 0.3)
+        # Embedded events are ranked by their vector only
+        self.assertIsNone(results[self.other_event.id][3])
+
+    def test_embeds_changed_events_and_ranks_hybrid(self, embed_query):
+        def embed_documents(texts):
+            return np.eye(4, dtype=np.float32)[:len(texts)]
+
+        with mock.patch.object(embedding_store, 'embed_documents', side_effect=embed_documents) as embed:
+            self.assertEqual(embedding_store.embed_events(EventInfo.objects.all()), 2)
+            self.assertEqual(embedding_store.embed_events(EventInfo.objects.all()), 0)
+            TaskInfo.objects.filter(id=self.task.id).update(description='Teach reading')
+            self.assertEqual(embedding_store.embed_events(EventInfo.objects.all()), 1)
+            self.assertEqual(embed.call_count, 2)
+        self.assertEqual(EventEmbedding.objects.get(event=self.event).dimensions, 4)
+
+        embedding_store.get_index().refresh(force=True)
+        results = embedding_store.search_events('tutoring', EventInfo.objects.all(), mode='hybrid', alpha=0.5)
+        self.assertEqual([result[0] for result in results], [self.event.id, self.other_event.id])
+        self.assertEqual(results[0][3], 1.0)
+        self.assertEqual(results[1][3], 0.0)
+        keyword = embedding_store.search_events('beach', EventInfo.objects.all(), mode='keyword')
+        self.assertEqual([result[0] for result in keyword], [self.other_event.id])
+
+
+class JobQueueTests(AppTestCase):
+    def test_claim_order(self):
+        low = jobs.enqueue('event_report', {'event_id': self.event.id}, priority=jobs.PRIORITY_BACKGROUND)
+        high = jobs.enqueue('event_report', {'event_id': self.event.id}, priority=jobs.PRIORITY_INTERACTIVE)
+        self.assertEqual(jobs.claim('w1').id, high.id)
+        self.assertEqual(jobs.claim('w1').id, low.id)
+        self.assertIsNone(jobs.claim('w1'))
+
+    def test_lost_claim_moves_on_to_the_next_job(self):
+        first = jobs.enqueue('event_report', {'event_id': self.event.id})
+        second = jobs.enqueue('event_report', {'event_id': self.event.id})
+        raced = []
+
+        def other_worker_claims_first(execute, sql, params, many, context):
+            # Another worker claims the job between our read and our compare-and-set
+            if not raced and sql.startswith('UPDATE'):
+                raced.append(True)
+                Job.objects.filter(id=first.id).update(status='Running', claimed_by='w2')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(other_worker_claims_first):
+            job = jobs.claim('w1')
+        self.assertEqual(job.id, second.id)
+        self.assertEqual(Job.objects.get(id=first.id).claimed_by, 'w2')
+
+    def test_retries_with_backoff_then_fails(self):
+        handler = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(job_handlers.HANDLERS, {'flaky': handler}):
+            job = jobs.enqueue('flaky', max_attempts=2)
+            self.assertFalse(jobs.run(jobs.claim('w1'), 'w1'))
+
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.error), ('Pending', 1, 'boom'))
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertIsNone(jobs.claim('w1'))
+
+            Job.objects.filter(id=job.id).update(run_after=timezone.now())
+            self.assertFalse(jobs.run(jobs.claim('w1'), 'w1'))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('Failed', 2))
+            self.assertEqual(handler.call_count, 2)
+
+    def test_stale_jobs_are_requeued_and_late_results_ignored(self):
+        with mock.patch.dict(job_handlers.HANDLERS, {'noop': mock.Mock(return_value=None)}):
+            job = jobs.enqueue('noop')
+            stale = jobs.claim('w1')
+            Job.objects.filter(id=job.id).update(claimed_at=timezone.now() - timedelta(seconds=jobs.timeout() - 5))
+            self.assertEqual(jobs.requeue_stale(), 0)
+            Job.objects.filter(id=job.id).update(claimed_at=timezone.now() - timedelta(seconds=jobs.timeout() + 1))
+            self.assertEqual(jobs.requeue_stale(), 1)
+
+            current = jobs.claim('w2')
+            self.assertEqual(current.attempts, 2)
+            # The first worker finishing late does not overwrite the current attempt
+            jobs.run(stale, 'w1')
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.claimed_by), ('Running', 'w2'))
+
+            jobs.run(current, 'w2')
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'Completed')
+
+    @override_settings(JOB_TIMEOUT_SECONDS=60, JOB_KIND_TIMEOUT_SECONDS={'ml_recompute': 600})
+    def test_long_running_kinds_have_their_own_timeout(self):
+        recompute = jobs.enqueue('ml_recompute', {'command': 'train_cf'})
+        report = jobs.enqueue('event_report', {'event_id': self.event.id})
+        jobs.claim('w1')
+        jobs.claim('w1')
+        Job.objects.update(claimed_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(id=recompute.id).status, 'Running')
+        self.assertEqual(Job.objects.get(id=report.id).status, 'Pending')
+
+        Job.objects.filter(id=recompute.id).update(claimed_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(jobs.requeue_stale(), 1)
+
+    def test_enqueue_once(self):
+        first = jobs.enqueue_once('embed_event', {'event_id': self.event.id})
+        self.assertEqual(jobs.enqueue_once('embed_event', {'event_id': self.event.id}).id, first.id)
+        self.assertNotEqual(jobs.enqueue_once('embed_event', {'event_id': self.other_event.id}).id, first.id)
+        with self.assertRaises(ValueError):
+            jobs.enqueue('no_such_kind')
+
+
+@mock.patch.object(feedback_sentiment, 'analyze', side_effect=fake_sentiment)
+class EventReportTests(AppTestCase):
+    def is_current(self, event=None):
+        return EventReport.objects.get(event=event or self.event).is_current
+
+    def test_stored_report_is_reused_until_invalidated(self, analyze):
+        report = event_report.get(self.event)
+        self.assertTrue(self.is_current())
+        with self.assertNumQueries(1):
+            self.assertEqual(event_report.get(self.event), report)
+
+        TaskInfo.objects.filter(id=self.task.id).first().save()
+        self.assertFalse(self.is_current())
+        event_report.get(self.event)
+        self.assertTrue(self.is_current())
+
+    def test_invalidating_changes(self, analyze):
+        now = timezone.now()
+        changes = [
+            lambda: self.feedback(strengths='good'),
+            lambda: SubTask.objects.create(parent_task=self.task, title='Prepare', start_time=now, end_time=now),
+            lambda: self.event.volunteer_enrolled.remove(self.other_volunteer),
+            lambda: EventInfo.objects.get(id=self.event.id).save(),
+        ]
+        for change in changes:
+            event_report.get(self.event)
+            change()
+            self.assertFalse(self.is_current())
+
+    def test_host_rename_invalidates_their_reports(self, analyze):
+        event_report.get(self.event)
+        host = User.objects.get(id=self.host.id)
+        host.location = 'Pune'
+        host.save()
+        self.assertTrue(self.is_current())
+
+        host.name = 'New Host'
+        host.save()
+        self.assertFalse(self.is_current())
+        self.assertIn('New Host', event_report.get(EventInfo.objects.get(id=self.event.id)))
+
+    def test_moved_feedback_invalidates_both_events(self, analyze):
+        feedback = self.feedback(overall_experience=8)
+        event_report.get(self.event)
+        event_report.get(self.other_event)
+
+        feedback.event = self.other_event
+        feedback.save()
+        self.assertFalse(self.is_current(self.event))
+        self.assertFalse(self.is_current(self.other_event))
+
+
+class ChartDataViewTests(AppTestCase):
+    def get(self, headers=None, **params):
+        self.client.force_login(self.host)
+        return self.client.get(reverse('event_chart_data'), {'event_id': self.event.id, **params}, headers=headers)
+
+    def test_unknown_chart_type(self):
+        self.assertEqual(self.get(chart_type='pie').status_code, 400)
+        self.assertEqual(self.get(chart_type='distributions').status_code, 200)
+
+    def test_etag_covers_a_rollup_built_by_the_request(self):
+        self.feedback(overall_experience=8)
+        FeedbackRollup.objects.all().delete()
+
+        response = self.get(chart_type='ratings')
+        self.assertEqual(response.json()['feedback_count'], 1)
+        self.assertEqual(self.get(chart_type='ratings', headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_host_version_covers_the_host_name(self):
+        version = chart_cache.host_version(self.host)
+        self.host.name = 'New Host'
+        self.assertNotEqual(chart_cache.host_version(self.host), version)
+
+    def test_svg_views_reject_unknown_chart_types(self):
+        self.feedback(overall_experience=8)
+        self.client.force_login(self.host)
+        with mock.patch.object(chart_cache, 'put') as put:
+            params = {'event_id': self.event.id, 'chart_type': 'pie'}
+            self.assertEqual(self.client.get(reverse('event_feedback_charts'), params).status_code, 400)
+            self.assertEqual(self.client.get(reverse('host_analytics'), params).status_code, 400)
+        put.assert_not_called()
+
+
+class ExportChartsViewTests(AppTestCase):
+    def export(self, pngs):
+        self.client.force_login(self.host)
+        with mock.patch.object(analytics_charts, 'export_pngs', return_value=pngs):
+            return self.client.get(reverse('export_charts_png'), {'event_id': self.event.id})
+
+    def test_zip_of_rendered_charts(self):
+        response = self.export(iter([('a.png', b'first'), ('b.png', b'second')]))
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['a.png', 'b.png'])
+        self.assertEqual(archive.read('b.png'), b'second')
+
+    def test_render_error_before_streaming(self):
+        def pngs():
+            raise RuntimeError('cannot draw')
+            yield
+
+        response = self.export(pngs())
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['message'], 'cannot draw')
+
+
+
+class CacheGenerationTests(TestCase):
+    def test_generations_survive_the_cache(self):
+        self.assertEqual(cache_versions.get_generation('a'), 1)
+        cache_versions.bump_generation('a')
+        cache.clear()
+        self.assertEqual(cache_versions.get_generations(['a', 'b']), [2, 1])
+
+    def test_bump_before_first_read(self):
+        cache_versions.bump_generation('c')
+        self.assertEqual(cache_versions.get_generation('c'), 2)
+        cache_versions.bump_generation('c')
+        self.assertEqual(cache_versions.get_generation('c'), 3)
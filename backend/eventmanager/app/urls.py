@@ -10,6 +10,7 @@ from .views import user_views
 from .views import user_data
 from .views import event_data
 from .views import feedback_report
+from .views import job_views
 # router = DefaultRouter()
 # router.register(r'events', event_views.EventViewSet, basename='events')
 
@@ -18,6 +19,7 @@ urlpatterns = [
     path('events/upcoming/', event_views.AllUpcomingEventsView.as_view(), name='all_upcoming_events'),
     path('events/ongoing/', event_views.AllOngoingEventsView.as_view(), name='all_ongoing_events'),
     path('events/details/', event_views.EventDetailsView.as_view(), name='get_event_details'),
+    path('events/trending/', event_views.TrendingEventsView.as_view(), name='trending_events'),
     
     # User-specific event endpoints (require authentication)
     path('user/events/enrolled/', event_views.UserEnrolledEventsView.as_view(), name='user_enrolled_events'),
@@ -69,12 +71,19 @@ urlpatterns = [
     # chat endpoints 
     path('events/chat/', chats_views.EventChatView.as_view(), name='event_chat'),
     path('events/chat/history/', chats_views.EventChatHistoryView.as_view(), name='event_chat_history'),
+    path('events/chat/stream/', chats_views.EventChatStreamView.as_view(), name='event_chat_stream'),
     path('user/chats/recent/', chats_views.RecentEventChatsView.as_view(), name='recent_event_chats'),
+    path('chats/sync/', chats_views.ChatSyncView.as_view(), name='chat_sync'),
+    path('chats/unread/', chats_views.ChatUnreadCountsView.as_view(), name='chat_unread_counts'),
+    path('chats/mark-read/', chats_views.ChatMarkReadView.as_view(), name='chat_mark_read'),
+    path('chats/search/', chats_views.ChatSearchView.as_view(), name='chat_search'),
+    path('chats/write-buffer/metrics/', chats_views.ChatWriteBufferMetricsView.as_view(), name='chat_write_buffer_metrics'),
 	path('events/search/', event_views.SearchEventsView.as_view(), name='search_events'),
 
     # Task Chat Endpoints
     path('tasks/chat/', taskchat_views.TaskChatView.as_view(), name='task_chat'),
     path('tasks/chat/history/', taskchat_views.TaskChatHistoryView.as_view(), name='task_chat_history'),
+    path('tasks/chat/stream/', taskchat_views.TaskChatStreamView.as_view(), name='task_chat_stream'),
     path('user/tasks/chats/recent/', taskchat_views.RecentTaskChatsView.as_view(), name='recent_task_chats'),
 
 	#ml based views
@@ -82,9 +91,14 @@ urlpatterns = [
     path('recommendations/tasks/', ml_views.GetRecommendedTasksForUserView.as_view(), name='recommend_tasks'),
     path('events/analyze-skills/', ml_views.AnalyzeEventSkillsView.as_view(), name='analyze_event_skills'),
 	path('events/sorted-by-relevance/', ml_views.GetSortedEventsByRelevanceView.as_view(), name='events_sorted_by_relevance'),
+	path('events/semantic-search/', ml_views.SemanticEventSearchView.as_view(), name='semantic_event_search'),
+	path('tasks/recommend-volunteers/', ml_views.RecommendVolunteersForTaskView.as_view(), name='recommend_volunteers_for_task'),
+	path('ml/status/', ml_views.MLStatusView.as_view(), name='ml_status'),
+	path('ml/recompute/', ml_views.MLRecomputeView.as_view(), name='ml_recompute'),
 
 	path('events/charts/', event_data.EventFeedbackChartsView.as_view(), name='event_feedback_charts'),
 	path('events/chart/', event_data.SingleChartView.as_view(), name='single_chart'),
+	path('events/chart-data/', event_data.EventChartDataView.as_view(), name='event_chart_data'),
 	path('events/export-charts/', event_data.ExportChartsPNGView.as_view(), name='export_charts_png'),
 	path('host/analytics/', event_data.HostAnalyticsView.as_view(), name='host_analytics'),	
 
@@ -99,4 +113,8 @@ urlpatterns = [
 	path('events/report/', feedback_report.GenerateEventReportView.as_view(), name='generate_event_report'),
 	path('events/feedback/analytics/', feedback_report.EventFeedbackAnalyticsView.as_view(), name='event_feedback_analytics'),
 
+	# Background jobs (async=true on exports and reports)
+	path('jobs/status/', job_views.JobStatusView.as_view(), name='job_status'),
+	path('jobs/download/', job_views.JobDownloadView.as_view(), name='job_download'),
+
 ]
\ No newline at end of file
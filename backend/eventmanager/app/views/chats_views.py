@@ -1,10 +1,20 @@
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from ..models import EventInfo, EventChat, User
+from ..models import EventInfo, EventChat, Chat, TaskInfo, User
 from ..serializers.eventchat import EventChatSerializer
+from ..serializers.chat import TaskChatSerializer
+from ..services import chatstream
+from ..services import chat_archive, chat_search, chat_write_buffer
+from ..services.chat_pagination import PaginationError, parse_page_params, paginate_messages, page_cursors
+from ..services.chat_sync import (
+    latest_messages_by_conversation, new_message_counts,
+    user_event_conversations, user_task_conversations,
+    parse_sync_cursor, parse_sync_limit, format_sync_cursor
+)
+from ..services import chat_unread
 import json
 import traceback
 from django.utils import timezone
@@ -45,18 +55,25 @@ class EventChatView(View):
             # Check access rights - users must be event participants (volunteers or hosts)
             if not (request.user.isHost or 
                    request.user == event.host or 
-                   request.user in event.volunteer_enrolled.all()):
+                   event.volunteer_enrolled.filter(id=request.user.id).exists()):
                 return JsonResponse({
                     'status': 'error',
                     'message': 'You must be enrolled or hosting this event to access the chat'
                 }, status=403)
             
-            # Get limit and offset for pagination
-            limit = int(request.GET.get('limit', 50))
-            offset = int(request.GET.get('offset', 0))
+            # Get pagination parameters (before_id/after_id cursors, offset for older clients)
+            try:
+                page = parse_page_params(request.GET, default_limit=50)
+            except PaginationError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
             
             # Get chat messages for this event
-            messages = event.chat_messages.all().order_by('-timestamp')[offset:offset+limit]
+            messages, has_more = paginate_messages(
+                event.chat_messages.select_related('user'), **page
+            )
             
             # Serialize the messages with request context for is_current_user flag
             serializer = EventChatSerializer(messages, many=True, context={'request': request})
@@ -66,7 +83,8 @@ class EventChatView(View):
                 'event_id': event_id,
                 'event_name': event.event_name,
                 'count': len(serializer.data),
-                'has_more': event.chat_messages.count() > (offset + limit),
+                'has_more': has_more,
+                **page_cursors(messages),
                 'messages': serializer.data
             })
             
@@ -118,7 +136,7 @@ class EventChatView(View):
             # Check access rights - users must be event participants (volunteers or hosts)
             if not (request.user.isHost or 
                    request.user == event.host or 
-                   request.user in event.volunteer_enrolled.all()):
+                   event.volunteer_enrolled.filter(id=request.user.id).exists()):
                 return JsonResponse({
                     'status': 'error',
                     'message': 'You must be enrolled or hosting this event to send messages'
@@ -130,7 +148,7 @@ class EventChatView(View):
                 user=request.user,
                 message=message_text
             )
-            chat_message.save()
+            chat_write_buffer.save_message(chat_message)
             
             # Serialize the message with request context for is_current_user flag
             serializer = EventChatSerializer(chat_message, context={'request': request})
@@ -185,7 +203,7 @@ class EventChatHistoryView(View):
             # Check access rights
             if not (request.user.isHost or 
                    request.user == event.host or 
-                   request.user in event.volunteer_enrolled.all()):
+                   event.volunteer_enrolled.filter(id=request.user.id).exists()):
                 return JsonResponse({
                     'status': 'error',
                     'message': 'You must be enrolled or hosting this event to access the chat'
@@ -215,30 +233,55 @@ class EventChatHistoryView(View):
                 messages = messages.filter(is_host=True)
                 
             if search_text:
-                messages = messages.filter(message__icontains=search_text)
+                # Served by the full-text index instead of scanning every message
+                messages = chat_search.filter_matching(messages, search_text)
             
-            # Order by timestamp (newest first)
-            messages = messages.order_by('-timestamp')
+            # Get pagination parameters (before_id/after_id cursors, offset for older clients)
+            try:
+                page = parse_page_params(request.GET, default_limit=100)
+            except PaginationError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
             
-            # Get limit and offset for pagination
-            limit = int(request.GET.get('limit', 100))
-            offset = int(request.GET.get('offset', 0))
+            # Messages of long-finished events live in the chat archive
+            archived = chat_archive.filter_records(
+                chat_archive.archived_records(
+                    'event', event.id, event.id, before_id=page['before_id'], after_id=page['after_id'],
+                    from_date=from_date, to_date=to_date
+                ), 'message',
+                from_date=from_date, to_date=to_date, user_id=user_id,
+                host_only=host_only, search_text=search_text
+            )
             
-            # Apply pagination
-            paginated_messages = messages[offset:offset+limit]
+            # Apply pagination (newest first), continuing into archived messages
+            paginated_messages, archived_page, has_more = chat_archive.paginate_with_archive(
+                messages.select_related('user'), archived, **page
+            )
             
             # Serialize the messages with request context for is_current_user flag
             serializer = EventChatSerializer(paginated_messages, many=True, context={'request': request})
+            message_data = list(serializer.data) + chat_archive.for_viewer(archived_page, request.user)
             
-            return JsonResponse({
+            response_data = {
                 'status': 'success',
                 'event_id': event_id,
                 'event_name': event.event_name,
-                'total_count': messages.count(),
-                'returned_count': len(serializer.data),
-                'has_more': messages.count() > (offset + limit),
-                'messages': serializer.data
-            })
+                'returned_count': len(message_data),
+                'has_more': has_more,
+                **page_cursors(message_data),
+                'messages': message_data
+            }
+            
+            # Counting every matching message is linear in the chat size, so only on request
+            if request.GET.get('include_total') == 'true':
+                response_data['total_count'] = messages.count() + chat_archive.archived_count(
+                    'event', event.id, event.id, 'message', from_date=from_date, to_date=to_date, user_id=user_id,
+                    host_only=host_only, search_text=search_text
+                )
+            
+            return JsonResponse(response_data)
             
         except Exception as e:
             print(f"Error in EventChatHistoryView: {str(e)}")
@@ -249,6 +292,80 @@ class EventChatHistoryView(View):
             }, status=500)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class EventChatStreamView(View):
+    """
+    Server-Sent Events stream of new messages in an event's community chat.
+    Clients reconnecting with Last-Event-ID receive the messages they missed.
+    """
+    def get(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+                
+            # Get event_id from query parameters
+            event_id = request.GET.get('event_id')
+            
+            if not event_id:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Event ID is required'
+                }, status=400)
+            
+            # Get the event
+            try:
+                event = EventInfo.objects.get(id=event_id)
+            except EventInfo.DoesNotExist:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Event not found'
+                }, status=404)
+            
+            # Check access rights - users must be event participants (volunteers or hosts)
+            if not (request.user.isHost or 
+                   request.user == event.host or 
+                   event.volunteer_enrolled.filter(id=request.user.id).exists()):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'You must be enrolled or hosting this event to access the chat'
+                }, status=403)
+            
+            # Under WSGI every open stream holds a server thread, so they are capped
+            if not chatstream.accepts_stream(request):
+                response = JsonResponse({
+                    'status': 'error',
+                    'message': 'Too many open chat streams, retry shortly'
+                }, status=503)
+                response['Retry-After'] = '5'
+                return response
+            
+            # Subscribe before reading the backlog so no message falls in between
+            subscription = chatstream.broker.subscribe(chatstream.event_channel(event.id))
+            chatstream.ensure_poller()
+            
+            # Messages missed while disconnected (Last-Event-ID) are replayed first, page by page
+            response = StreamingHttpResponse(
+                chatstream.open_stream(request, subscription,
+                                       chatstream.backlog_fetcher(event.chat_messages, EventChatSerializer)),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+            
+        except Exception as e:
+            print(f"Error in EventChatStreamView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class RecentEventChatsView(View):
     """
@@ -264,38 +381,24 @@ class RecentEventChatsView(View):
                 }, status=401)
             
             # Get user's events
-            if request.user.isHost:
-                # For hosts, get events they are hosting
-                user_events = EventInfo.objects.filter(host=request.user)
-            else:
-                # For volunteers, get events they are enrolled in
-                user_events = request.user.enrolled_events.all()
-            
-            # Get event ids
-            event_ids = list(user_events.values_list('id', flat=True))
+            user_events = user_event_conversations(request.user)
             
             # Get limit for number of messages per event
             limit = int(request.GET.get('limit', 5))
             
-            # Get recent messages for these events
-            recent_chats_by_event = {}
+            # Get recent messages for all these events in one windowed query
+            messages_by_event = latest_messages_by_conversation(EventChat, 'event_id', list(user_events), limit)
             
-            for event_id in event_ids:
-                try:
-                    event = EventInfo.objects.get(id=event_id)
-                    messages = event.chat_messages.all().order_by('-timestamp')[:limit]
-                    
-                    if messages.exists():
-                        # Include request context for is_current_user flag
-                        serializer = EventChatSerializer(messages, many=True, context={'request': request})
-                        recent_chats_by_event[event_id] = {
-                            'event_id': event_id,
-                            'event_name': event.event_name,
-                            'message_count': messages.count(),
-                            'messages': serializer.data
-                        }
-                except EventInfo.DoesNotExist:
-                    continue
+            recent_chats_by_event = {}
+            for event_id, messages in messages_by_event.items():
+                # Include request context for is_current_user flag
+                serializer = EventChatSerializer(messages, many=True, context={'request': request})
+                recent_chats_by_event[event_id] = {
+                    'event_id': event_id,
+                    'event_name': user_events[event_id],
+                    'message_count': len(messages),
+                    'messages': serializer.data
+                }
             
             return JsonResponse({
                 'status': 'success',
@@ -309,4 +412,398 @@ class RecentEventChatsView(View):
             return JsonResponse({
                 'status': 'error',
                 'message': str(e)
-            }, status=500)
\ No newline at end of file
+            }, status=500)
+
+
+def _message_preview(serialized, text_field, length=100):
+    """Short form of a message for conversation lists"""
+    text = serialized[text_field]
+    return {
+        'id': serialized['id'],
+        'user': serialized['user'],
+        'user_name': serialized['user_name'],
+        'text': text if len(text) <= length else text[:length] + '...',
+        'is_host': serialized['is_host'],
+        'is_current_user': serialized['is_current_user'],
+        'timestamp': serialized['timestamp'],
+    }
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatSyncView(View):
+    """
+    Sync every event and task chat the user belongs to in one request.
+    Returns the messages posted since the client's sync cursor, how many of them
+    were written by others, and a preview of each conversation's last message.
+    """
+    def get(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+            
+            # The cursor returned by the previous sync (absent on the first sync),
+            # and the maximum number of messages returned per conversation
+            try:
+                since_event_id, since_task_id = parse_sync_cursor(request.GET.get('cursor'))
+                limit = parse_sync_limit(request.GET.get('limit'))
+            except ValueError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
+            
+            # Conversations the user takes part in
+            user_events = user_event_conversations(request.user)
+            user_tasks = user_task_conversations(request.user)
+            
+            # Messages since the cursor (the latest ones on the first sync), one
+            # windowed query per chat table
+            event_messages = latest_messages_by_conversation(EventChat, 'event_id', list(user_events), limit, since_event_id)
+            task_messages = latest_messages_by_conversation(Chat, 'task_id', list(user_tasks), limit, since_task_id)
+            
+            # Last message of every conversation for the previews; on the first
+            # sync it is the first of the messages read above
+            if since_event_id is None:
+                event_latest, task_latest = event_messages, task_messages
+            else:
+                event_latest = latest_messages_by_conversation(EventChat, 'event_id', list(user_events), 1)
+                task_latest = latest_messages_by_conversation(Chat, 'task_id', list(user_tasks), 1)
+            
+            # Read markers and unread counters for every conversation in one query
+            read_state = chat_unread.unread_counts(request.user)
+            
+            # Messages from others since the cursor, one grouped query per chat table
+            event_new_counts = {}
+            task_new_counts = {}
+            if since_event_id is not None:
+                event_new_counts = new_message_counts(EventChat, 'event_id', list(user_events), since_event_id, request.user)
+                task_new_counts = new_message_counts(Chat, 'task_id', list(user_tasks), since_task_id, request.user)
+            
+            conversations = []
+            latest_event_chat_id = since_event_id or 0
+            latest_task_chat_id = since_task_id or 0
+            
+            for event_id, event_name in user_events.items():
+                new_messages = EventChatSerializer(event_messages.get(event_id, []), many=True, context={'request': request}).data
+                latest = event_latest.get(event_id, [])
+                if latest:
+                    latest_event_chat_id = max(latest_event_chat_id, latest[0].id)
+                new_count = event_new_counts.get(event_id, 0) if since_event_id is not None else None
+                conversations.append({
+                    'type': 'event',
+                    'id': event_id,
+                    'event_id': event_id,
+                    'event_name': event_name,
+                    'new_count': new_count,
+                    'has_more_new': new_count is not None and new_count > len(new_messages),
+                    'unread_count': read_state.get(('event', event_id), {}).get('unread_count', 0),
+                    'last_read_id': read_state.get(('event', event_id), {}).get('last_read_id', 0),
+                    'last_message': _message_preview(EventChatSerializer(latest[0], context={'request': request}).data, 'message') if latest else None,
+                    'new_messages': new_messages
+                })
+            
+            for task_id, (task_name, event_id, event_name) in user_tasks.items():
+                new_messages = TaskChatSerializer(task_messages.get(task_id, []), many=True, context={'request': request}).data
+                latest = task_latest.get(task_id, [])
+                if latest:
+                    latest_task_chat_id = max(latest_task_chat_id, latest[0].id)
+                new_count = task_new_counts.get(task_id, 0) if since_task_id is not None else None
+                conversations.append({
+                    'type': 'task',
+                    'id': task_id,
+                    'task_name': task_name,
+                    'event_id': event_id,
+                    'event_name': event_name,
+                    'new_count': new_count,
+                    'has_more_new': new_count is not None and new_count > len(new_messages),
+                    'unread_count': read_state.get(('task', task_id), {}).get('unread_count', 0),
+                    'last_read_id': read_state.get(('task', task_id), {}).get('last_read_id', 0),
+                    'last_message': _message_preview(TaskChatSerializer(latest[0], context={'request': request}).data, 'text') if latest else None,
+                    'new_messages': new_messages
+                })
+            
+            # Most recently active conversations first
+            conversations.sort(
+                key=lambda c: c['last_message']['timestamp'] if c['last_message'] else '',
+                reverse=True
+            )
+            
+            return JsonResponse({
+                'status': 'success',
+                'cursor': format_sync_cursor(latest_event_chat_id, latest_task_chat_id),
+                'conversation_count': len(conversations),
+                'conversations': conversations
+            })
+            
+        except Exception as e:
+            print(f"Error in ChatSyncView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatUnreadCountsView(View):
+    """
+    Unread message counts for every event and task chat of the user,
+    for notification badges.
+    """
+    def get(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+            
+            read_state = chat_unread.unread_counts(request.user)
+            
+            conversations = [
+                {
+                    'type': conversation_type,
+                    'id': conversation_id,
+                    'last_read_id': state['last_read_id'],
+                    'unread_count': state['unread_count']
+                }
+                for (conversation_type, conversation_id), state in read_state.items()
+            ]
+            
+            return JsonResponse({
+                'status': 'success',
+                'total_unread': sum(c['unread_count'] for c in conversations),
+                'conversations': conversations
+            })
+            
+        except Exception as e:
+            print(f"Error in ChatUnreadCountsView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatMarkReadView(View):
+    """
+    Mark an event or task chat as read up to a message
+    (the newest message when last_read_id is omitted).
+    """
+    def post(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+            
+            # Parse request data
+            data = request.POST if request.POST else json.loads(request.body)
+            
+            conversation_type = data.get('conversation_type')
+            conversation_id = data.get('conversation_id')
+            last_read_id = data.get('last_read_id')
+            
+            if conversation_type not in chat_unread.CONVERSATION_TYPES:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': "conversation_type must be 'event' or 'task'"
+                }, status=400)
+            
+            if not conversation_id:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Conversation ID is required'
+                }, status=400)
+            
+            try:
+                conversation_id = int(conversation_id)
+                last_read_id = int(last_read_id) if last_read_id not in (None, '') else None
+            except (TypeError, ValueError):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'conversation_id and last_read_id must be integers'
+                }, status=400)
+            
+            # Check access rights
+            try:
+                is_member = chat_unread.is_conversation_member(request.user, conversation_type, conversation_id)
+            except (EventInfo.DoesNotExist, TaskInfo.DoesNotExist):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Conversation not found'
+                }, status=404)
+            
+            if not is_member:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'You do not have access to this conversation'
+                }, status=403)
+            
+            marker, unread_count = chat_unread.mark_read(request.user, conversation_type, conversation_id, last_read_id)
+            
+            return JsonResponse({
+                'status': 'success',
+                'conversation_type': conversation_type,
+                'conversation_id': conversation_id,
+                'last_read_id': marker.last_read_id,
+                'unread_count': unread_count
+            })
+            
+        except Exception as e:
+            print(f"Error in ChatMarkReadView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatSearchView(View):
+    """
+    Ranked full-text search over chat messages with highlighted matches.
+    Searches one event chat (event_id), one task chat (task_id), or every
+    event or task chat of the user when neither is given, so a host can
+    search all of their events at once.
+    """
+    def get(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+            
+            query = request.GET.get('q', '').strip()
+            if not query:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Search query is required'
+                }, status=400)
+            
+            event_id = request.GET.get('event_id')
+            task_id = request.GET.get('task_id')
+            chat_type = 'task' if task_id else request.GET.get('type', 'event')
+            
+            if chat_type not in ('event', 'task'):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': "type must be 'event' or 'task'"
+                }, status=400)
+            
+            try:
+                limit = int(request.GET.get('limit', 20))
+            except ValueError:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'limit must be an integer'
+                }, status=400)
+            limit = max(1, min(limit, 100))
+            
+            try:
+                cursor = chat_search.parse_search_cursor(request.GET.get('cursor'))
+            except ValueError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
+            
+            # Work out which conversations to search
+            if event_id or task_id:
+                conversation_type = 'task' if task_id else 'event'
+                conversation_id = task_id or event_id
+                try:
+                    is_member = chat_unread.is_conversation_member(request.user, conversation_type, conversation_id)
+                except (EventInfo.DoesNotExist, TaskInfo.DoesNotExist, ValueError):
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'Conversation not found'
+                    }, status=404)
+                
+                if not is_member:
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'You do not have access to this conversation'
+                    }, status=403)
+                
+                if conversation_type == 'event':
+                    messages = EventChat.objects.filter(event_id=event_id)
+                else:
+                    messages = Chat.objects.filter(task_id=task_id)
+            elif chat_type == 'event':
+                messages = EventChat.objects.filter(event_id__in=list(user_event_conversations(request.user)))
+            else:
+                messages = Chat.objects.filter(task_id__in=list(user_task_conversations(request.user)))
+            
+            hits, next_cursor = chat_search.search_messages(messages, query, limit, cursor)
+            
+            serializer_class = EventChatSerializer if chat_type == 'event' else TaskChatSerializer
+            results = []
+            for message, rank, highlighted in hits:
+                result = dict(serializer_class(message, context={'request': request}).data)
+                result['rank'] = rank
+                result['highlight'] = highlighted
+                results.append(result)
+            
+            return JsonResponse({
+                'status': 'success',
+                'query': query,
+                'type': chat_type,
+                'returned_count': len(results),
+                'has_more': next_cursor is not None,
+                'next_cursor': next_cursor,
+                'results': results
+            })
+            
+        except Exception as e:
+            print(f"Error in ChatSearchView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatWriteBufferMetricsView(View):
+    """
+    Queue depth and flush latency of the batched chat writer (hosts only)
+    """
+    def get(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+            
+            if not request.user.isHost:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Only hosts can view chat metrics'
+                }, status=403)
+            
+            return JsonResponse({
+                'status': 'success',
+                'metrics': chat_write_buffer.writer.metrics()
+            })
+            
+        except Exception as e:
+            print(f"Error in ChatWriteBufferMetricsView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
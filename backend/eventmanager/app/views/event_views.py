@@ -12,6 +12,7 @@ from datetime import datetime
 from django.utils import timezone
 import traceback
 from ..services.emailservice import EmailService
+from ..services import popularity
 class EventViewSet(viewsets.ModelViewSet):
     queryset = EventInfo.objects.all()
     serializer_class = EventInfoSerializer
@@ -267,6 +268,52 @@ class AllUpcomingEventsView(View):
         return self.get(request)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class TrendingEventsView(View):
+    """
+    Get the events with the most recent activity (enrollments, chat messages
+    and detail views, decayed over time) - accessible without authentication
+    """
+    def get(self, request):
+        try:
+            limit = min(int(request.GET.get('limit', 10)), 100)
+            status = request.GET.get('status', 'active')
+            statuses = ['Upcoming', 'Ongoing'] if status == 'active' else [status]
+            
+            now = timezone.now()
+            events = []
+            for entry in popularity.trending(limit, statuses):
+                events.append({
+                    'id': entry.event_id,
+                    'name': entry.event.event_name,
+                    'status': entry.event.status,
+                    'start_time': entry.event.start_time.isoformat(),
+                    'end_time': entry.event.end_time.isoformat(),
+                    'location': entry.event.location,
+                    'trending_score': round(popularity.current_score(entry.log_score, now), 3),
+                    'last_activity': entry.last_activity.isoformat()
+                })
+            
+            return JsonResponse({
+                'status': 'success',
+                'count': len(events),
+                'events': events
+            })
+            
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'limit must be an integer'
+            }, status=400)
+        except Exception as e:
+            print(f"Error in TrendingEventsView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class EventDetailsView(View):
     """
@@ -293,6 +340,7 @@ class EventDetailsView(View):
                 }, status=404)
                 
             serializer = EventInfoSerializer(event, context={'request': request})
+            popularity.record_view(event.id, request.user)
             
             return JsonResponse({
                 'status': 'success',
@@ -329,6 +377,7 @@ class EventDetailsView(View):
                 }, status=404)
                 
             serializer = EventInfoSerializer(event, context={'request': request})
+            popularity.record_view(event.id, request.user)
             
             return JsonResponse({
                 'status': 'success',
@@ -3,6 +3,7 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from ..models import EventInfo, Feedback, User
 from ..serializers.feedback import FeedbackSerializer
 import json
@@ -205,8 +206,9 @@ class SubmitFeedbackView(View):
                 would_volunteer_again=data.get('would_volunteer_again', True),
             )
             
-            # Save the feedback
-            feedback.save()
+            # Save the feedback; the event's rating rollup is updated in the same transaction
+            with transaction.atomic():
+                feedback.save()
             
             # Return the created feedback
             serializer = FeedbackSerializer(feedback)
@@ -2,9 +2,9 @@ from django.views import View
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from ..models import EventInfo, Feedback, TaskInfo, SubTask
-from ..ml.feedback_report import generate_event_report
+from ..models import EventInfo, Feedback, TaskInfo
 from django.core.exceptions import ObjectDoesNotExist
+from ..services import event_report, feedback_rollup, jobs
 import traceback
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -43,44 +43,15 @@ class GenerateEventReportView(View):
                     'message': 'Only the event host can access this report'
                 }, status=403)
             
-            # Gather all required data
-            feedback_list = list(Feedback.objects.filter(event=event).values(
-                'overall_experience', 'organization_quality', 'communication',
-                'host_interaction', 'volunteer_support', 'task_clarity',
-                'impact_awareness', 'inclusivity', 'time_management',
-                'recognition', 'strengths', 'improvements', 'additional_comments',
-                'would_volunteer_again'
-            ))
-            
-            task_list = list(TaskInfo.objects.filter(event=event).values(
-                'task_name', 'status', 'notification_message',
-                'volunteer_efficiency', 'task_analysis'
-            ))
-            
-            subtask_list = list(SubTask.objects.filter(parent_task__event=event).values(
-                'title', 'status', 'completion_percentage', 'notification_message'
-            ))
-            
-            # Prepare event data
-            event_data = {
-                'event_name': event.event_name,
-                'start_time': event.start_time.strftime('%Y-%m-%d %H:%M'),
-                'end_time': event.end_time.strftime('%Y-%m-%d %H:%M'),
-                'location': event.location,
-                'host': event.host.name,
-                'volunteer_enrolled': event.volunteer_enrolled.count(),
-                'required_volunteers': event.required_volunteers,
-                'overview': event.overview,
-                'task_analysis': event.task_analysis
-            }
+            if request.GET.get('async') == 'true':
+                job = jobs.enqueue('event_report', {'event_id': event.id}, owner=request.user,
+                                   priority=jobs.PRIORITY_INTERACTIVE)
+                return JsonResponse({
+                    'status': 'success',
+                    'job': jobs.describe(job)
+                }, status=202)
             
-            # Generate the report
-            report = generate_event_report(
-                event=event_data,
-                feedback_list=feedback_list,
-                task_list=task_list,
-                subtask_list=subtask_list
-            )
+            report = event_report.get(event)
             
             return JsonResponse({
                 'status': 'success',
@@ -128,21 +99,10 @@ class EventFeedbackAnalyticsView(View):
             # Get all feedback for this event
             feedbacks = Feedback.objects.filter(event=event)
             
-            # Basic statistics
-            total_feedback = feedbacks.count()
-            would_volunteer_again = feedbacks.filter(would_volunteer_again=True).count()
-            
-            # Calculate average ratings
-            rating_fields = [
-                'overall_experience', 'organization_quality', 'communication',
-                'host_interaction', 'volunteer_support', 'task_clarity',
-                'impact_awareness', 'inclusivity', 'time_management', 'recognition'
-            ]
-            
-            averages = {}
-            for field in rating_fields:
-                values = list(filter(None, [getattr(f, field) for f in feedbacks]))
-                averages[field] = sum(values) / len(values) if values else 0
+            # Basic statistics and ratings, from the event's feedback rollup
+            rollup = feedback_rollup.for_event(event.id)
+            total_feedback = rollup.feedback_count
+            would_volunteer_again = rollup.would_volunteer_again_count
             
             # Get common themes from text feedback
             strengths = list(feedbacks.values_list('strengths', flat=True))
@@ -162,7 +122,9 @@ class EventFeedbackAnalyticsView(View):
                         'would_volunteer_again': would_volunteer_again,
                         'percentage': (would_volunteer_again / total_feedback * 100) if total_feedback > 0 else 0
                     },
-                    'average_ratings': averages,
+                    'average_ratings': feedback_rollup.averages(rollup),
+                    'rating_standard_deviations': feedback_rollup.standard_deviations(rollup),
+                    'rating_distributions': feedback_rollup.histograms(rollup),
                     'task_completion': {
                         'total': total_tasks,
                         'completed': completed_tasks,
@@ -0,0 +1,95 @@
+from django.http import FileResponse, JsonResponse
+from django.views import View
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from ..models import Job
+from ..services import jobs
+import traceback
+
+
+def _owned_job(request):
+    """The job named by job_id if it belongs to the user, else an error response"""
+    if not request.user.is_authenticated:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Authentication required'
+        }, status=401)
+    
+    job_id = request.GET.get('job_id')
+    if not job_id:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Job ID is required'
+        }, status=400)
+    
+    # Other users' jobs are reported as missing
+    try:
+        return Job.objects.get(id=job_id, owner=request.user), None
+    except (Job.DoesNotExist, ValueError):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Job not found'
+        }, status=404)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class JobStatusView(View):
+    """Status of a background job started with async=true, with its download URL once completed"""
+    
+    def get(self, request):
+        try:
+            job, error = _owned_job(request)
+            if error:
+                return error
+            
+            return JsonResponse({
+                'status': 'success',
+                'job': jobs.describe(job)
+            })
+            
+        except Exception as e:
+            print(f"Error in JobStatusView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+    
+    def post(self, request):
+        return self.get(request)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class JobDownloadView(View):
+    """Download the file a completed job produced"""
+    
+    def get(self, request):
+        try:
+            job, error = _owned_job(request)
+            if error:
+                return error
+            
+            if job.status != 'Completed' or not job.result_path:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': f"Job has no result to download (status: {job.status})"
+                }, status=409)
+            
+            try:
+                result = open(job.result_path, 'rb')
+            except OSError:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'The result has expired'
+                }, status=410)
+            
+            return FileResponse(result, as_attachment=True, filename=job.result_name,
+                                content_type=job.result_content_type or None)
+            
+        except Exception as e:
+            print(f"Error in JobDownloadView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
@@ -6,23 +6,16 @@ from django.http import JsonResponse
 from ..models import EventInfo, User, TaskInfo
 from ..serializers.event import EventInfoSerializer
 from ..serializers.task import TaskInfoSerializer
+from ..services import job_handlers, jobs, popularity, recommendation_cache, skill_coverage
+from ..ml import loader
 import json
 import traceback
-import pandas as pd
 from django.db.models import Count ,Q
 from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
+import time
 
-# Try importing the ML modules
-try:
-    from app.ml.event_recommendation_for_volunteers import (
-        recommend_events_for_volunteer, 
-        match_tasks_to_volunteers, 
-        extract_event_skills
-    )
-    ML_IMPORT_SUCCESS = True
-except ImportError as e:
-    print(f"Error importing ML modules: {str(e)}")
-    ML_IMPORT_SUCCESS = False
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -32,13 +25,6 @@ class RecommendEventsForVolunteerView(View):
     """
     def get(self, request):
         try:
-            # Check if ML modules were imported successfully
-            if not ML_IMPORT_SUCCESS:
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'ML modules not available. Check server logs for details.'
-                }, status=500)
-                
             # Get the authenticated user
             user = request.user
             
@@ -61,80 +47,52 @@ class RecommendEventsForVolunteerView(View):
             limit = int(request.GET.get('limit', 10))  # Default to 10 recommendations
             include_enrolled = request.GET.get('include_enrolled', 'false').lower() == 'true'
             
-            # Get available events
-            events_query = EventInfo.objects.filter(status=status_filter)
-            
-            # Exclude events the user is already enrolled in unless include_enrolled is true
-            if not include_enrolled:
-                events_query = events_query.exclude(volunteer_enrolled=user)
-            
-            # Order by start_time to get the nearest events first
-            events = events_query.order_by('start_time')
-            
-            # Prepare event data for the ML recommendation
-            events_data = []
-            for event in events:
-                # Get tasks for this event
-                tasks = TaskInfo.objects.filter(event=event)
-                tasks_data = []
-                
-                for task in tasks:
-                    tasks_data.append({
-                        'id': task.id,
-                        'name': task.task_name,
-                        'description': task.description,
-                        'required_skills': task.required_skills
-                    })
-                
-                events_data.append({
-                    'id': event.id,
-                    'name': event.event_name,
-                    'description': event.description,
-                    'overview': event.overview,
-                    'tasks': tasks_data,
-                    'start_time': event.start_time.isoformat(),
-                    'end_time': event.end_time.isoformat(),
-                    'location': event.location,
-                    'status': event.status,
-                    'enrolled': user in event.volunteer_enrolled.all(),
-                })
+            # Get personalized recommendations (served from the cache when nothing changed)
+            try:
+                ranked = recommendation_cache.ranked_events(
+                    'recommend_events', user, limit, status=status_filter, include_enrolled=include_enrolled
+                )
+                if ranked is not None:
+                    # The most relevant skills of each event, extracted from its tasks
+                    recommendation_cache.add_extracted_skills(ranked[0])
+            except ImportError:
+                # Only ranking and skill extraction need the ML modules
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'ML modules not available. Check server logs for details.'
+                }, status=500)
             
-            # If user has no skills defined, return events sorted by start time
-            if not user.skills:
+            # If user has no skills and no enrollment history, return trending events first
+            if ranked is None:
+                events, _ = recommendation_cache.recommend_events_queryset(user, status_filter, include_enrolled)
+                events_data = recommendation_cache.build_events_data(popularity.popular_first(events)[:limit], user)
                 # Include a message in the response about missing skills
                 return JsonResponse({
                     'status': 'success',
                     'message': 'Your profile has no skills defined. Please update your profile to get personalized recommendations.',
-                    'recommendations': events_data[:limit],
-                    'count': len(events_data[:limit]),
+                    'recommendations': events_data,
+                    'count': len(events_data),
                     'personalized': False
                 })
             
-            # Get personalized recommendations
-            recommended_events = recommend_events_for_volunteer(user.skills, events_data)
-            
-            # Apply limit
-            recommended_events = recommended_events[:limit]
+            recommended_events, _ = ranked
             
             # Format the response
             for event in recommended_events:
-                # Extract the most relevant skills for this event based on the tasks
-                event['extracted_skills'] = extract_event_skills(event)
-                
-                # Add additional fields 
-                event['volunteer_count'] = EventInfo.objects.get(id=event['id']).volunteer_enrolled.count()
-                event['task_count'] = TaskInfo.objects.filter(event_id=event['id']).count()
-                
                 # Format the relevance score for better readability
                 event['relevance_score'] = round(event['relevance_score'] * 100, 1)  # Convert to percentage
             
-            return JsonResponse({
+            response = {
                 'status': 'success',
                 'user_skills': user.skills.split(',') if user.skills else [],
                 'recommendations': recommended_events,
                 'count': len(recommended_events),
                 'personalized': True
-            })
+            }
+            if not user.skills:
+                response['message'] = ('Based on events joined by volunteers with a similar history. '
+                                       'Add skills to your profile for better recommendations.')
+            return JsonResponse(response)
             
         except Exception as e:
             print(f"Error in RecommendEventsForVolunteerView: {str(e)}")
@@ -156,13 +114,6 @@ class GetRecommendedTasksForUserView(View):
     """
     def get(self, request):
         try:
-            # Check if ML modules were imported successfully
-            if not ML_IMPORT_SUCCESS:
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'ML modules not available. Check server logs for details.'
-                }, status=500)
-                
             # Get the authenticated user
             user = request.user
             
@@ -197,6 +148,7 @@ class GetRecommendedTasksForUserView(View):
             
             # Exclude tasks the user is already assigned to
             tasks_query = tasks_query.exclude(volunteers=user)
+            tasks_query = tasks_query.select_related('event')
             
             # Prepare task data for ML recommendation
             tasks_data = []
@@ -241,18 +193,35 @@ class GetRecommendedTasksForUserView(View):
                     'personalized': False
                 })
             
-            # Use the ML module to match tasks to the user
-            volunteer_df = pd.DataFrame([{
-                'Name': user.name,
-                'Skills': user.skills,
-                'ID': user.id,
-                'Email': user.email
-            }])
-            
-            task_contexts = [task['context'] for task in tasks_data]
+            # Serve the nightly precomputed ranking when it covers these tasks
+            ranked_ids = None
+            if not event_id:
+                ranked_ids = recommendation_cache.precomputed_task_ids(user, tasks_query, limit)
             
-            # Use the matching function to get tasks ranked by relevance
-            volunteer_task_map = match_tasks_to_volunteers(task_contexts, volunteer_df)
+            if ranked_ids is not None:
+                contexts = {task['id']: task['context'] for task in tasks_data}
+                volunteer_task_map = {user.name: [contexts[task_id] for task_id in ranked_ids]}
+            else:
+                # Check if ML modules were imported successfully
+                if not loader.available():
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'ML modules not available. Check server logs for details.'
+                    }, status=500)
+                
+                # Use the ML module to match tasks to the user
+                import pandas as pd
+                volunteer_df = pd.DataFrame([{
+                    'Name': user.name,
+                    'Skills': user.skills,
+                    'ID': user.id,
+                    'Email': user.email
+                }])
+                
+                task_contexts = [task['context'] for task in tasks_data]
+                
+                # Use the matching function to get tasks ranked by relevance
+                volunteer_task_map = loader.recommender().match_tasks_to_volunteers(task_contexts, volunteer_df)
             
             # Get the ranked tasks for this volunteer
             if user.name in volunteer_task_map:
@@ -260,10 +229,12 @@ class GetRecommendedTasksForUserView(View):
                 
                 # Reorder tasks based on the ranking
                 ranked_tasks = []
+                unmatched = list(tasks_data)
                 for context in ranked_contexts:
-                    # Find the task with this context
-                    for task in tasks_data:
+                    # Find the task with this context (each task once, as contexts can repeat)
+                    for task in unmatched:
                         if task['context'] == context:
+                            unmatched.remove(task)
                             # Calculate match score between user skills and task skills
                             user_skills = set(s.strip().lower() for s in user.skills.split(',') if s.strip())
                             task_skills = set()
@@ -325,7 +296,7 @@ class AnalyzeEventSkillsView(View):
     def get(self, request):
         try:
             # Check if ML modules were imported successfully
-            if not ML_IMPORT_SUCCESS:
+            if not loader.available():
                 return JsonResponse({
                     'status': 'error',
                     'message': 'ML modules not available. Check server logs for details.'
@@ -348,114 +319,19 @@ class AnalyzeEventSkillsView(View):
                     'message': 'Event not found'
                 }, status=404)
             
-            # Get tasks for this event
-            tasks = TaskInfo.objects.filter(event=event)
-            
-            # Prepare event data for skill analysis
-            event_data = {
-                'id': event.id,
-                'name': event.event_name,
-                'description': event.description,
-                'overview': event.overview,
-                'tasks': []
-            }
-            
-            # Collect all explicit skills from tasks
-            all_skills = set()
-            skill_counts = {}
-            
-            for task in tasks:
-                task_data = {
-                    'id': task.id,
-                    'name': task.task_name,
-                    'description': task.description,
-                    'required_skills': task.required_skills,
-                    'skills_list': task.get_skills_list() if hasattr(task, 'get_skills_list') else []
-                }
-                event_data['tasks'].append(task_data)
-                
-                # Add to skill counts
-                skills_list = task_data['skills_list']
-                if not skills_list and task.required_skills:
-                    # If there's no get_skills_list method, extract from required_skills directly
-                    skills_list = [s.strip() for s in task.required_skills.split(',') if s.strip()]
-                    
-                for skill in skills_list:
-                    skill = skill.strip().lower()
-                    all_skills.add(skill)
-                    skill_counts[skill] = skill_counts.get(skill, 0) + 1
-            
-            # Extract skills from the event if none are explicitly defined in tasks
-            extracted_skills = []
-            if not all_skills:
-                extracted_skills = extract_event_skills(event_data)
-                for skill in extracted_skills:
-                    skill = skill.strip().lower()
-                    all_skills.add(skill)
-                    skill_counts[skill] = skill_counts.get(skill, 0) + 1
-            
-            # Prepare the skill statistics
-            skill_stats = []
-            for skill in all_skills:
-                stat = {
-                    'skill': skill,
-                    'count': skill_counts.get(skill, 0),
-                    'percentage': round(skill_counts.get(skill, 0) / len(tasks) * 100 if tasks else 0, 1)
-                }
-                skill_stats.append(stat)
-            
-            # Sort by frequency
-            skill_stats.sort(key=lambda x: x['count'], reverse=True)
-            
-            # Count how many volunteers enrolled have each skill
-            volunteer_skill_counts = {}
-            enrolled_volunteers = event.volunteer_enrolled.all()
-            
-            for skill in all_skills:
-                # Count volunteers with this skill
-                volunteer_skill_counts[skill] = sum(
-                    1 for v in enrolled_volunteers if v.skills and
-                    skill.lower() in [s.strip().lower() for s in v.skills.split(',') if s.strip()]
-                )
-            
-            # Identify skill gaps
-            skill_gaps = []
-            for skill in all_skills:
-                required_count = skill_counts.get(skill, 0)
-                available_count = volunteer_skill_counts.get(skill, 0)
-                
-                gap = required_count - available_count
-                if gap > 0:
-                    skill_gaps.append({
-                        'skill': skill,
-                        'required': required_count,
-                        'available': available_count,
-                        'gap': gap
-                    })
-            
-            # Sort gaps by severity
-            skill_gaps.sort(key=lambda x: x['gap'], reverse=True)
+            # Served from the cache until the event's tasks, enrollments or volunteer skills change
+            key = skill_coverage.cache_key(event.id)
+            analysis = cache.get(key)
+            if analysis is None:
+                analysis = self._analyze(event)
+                cache.set(key, analysis, getattr(settings, 'SKILL_COVERAGE_CACHE_SECONDS', 3600))
             
-            # Analyze overall coverage
-            total_skill_requirements = sum(skill_counts.values())
-            total_skill_coverage = sum(min(skill_counts.get(skill, 0), volunteer_skill_counts.get(skill, 0)) for skill in all_skills)
-            
-            coverage_percentage = round(total_skill_coverage / total_skill_requirements * 100 if total_skill_requirements else 0, 1)
-            
-            return JsonResponse({
-                'status': 'success',
-                'event_id': event.id,
-                'event_name': event.event_name,
-                'skills': list(all_skills),
-                'skill_stats': skill_stats,
-                'volunteer_skill_counts': volunteer_skill_counts,
-                'skill_gaps': skill_gaps,
-                'coverage_percentage': coverage_percentage,
-                'extracted_skills': extracted_skills if extracted_skills else [],
-                'is_ml_extracted': bool(extracted_skills),
-                'total_tasks': len(tasks),
-                'total_volunteers': enrolled_volunteers.count()
-            })
+            response = {'status': 'success'}
+            response.update(analysis)
+            # Suggestions name volunteers outside the event; only its host may see them
+            if not (request.user.is_authenticated and request.user.id == event.host_id):
+                del response['suggested_volunteers']
+            return JsonResponse(response)
             
         except Exception as e:
             print(f"Error in AnalyzeEventSkillsView: {str(e)}")
@@ -465,6 +341,56 @@ class AnalyzeEventSkillsView(View):
                 'message': str(e)
             }, status=500)
     
+    def _analyze(self, event):
+        tasks = list(TaskInfo.objects.filter(event=event))
+        
+        # Prepare event data for skill analysis
+        event_data = {
+            'id': event.id,
+            'name': event.event_name,
+            'description': event.description,
+            'overview': event.overview,
+            'tasks': []
+        }
+        
+        # Count how many tasks require each explicit skill
+        skill_counts = {}
+        for task in tasks:
+            event_data['tasks'].append({
+                'id': task.id,
+                'name': task.task_name,
+                'description': task.description,
+                'required_skills': task.required_skills
+            })
+            for skill in skill_coverage.parse_skills(task.required_skills):
+                skill_counts[skill] = skill_counts.get(skill, 0) + 1
+        
+        # Extract skills from the event if none are explicitly defined in tasks
+        extracted_skills = []
+        if not skill_counts:
+            extracted_skills = loader.recommender().extract_event_skills(event_data)
+            for skill in extracted_skills:
+                skill = skill.strip().lower()
+                skill_counts[skill] = skill_counts.get(skill, 0) + 1
+        
+        analysis = skill_coverage.analyze(event, skill_counts)
+        analysis.update({
+            'event_id': event.id,
+            'event_name': event.event_name,
+            'skill_stats': [
+                {
+                    'skill': skill,
+                    'count': skill_counts[skill],
+                    'percentage': round(skill_counts[skill] / len(tasks) * 100 if tasks else 0, 1)
+                }
+                for skill in analysis['skills']
+            ],
+            'extracted_skills': extracted_skills,
+            'is_ml_extracted': bool(extracted_skills),
+            'total_tasks': len(tasks)
+        })
+        return analysis
+    
     def post(self, request):
         # POST method can use the same logic as GET for this view
         return self.get(request)
@@ -492,130 +418,65 @@ class GetSortedEventsByRelevanceView(View):
             limit = int(request.GET.get('limit', 100))  # Default to 100 events
             include_past = request.GET.get('include_past', 'false').lower() == 'true'
             
-            # Build event query based on status parameter
-            if status == 'all':
-                events_query = EventInfo.objects.all()
-            elif status == 'active':
-                # Get ongoing and upcoming events
-                from django.utils import timezone
-                now = timezone.now()
-                events_query = EventInfo.objects.filter(
-                    (Q(status='Ongoing') | Q(status='Upcoming')) &
-                    (Q(end_time__gte=now) | Q(start_time__gte=now))
-                )
-            elif status == 'ongoing':
-                events_query = EventInfo.objects.filter(status='Ongoing')
-            elif status == 'upcoming':
-                events_query = EventInfo.objects.filter(status='Upcoming')
-            else:
-                # Specific status
-                events_query = EventInfo.objects.filter(status=status)
+            # Events ordered by start_time (default ordering)
+            events, _ = recommendation_cache.sorted_events_queryset(user, status, include_past)
             
-            # By default, exclude past events unless explicitly requested
-            if not include_past:
-                from django.utils import timezone
-                now = timezone.now()
-                events_query = events_query.filter(end_time__gte=now)
-            
-            # Order by start_time (default ordering)
-            events = events_query.order_by('start_time')
-            
-            # Prepare event data
-            events_data = []
-            for event in events:
-                # Get tasks for this event
-                tasks = TaskInfo.objects.filter(event=event)
-                tasks_data = []
-                
-                # Get all tasks data
-                for task in tasks:
-                    tasks_data.append({
-                        'id': task.id,
-                        'name': task.task_name,
-                        'description': task.description,
-                        'required_skills': task.required_skills
-                    })
-                
-                # Create event data object
-                event_data = {
-                    'id': event.id,
-                    'name': event.event_name,
-                    'description': event.description,
-                    'overview': event.overview,
-                    'tasks': tasks_data,
-                    'start_time': event.start_time.isoformat(),
-                    'end_time': event.end_time.isoformat(),
-                    'location': event.location,
-                    'status': event.status,
-                    'enrolled': user in event.volunteer_enrolled.all(),
-                    'volunteer_count': event.volunteer_enrolled.count(),
-                    'task_count': tasks.count()
-                }
-                
-                events_data.append(event_data)
-            
-            # If ML modules aren't available or user has no skills, 
-            # still return events but sorted by start_time
-            if not ML_IMPORT_SUCCESS or not user.skills:
-                return JsonResponse({
-                    'status': 'success',
-                    'message': 'Events sorted by start time' + 
-                               (' (ML modules not available)' if not ML_IMPORT_SUCCESS else 
-                                ' (no user skills defined)' if not user.skills else ''),
-                    'events': events_data[:limit],
-                    'count': len(events_data[:limit]),
-                    'personalized': False,
-                    'total_available': len(events_data)
-                })
+            ml_available = True
+            has_events = events.exists()
             
-            # If we have events and ML is available, get personalized recommendations
-            if events_data:
+            # If we have events, get personalized recommendations (the ML modules load on first use)
+            if has_events:
                 try:
-                    recommended_events = recommend_events_for_volunteer(user.skills, events_data)
+                    # None when the user has neither skills nor enrollment history
+                    ranked = recommendation_cache.ranked_events(
+                        'sorted_events', user, limit, status=status, include_past=include_past
+                    )
+                    if ranked is not None:
+                        recommended_events, total_available = ranked
+                        # The most relevant skills of each event, extracted from its tasks
+                        recommendation_cache.add_extracted_skills(recommended_events)
                     
-                    # Format the response
-                    for event in recommended_events:
-                        # Extract the most relevant skills for this event based on the tasks
-                        event['extracted_skills'] = extract_event_skills(event)
+                        # Format the response
+                        for event in recommended_events:
+                            # Format the relevance score for better readability
+                            event['relevance_score'] = round(event['relevance_score'] * 100, 1)  # Convert to percentage
                         
-                        # Format the relevance score for better readability
-                        event['relevance_score'] = round(event['relevance_score'] * 100, 1)  # Convert to percentage
-                        
-                        # Calculate skill match percentage
-                        if event['extracted_skills']:
-                            user_skills = set(s.strip().lower() for s in user.skills.split(',') if s.strip())
-                            event_skills = set(s.strip().lower() for s in event['extracted_skills'])
+                            # Calculate skill match percentage
+                            if event['extracted_skills']:
+                                user_skills = set(s.strip().lower() for s in user.skills.split(',') if s.strip())
+                                event_skills = set(s.strip().lower() for s in event['extracted_skills'])
                             
-                            matching_skills = user_skills.intersection(event_skills)
-                            event['matching_skills'] = list(matching_skills)
-                            event['skill_match_percent'] = round(len(matching_skills) / len(event_skills) * 100 if event_skills else 0, 1)
-                        else:
-                            event['matching_skills'] = []
-                            event['skill_match_percent'] = 0
+                                matching_skills = user_skills.intersection(event_skills)
+                                event['matching_skills'] = list(matching_skills)
+                                event['skill_match_percent'] = round(len(matching_skills) / len(event_skills) * 100 if event_skills else 0, 1)
+                            else:
+                                event['matching_skills'] = []
+                                event['skill_match_percent'] = 0
                     
-                    # Apply limit
-                    limited_events = recommended_events[:limit]
-                    
-                    return JsonResponse({
-                        'status': 'success',
-                        'user_skills': user.skills.split(',') if user.skills else [],
-                        'events': limited_events,
-                        'count': len(limited_events),
-                        'personalized': True,
-                        'total_available': len(recommended_events)
-                    })
+                        return JsonResponse({
+                            'status': 'success',
+                            'user_skills': user.skills.split(',') if user.skills else [],
+                            'events': recommended_events,
+                            'count': len(recommended_events),
+                            'personalized': True,
+                            'total_available': total_available
+                        })
+                except ImportError:
+                    # ML modules not available: popularity ordering below
+                    ml_available = False
                 except Exception as e:
                     # If recommendation fails, fall back to chronological ordering
                     print(f"Warning: Event recommendation failed: {str(e)}")
                     print(traceback.format_exc())
                     
+                    events_data = recommendation_cache.build_events_data(events[:limit], user)
                     return JsonResponse({
                         'status': 'success',
                         'message': f'Events sorted by start time (recommendation error: {str(e)})',
-                        'events': events_data[:limit],
-                        'count': len(events_data[:limit]),
+                        'events': events_data,
+                        'count': len(events_data),
                         'personalized': False,
-                        'total_available': len(events_data)
+                        'total_available': events.count()
                     })
             else:
                 # No events found
@@ -628,6 +489,20 @@ class GetSortedEventsByRelevanceView(View):
                     'total_available': 0
                 })
             
+            # If ML modules aren't available or user has neither skills nor enrollment history,
+            # still return events but sorted by popularity, then start_time
+            events_data = recommendation_cache.build_events_data(popularity.popular_first(events)[:limit], user)
+            return JsonResponse({
+                'status': 'success',
+                'message': 'Events sorted by popularity and start time' + 
+                           (' (ML modules not available)' if not ml_available else 
+                            ' (no user skills or enrollment history)'),
+                'events': events_data,
+                'count': len(events_data),
+                'personalized': False,
+                'total_available': events.count()
+            })
+            
         except Exception as e:
             print(f"Error in GetSortedEventsByRelevanceView: {str(e)}")
             print(traceback.format_exc())
@@ -638,4 +513,295 @@ class GetSortedEventsByRelevanceView(View):
     
     def post(self, request):
         # POST method can use the same logic as GET for this view
-        return self.get(request)
\ No newline at end of file
+        return self.get(request)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SemanticEventSearchView(View):
+    """
+    Search events by meaning rather than exact words, using precomputed event
+    embeddings (see the embed_events management command).
+    mode=semantic ranks by cosine similarity, mode=keyword by full-text bm25,
+    and mode=hybrid blends both with weight alpha on the semantic score.
+    """
+    def get(self, request):
+        try:
+            from app.ml import embedding_store
+            
+            query = request.GET.get('q', '').strip()
+            if not query:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Search query is required'
+                }, status=400)
+            
+            mode = request.GET.get('mode', 'semantic')
+            if mode not in ('semantic', 'keyword', 'hybrid'):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': "mode must be 'semantic', 'keyword' or 'hybrid'"
+                }, status=400)
+            
+            try:
+                limit = min(int(request.GET.get('limit', 10)), 50)
+                alpha = float(request.GET.get('alpha', getattr(settings, 'SEMANTIC_SEARCH_ALPHA', 0.7)))
+            except ValueError:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'limit and alpha must be numbers'
+                }, status=400)
+            alpha = min(max(alpha, 0.0), 1.0)
+            
+            # Same visibility rules as the keyword event search
+            events = EventInfo.objects.all()
+            status_filter = request.GET.get('status')
+            if status_filter:
+                events = events.filter(status=status_filter)
+            if request.user.is_authenticated and request.user.isHost:
+                events = events.exclude(Q(status='Draft') & ~Q(host=request.user))
+            else:
+                events = events.exclude(status='Draft')
+            
+            start = time.perf_counter()
+            message = None
+            try:
+                results = embedding_store.search_events(query, events, mode=mode, limit=limit, alpha=alpha)
+            except ImportError as e:
+                # Without the embedding model only the keyword index can answer
+                print(f"Semantic search unavailable, using keyword search: {str(e)}")
+                message = 'Semantic search is unavailable, results are keyword matches only'
+                mode = 'keyword'
+                results = embedding_store.search_events(query, events, mode='keyword', limit=limit)
+            took_ms = (time.perf_counter() - start) * 1000
+            
+            event_map = EventInfo.objects.select_related('host').in_bulk([result[0] for result in results])
+            events_data = []
+            for event_id, score, semantic_score, keyword_score in results:
+                if event_id not in event_map:
+                    continue
+                event_data = EventInfoSerializer(event_map[event_id], context={'request': request}).data
+                event_data['score'] = round(score, 4)
+                event_data['semantic_score'] = round(semantic_score, 4) if semantic_score is not None else None
+                event_data['keyword_score'] = round(keyword_score, 4) if keyword_score is not None else None
+                events_data.append(event_data)
+            
+            response_data = {
+                'status': 'success',
+                'query': query,
+                'mode': mode,
+                'events': events_data,
+                'count': len(events_data),
+                'indexed_events': len(embedding_store.get_index()),
+                'took_ms': round(took_ms, 2)
+            }
+            if message:
+                response_data['message'] = message
+            
+            return JsonResponse(response_data)
+            
+        except Exception as e:
+            print(f"Error in SemanticEventSearchView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RecommendVolunteersForTaskView(View):
+    """
+    Recommend volunteers for a task (host only), ranked by how close their
+    skills are to the task. Candidates are the event's enrolled volunteers,
+    or every volunteer with scope=all.
+    """
+    def get(self, request):
+        try:
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+            
+            task_id = request.GET.get('task_id')
+            if not task_id:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Task ID is required'
+                }, status=400)
+            
+            try:
+                num_required = int(request.GET.get('num_required', 1))
+                threshold = float(request.GET.get('threshold', 0.6))
+            except ValueError:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'num_required must be an integer and threshold a number'
+                }, status=400)
+            scope = request.GET.get('scope', 'enrolled')
+            if scope not in ('enrolled', 'all'):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': "scope must be 'enrolled' or 'all'"
+                }, status=400)
+            include_assigned = request.GET.get('include_assigned', 'false').lower() == 'true'
+            
+            try:
+                task = TaskInfo.objects.select_related('event').get(id=task_id)
+            except TaskInfo.DoesNotExist:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Task not found'
+                }, status=404)
+            
+            if task.event.host != request.user:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'You can only get recommendations for tasks of events you are hosting'
+                }, status=403)
+            
+            try:
+                from ..ml import embedding_store
+                from ..ml.volunteer_recommendation import rank_volunteers, task_query
+            except ImportError as e:
+                print(f"Error importing ML modules: {str(e)}")
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'ML modules not available. Check server logs for details.'
+                }, status=500)
+            
+            if scope == 'enrolled':
+                candidates = task.event.volunteer_enrolled.filter(is_active=True)
+            else:
+                candidates = User.objects.filter(isHost=False, is_active=True)
+            if not include_assigned:
+                candidates = candidates.exclude(assigned_tasks=task)
+            candidates = list(candidates.exclude(skills='').order_by('id'))
+            
+            task_text = f"{task.task_name}. {task.description}"
+            if task.required_skills:
+                task_text += f" Skills: {task.required_skills}"
+            
+            # Stored skill vectors x task vector: one matrix product for all candidates
+            query_vector, skill_tags = task_query(task_text, embedding_store.model_name())
+            vectors = embedding_store.volunteer_vectors(candidates)
+            rows, scores = rank_volunteers(query_vector, vectors, num_required, threshold)
+            
+            enrolled_ids = set(task.event.volunteer_enrolled.values_list('id', flat=True))
+            task_skills = set(s.strip().lower() for s in task.required_skills.split(',') if s.strip())
+            volunteers = []
+            for row, score in zip(rows, scores):
+                volunteer = candidates[row]
+                volunteer_skills = set(s.strip().lower() for s in volunteer.skills.split(',') if s.strip())
+                volunteers.append({
+                    'id': volunteer.id,
+                    'name': volunteer.name,
+                    'email': volunteer.email,
+                    'skills': volunteer.skills,
+                    'score': round(float(score) * 100, 1),
+                    'above_threshold': bool(score >= threshold),
+                    'enrolled': volunteer.id in enrolled_ids,
+                    'matching_skills': sorted(volunteer_skills & task_skills)
+                })
+            
+            return JsonResponse({
+                'status': 'success',
+                'task_id': task.id,
+                'task_name': task.task_name,
+                'skill_tags': skill_tags,
+                'scope': scope,
+                'num_required': num_required,
+                'threshold': threshold,
+                'volunteers': volunteers,
+                'count': len(volunteers),
+                'candidates': len(candidates)
+            })
+            
+        except Exception as e:
+            print(f"Error in RecommendVolunteersForTaskView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+    
+    def post(self, request):
+        # POST method can use the same logic as GET for this view
+        return self.get(request)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MLStatusView(View):
+    """
+    Readiness of this process: 503 while the ML_WARM_UP warm-up is still
+    loading the models, 200 otherwise (without warm-up they load on first use;
+    a failed warm-up leaves the fallbacks serving). ``ml`` details the model
+    state. POST (hosts only) starts a warm-up.
+    """
+    def get(self, request):
+        try:
+            status = loader.status()
+            return JsonResponse({
+                'status': 'success',
+                'ml': status
+            }, status=503 if status['warm_up_pending'] else 200)
+            
+        except Exception as e:
+            print(f"Error in MLStatusView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+    
+    def post(self, request):
+        if not request.user.is_authenticated or not request.user.isHost:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Only hosts can start the ML warm-up'
+            }, status=403)
+        
+        started = loader.start_warm_up(force=True)
+        return JsonResponse({
+            'status': 'success',
+            'message': 'Warm-up started' if started else 'Models are already loaded or loading',
+            'ml': loader.status()
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MLRecomputeView(View):
+    """
+    Queue a recomputation of the precomputed ML data (hosts only):
+    command=embed_events|precompute_recommendations|train_cf. Returns the job
+    to follow at jobs/status/.
+    """
+    def post(self, request):
+        try:
+            if not request.user.is_authenticated or not request.user.isHost:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Only hosts can start ML recomputation'
+                }, status=403)
+            
+            command = request.POST.get('command') or request.GET.get('command')
+            if command not in job_handlers.ML_COMMANDS:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': f"Invalid command. Valid commands are: {', '.join(job_handlers.ML_COMMANDS)}"
+                }, status=400)
+            
+            # Nobody waits on these, so interactive jobs go first
+            job = jobs.enqueue('ml_recompute', {'command': command}, owner=request.user,
+                               priority=jobs.PRIORITY_BACKGROUND, max_attempts=1)
+            return JsonResponse({
+                'status': 'success',
+                'job': jobs.describe(job)
+            }, status=202)
+            
+        except Exception as e:
+            print(f"Error in MLRecomputeView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
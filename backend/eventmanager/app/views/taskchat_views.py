@@ -1,10 +1,14 @@
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from ..models import TaskInfo, Chat, User
 from ..serializers.chat import TaskChatSerializer
+from ..services import chatstream
+from ..services import chat_archive, chat_search, chat_write_buffer
+from ..services.chat_pagination import PaginationError, parse_page_params, paginate_messages, page_cursors
+from ..services.chat_sync import latest_messages_by_conversation, user_task_conversations
 import json
 import traceback
 from django.utils import timezone
@@ -35,7 +39,7 @@ class TaskChatView(View):
             
             # Get the task
             try:
-                task = TaskInfo.objects.get(id=task_id)
+                task = TaskInfo.objects.select_related('event').get(id=task_id)
             except TaskInfo.DoesNotExist:
                 return JsonResponse({
                     'status': 'error',
@@ -44,21 +48,26 @@ class TaskChatView(View):
             
             # Check access rights - user must be assigned to the task, be the host, or be the event host
             if not (
-                request.user in task.volunteers.all() or 
                 request.user.isHost or 
-                request.user == task.event.host
+                request.user.id == task.event.host_id or
+                task.volunteers.filter(id=request.user.id).exists()
             ):
                 return JsonResponse({
                     'status': 'error',
                     'message': 'You must be assigned to this task or be a host to access the chat'
                 }, status=403)
             
-            # Get limit and offset for pagination
-            limit = int(request.GET.get('limit', 50))
-            offset = int(request.GET.get('offset', 0))
+            # Get pagination parameters (before_id/after_id cursors, offset for older clients)
+            try:
+                page = parse_page_params(request.GET, default_limit=50)
+            except PaginationError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
             
             # Get chat messages for this task
-            messages = task.messages.all().order_by('-timestamp')[offset:offset+limit]
+            messages, has_more = paginate_messages(task.messages.select_related('user'), **page)
             
             # Serialize the messages
             serializer = TaskChatSerializer(messages, many=True, context={'request': request})
@@ -76,7 +85,8 @@ class TaskChatView(View):
                 'status': 'success',
                 'task': task_data,
                 'count': len(serializer.data),
-                'has_more': task.messages.count() > (offset + limit),
+                'has_more': has_more,
+                **page_cursors(messages),
                 'messages': serializer.data
             })
             
@@ -118,7 +128,7 @@ class TaskChatView(View):
                 
             # Get the task
             try:
-                task = TaskInfo.objects.get(id=task_id)
+                task = TaskInfo.objects.select_related('event').get(id=task_id)
             except TaskInfo.DoesNotExist:
                 return JsonResponse({
                     'status': 'error',
@@ -127,9 +137,9 @@ class TaskChatView(View):
             
             # Check access rights - user must be assigned to the task, be the host, or be the event host
             if not (
-                request.user in task.volunteers.all() or 
                 request.user.isHost or 
-                request.user == task.event.host
+                request.user.id == task.event.host_id or
+                task.volunteers.filter(id=request.user.id).exists()
             ):
                 return JsonResponse({
                     'status': 'error',
@@ -142,7 +152,7 @@ class TaskChatView(View):
                 user=request.user,
                 text=message_text
             )
-            chat_message.save()
+            chat_write_buffer.save_message(chat_message)
             
             # Serialize the message
             serializer = TaskChatSerializer(chat_message, context={'request': request})
@@ -186,7 +196,7 @@ class TaskChatHistoryView(View):
             
             # Get the task
             try:
-                task = TaskInfo.objects.get(id=task_id)
+                task = TaskInfo.objects.select_related('event').get(id=task_id)
             except TaskInfo.DoesNotExist:
                 return JsonResponse({
                     'status': 'error',
@@ -195,9 +205,9 @@ class TaskChatHistoryView(View):
             
             # Check access rights
             if not (
-                request.user in task.volunteers.all() or 
                 request.user.isHost or 
-                request.user == task.event.host
+                request.user.id == task.event.host_id or
+                task.volunteers.filter(id=request.user.id).exists()
             ):
                 return JsonResponse({
                     'status': 'error',
@@ -228,32 +238,57 @@ class TaskChatHistoryView(View):
                 messages = messages.filter(is_host=True)
                 
             if search_text:
-                messages = messages.filter(text__icontains=search_text)
+                # Served by the full-text index instead of scanning every message
+                messages = chat_search.filter_matching(messages, search_text)
             
-            # Order by timestamp (newest first)
-            messages = messages.order_by('-timestamp')
+            # Get pagination parameters (before_id/after_id cursors, offset for older clients)
+            try:
+                page = parse_page_params(request.GET, default_limit=100)
+            except PaginationError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
             
-            # Get limit and offset for pagination
-            limit = int(request.GET.get('limit', 100))
-            offset = int(request.GET.get('offset', 0))
+            # Messages of long-finished events live in the chat archive
+            archived = chat_archive.filter_records(
+                chat_archive.archived_records(
+                    'task', task.id, task.event_id, before_id=page['before_id'], after_id=page['after_id'],
+                    from_date=from_date, to_date=to_date
+                ), 'text',
+                from_date=from_date, to_date=to_date, user_id=user_id,
+                host_only=host_only, search_text=search_text
+            )
             
-            # Apply pagination
-            paginated_messages = messages[offset:offset+limit]
+            # Apply pagination (newest first), continuing into archived messages
+            paginated_messages, archived_page, has_more = chat_archive.paginate_with_archive(
+                messages.select_related('user'), archived, **page
+            )
             
             # Serialize the messages
             serializer = TaskChatSerializer(paginated_messages, many=True, context={'request': request})
+            message_data = list(serializer.data) + chat_archive.for_viewer(archived_page, request.user)
             
-            return JsonResponse({
+            response_data = {
                 'status': 'success',
                 'task_id': task.id,
                 'task_name': task.task_name,
                 'event_id': task.event.id,
                 'event_name': task.event.event_name,
-                'total_count': messages.count(),
-                'returned_count': len(serializer.data),
-                'has_more': messages.count() > (offset + limit),
-                'messages': serializer.data
-            })
+                'returned_count': len(message_data),
+                'has_more': has_more,
+                **page_cursors(message_data),
+                'messages': message_data
+            }
+            
+            # Counting every matching message is linear in the chat size, so only on request
+            if request.GET.get('include_total') == 'true':
+                response_data['total_count'] = messages.count() + chat_archive.archived_count(
+                    'task', task.id, task.event_id, 'text', from_date=from_date, to_date=to_date, user_id=user_id,
+                    host_only=host_only, search_text=search_text
+                )
+            
+            return JsonResponse(response_data)
             
         except Exception as e:
             print(f"Error in TaskChatHistoryView: {str(e)}")
@@ -263,6 +298,81 @@ class TaskChatHistoryView(View):
                 'message': str(e)
             }, status=500)
 
+@method_decorator(csrf_exempt, name='dispatch')
+class TaskChatStreamView(View):
+    """
+    Server-Sent Events stream of new messages in a task chat.
+    Clients reconnecting with Last-Event-ID receive the messages they missed.
+    """
+    def get(self, request):
+        try:
+            # Check authentication
+            if not request.user.is_authenticated:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Authentication required'
+                }, status=401)
+                
+            # Get task_id from query parameters
+            task_id = request.GET.get('task_id')
+            
+            if not task_id:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Task ID is required'
+                }, status=400)
+            
+            # Get the task
+            try:
+                task = TaskInfo.objects.select_related('event').get(id=task_id)
+            except TaskInfo.DoesNotExist:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Task not found'
+                }, status=404)
+            
+            # Check access rights - user must be assigned to the task, be the host, or be the event host
+            if not (
+                request.user.isHost or 
+                request.user.id == task.event.host_id or
+                task.volunteers.filter(id=request.user.id).exists()
+            ):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'You must be assigned to this task or be a host to access the chat'
+                }, status=403)
+            
+            # Under WSGI every open stream holds a server thread, so they are capped
+            if not chatstream.accepts_stream(request):
+                response = JsonResponse({
+                    'status': 'error',
+                    'message': 'Too many open chat streams, retry shortly'
+                }, status=503)
+                response['Retry-After'] = '5'
+                return response
+            
+            # Subscribe before reading the backlog so no message falls in between
+            subscription = chatstream.broker.subscribe(chatstream.task_channel(task.id))
+            chatstream.ensure_poller()
+            
+            # Messages missed while disconnected (Last-Event-ID) are replayed first, page by page
+            response = StreamingHttpResponse(
+                chatstream.open_stream(request, subscription,
+                                       chatstream.backlog_fetcher(task.messages, TaskChatSerializer)),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+            
+        except Exception as e:
+            print(f"Error in TaskChatStreamView: {str(e)}")
+            print(traceback.format_exc())
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
 @method_decorator(csrf_exempt, name='dispatch')
 class RecentTaskChatsView(View):
     """
@@ -278,40 +388,26 @@ class RecentTaskChatsView(View):
                 }, status=401)
             
             # Get user's tasks
-            if request.user.isHost:
-                # For hosts, get tasks from events they are hosting
-                user_events = request.user.hosted_events.all()
-                user_tasks = TaskInfo.objects.filter(event__in=user_events)
-            else:
-                # For volunteers, get tasks they are assigned to
-                user_tasks = request.user.assigned_tasks.all()
-            
-            # Get task ids
-            task_ids = list(user_tasks.values_list('id', flat=True))
+            user_tasks = user_task_conversations(request.user)
             
             # Get limit for number of messages per task
             limit = int(request.GET.get('limit', 5))
             
-            # Get recent messages for these tasks
-            recent_chats_by_task = {}
+            # Get recent messages for all these tasks in one windowed query
+            messages_by_task = latest_messages_by_conversation(Chat, 'task_id', list(user_tasks), limit)
             
-            for task_id in task_ids:
-                try:
-                    task = TaskInfo.objects.get(id=task_id)
-                    messages = task.messages.all().order_by('-timestamp')[:limit]
-                    
-                    if messages.exists():
-                        serializer = TaskChatSerializer(messages, many=True, context={'request': request})
-                        recent_chats_by_task[task_id] = {
-                            'task_id': task_id,
-                            'task_name': task.task_name,
-                            'event_id': task.event.id,
-                            'event_name': task.event.event_name,
-                            'message_count': messages.count(),
-                            'messages': serializer.data
-                        }
-                except TaskInfo.DoesNotExist:
-                    continue
+            recent_chats_by_task = {}
+            for task_id, messages in messages_by_task.items():
+                task_name, event_id, event_name = user_tasks[task_id]
+                serializer = TaskChatSerializer(messages, many=True, context={'request': request})
+                recent_chats_by_task[task_id] = {
+                    'task_id': task_id,
+                    'task_name': task_name,
+                    'event_id': event_id,
+                    'event_name': event_name,
+                    'message_count': len(messages),
+                    'messages': serializer.data
+                }
             
             return JsonResponse({
                 'status': 'success',
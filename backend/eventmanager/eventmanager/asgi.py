@@ -2,6 +2,9 @@
 ASGI config for eventmanager project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests are handled by Django as usual, and WebSocket connections are
+routed to the chat consumers in ``app/routing.py``. Run it with an ASGI server,
+e.g. ``daphne eventmanager.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +16,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eventmanager.settings')
 
-application = get_asgi_application()
+# Initialize Django before importing anything that touches the models
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+from app.routing import websocket_urlpatterns
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+    ),
+})
+
+# Load the ML models in the background if ML_WARM_UP is set
+from app.ml import loader
+
+loader.start_warm_up()
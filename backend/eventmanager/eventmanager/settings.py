@@ -74,15 +74,47 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'eventmanager.wsgi.application'
+ASGI_APPLICATION = 'eventmanager.asgi.application'
+
+# WebSocket chat. The in-memory layer only reaches clients connected to the same
+# process, which is what a single-node ASGI deployment needs.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Transactions take SQLite's write lock when they begin (IMMEDIATE), so read-modify-write
+# updates such as the feedback rollups are serialised instead of failing with "database
+# is locked" when two try to upgrade a read lock. Tests use a file database, as the
+# in-memory one locks per table across threads.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Shared by every worker process: cached rankings and skill coverage, and the
+# per-viewer dedupe keys of popularity counting. The generation counters that
+# invalidate cached entries are kept in their own table, so culling cannot
+# reset them (app/services/cache_versions.py). The table is created by
+# migrations (or manage.py createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'app_cache',
+        'OPTIONS': {
+            # The default of 300 entries is filled by view dedupe keys alone
+            'MAX_ENTRIES': 20000,
+            'CULL_FREQUENCY': 4,
+        },
     }
 }
 
@@ -159,6 +191,88 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FRONTEND_URL = 'http://localhost:5173'  
 
+# Real-time chat streams (Server-Sent Events)
+CHAT_STREAM_HEARTBEAT_SECONDS = 15  # Comment frame sent to idle clients to keep proxies from closing them
+CHAT_STREAM_MAX_SECONDS = 300  # Streams are closed after this long; clients resume with Last-Event-ID
+CHAT_STREAM_MAX_PENDING = 500  # Undelivered messages buffered per client before it is disconnected
+CHAT_STREAM_BRIDGE = 'sqlite'  # 'sqlite' polls the chat tables so all workers see every message, None disables
+CHAT_STREAM_POLL_SECONDS = 1.0
+# Under WSGI each open stream holds a server thread; more streams than this per process get a 503
+CHAT_STREAM_MAX_SYNC_CLIENTS = 50
+
+# Batched writes for chat messages: always for messages received over WebSockets,
+# for messages posted over HTTP only with CHAT_BATCH_HTTP_WRITES
+CHAT_WRITER_BATCH_SIZE = 100  # Flush as soon as this many messages are queued
+CHAT_WRITER_BATCH_MS = 20  # ...or when the oldest queued message is this old
+CHAT_WRITER_SHUTDOWN_SECONDS = 10  # How long a clean shutdown waits for the queue to drain
+CHAT_BATCH_HTTP_WRITES = False
+
+# Unread counters are updated on every message for conversations up to this many members,
+# larger conversations count unread messages when they are read
+CHAT_UNREAD_FANOUT_LIMIT = 200
+
+# Semantic event search (vectors are computed by manage.py embed_events and on save)
+SEMANTIC_SEARCH_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+SEMANTIC_SEARCH_ALPHA = 0.7  # Weight of vector similarity against bm25 in hybrid mode
+SEMANTIC_SEARCH_REFRESH_SECONDS = 30  # How often each process checks for new embeddings
+# Saved events are embedded by a background job (manage.py runworker); until then they are found by keyword
+SEMANTIC_SEARCH_EMBED_ON_SAVE = True
+
+# Cached event recommendations
+RECOMMENDATION_MODEL_VERSION = 'skills-minilm-v1'  # Change to drop every cached ranking
+RECOMMENDATION_CACHE_SECONDS = 3600
+RECOMMENDATION_WARM_WINDOW_SECONDS = 3600  # Rankings used this recently are recomputed after a change
+RECOMMENDATION_WARM_MAX_ENTRIES = 1000
+RECOMMENDATION_PRECOMPUTE_TOP_N = 50  # Events and tasks stored per volunteer by precompute_recommendations
+
+# Collaborative filtering on enrollment history (manage.py train_cf)
+CF_MODEL_PATH = os.path.join(BASE_DIR, 'ml_models', 'collaborative.npz')
+CF_FACTORS = 32
+CF_BLEND_WEIGHT = 0.3  # Weight of the collaborative score against the skills score
+CF_RETRAIN_THRESHOLD = 0.1  # Fraction of changed interactions that triggers a full retrain
+
+# Trending events (time-decayed popularity)
+POPULARITY_HALF_LIFE_HOURS = 48
+POPULARITY_WEIGHTS = {
+    'enrollment': 5.0,
+    'chat': 1.0,
+    'view': 0.5,
+}
+
+# Cached skill coverage analysis (invalidated when tasks, enrollments or skills change)
+SKILL_COVERAGE_CACHE_SECONDS = 3600
+
+# ML models are imported on first use; set ML_WARM_UP to load them in the
+# background as soon as a server process starts (see app/ml/loader.py)
+ML_WARM_UP = False
+ML_WARM_UP_DELAY_SECONDS = 0
+
+# Rendered analytics charts, keyed by a version of their data (app/services/chart_cache.py)
+CHART_CACHE_DIR = os.path.join(BASE_DIR, 'chart_cache')
+CHART_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Least recently used charts are evicted beyond this
+# Processes rendering a dashboard's charts in parallel; 1 renders in the request thread
+CHART_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+# Background jobs, run by manage.py runworker (app/services/jobs.py)
+JOB_RESULTS_DIR = os.path.join(BASE_DIR, 'job_results')  # Files offered at jobs/download/
+JOB_WORKERS = 2
+JOB_POLL_SECONDS = 2
+JOB_TIMEOUT_SECONDS = 30 * 60  # Running jobs not finished after this are given to another worker
+# Kinds that legitimately run longer than JOB_TIMEOUT_SECONDS
+JOB_KIND_TIMEOUT_SECONDS = {
+    'ml_recompute': 6 * 60 * 60,
+}
+JOB_RESULT_TTL_SECONDS = 24 * 60 * 60  # Finished jobs and their files are deleted after this
+# Send new event notifications from a worker instead of one thread per email.
+# Only enable this where manage.py runworker is running, or no emails go out.
+JOB_QUEUE_EMAILS = False
+
+# Chat archive for completed events (manage.py archive_chats)
+# Outside MEDIA_ROOT, which is served publicly; archives are only read through the chat history views
+CHAT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'chat_archive')
+CHAT_ARCHIVE_AFTER_DAYS = 90  # Events that ended this many days ago are archived
+CHAT_ARCHIVE_SEGMENT_SIZE = 5000  # Messages per compressed segment file
+
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
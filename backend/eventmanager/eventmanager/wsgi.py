@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eventmanager.settings')
 
 application = get_wsgi_application()
+
+# Load the ML models in the background if ML_WARM_UP is set
+from app.ml import loader
+
+loader.start_warm_up()
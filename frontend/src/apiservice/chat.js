@@ -133,8 +133,8 @@ export const getEventChatHistory = async (eventId, filters = {}) => {
       offset = 0
     } = filters;
     
-    // Build query parameters
-    const params = { event_id: eventId, limit, offset };
+    // Build query parameters; total_count is only computed when asked for
+    const params = { event_id: eventId, limit, offset, include_total: true };
     
     if (fromDate) params.from_date = fromDate;
     if (toDate) params.to_date = toDate;